@@ -4,10 +4,10 @@ from alembic import context
 from sqlalchemy import engine_from_config, pool
 
 from madr.models import Base
-from madr.settings import Settings
+from madr.settings import get_settings
 
 config = context.config
-config.set_main_option('sqlalchemy.url', Settings().DATABASE_URL.unicode_string())
+config.set_main_option('sqlalchemy.url', get_settings().DATABASE_URL.unicode_string())
 
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
@@ -0,0 +1,44 @@
+"""cria indices trigram
+
+Revision ID: 024a25b3c45b
+Revises: 162480cc01d7
+Create Date: 2026-10-18 11:48:13.978264+00:00
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '024a25b3c45b'
+down_revision: str | None = '162480cc01d7'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_livros_title_trgm',
+            'livros',
+            ['title'],
+            postgresql_using='gin',
+            postgresql_ops={'title': 'gin_trgm_ops'},
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_romancistas_name_trgm',
+            'romancistas',
+            ['name'],
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_romancistas_name_trgm', 'romancistas', postgresql_concurrently=True)
+        op.drop_index('ix_livros_title_trgm', 'livros', postgresql_concurrently=True)
+    op.execute('DROP EXTENSION IF EXISTS pg_trgm')
@@ -0,0 +1,62 @@
+"""cria busca textual
+
+Revision ID: b95f055ebe16
+Revises: 024a25b3c45b
+Create Date: 2026-10-18 11:58:49.359665+00:00
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'b95f055ebe16'
+down_revision: str | None = '024a25b3c45b'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'livros',
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('portuguese', title)", persisted=True),
+            nullable=False,
+        ),
+    )
+    op.add_column(
+        'romancistas',
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('simple', name)", persisted=True),
+            nullable=False,
+        ),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_livros_search_vector',
+            'livros',
+            ['search_vector'],
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_romancistas_search_vector',
+            'romancistas',
+            ['search_vector'],
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_romancistas_search_vector', 'romancistas', postgresql_concurrently=True)
+        op.drop_index('ix_livros_search_vector', 'livros', postgresql_concurrently=True)
+    op.drop_column('romancistas', 'search_vector')
+    op.drop_column('livros', 'search_vector')
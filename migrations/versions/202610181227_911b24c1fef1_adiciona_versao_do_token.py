@@ -0,0 +1,25 @@
+"""adiciona versao do token
+
+Revision ID: 911b24c1fef1
+Revises: b95f055ebe16
+Create Date: 2026-10-18 12:27:15.157743+00:00
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '911b24c1fef1'
+down_revision: str | None = 'b95f055ebe16'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,32 @@
+"""cria tabela rate_limit_buckets
+
+Revision ID: 06eb0c1b7974
+Revises: 911b24c1fef1
+Create Date: 2026-10-18 12:33:44.541008+00:00
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '06eb0c1b7974'
+down_revision: str | None = '911b24c1fef1'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'rate_limit_buckets',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+        prefixes=['UNLOGGED'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('rate_limit_buckets')
@@ -0,0 +1,35 @@
+"""cria indice unico de email sem diferenciar maiusculas
+
+Revision ID: b9ee6e55b049
+Revises: 06eb0c1b7974
+Create Date: 2026-10-18 12:49:47.679283+00:00
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9ee6e55b049'
+down_revision: str | None = '06eb0c1b7974'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_users_email_lower',
+            'users',
+            [sa.text('lower(email)')],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+    op.drop_constraint('users_email_key', 'users', type_='unique')
+
+
+def downgrade() -> None:
+    op.create_unique_constraint('users_email_key', 'users', ['email'])
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_email_lower', 'users', postgresql_concurrently=True)
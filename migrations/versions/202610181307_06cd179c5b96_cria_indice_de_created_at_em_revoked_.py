@@ -0,0 +1,24 @@
+"""cria indice de created_at em revoked_tokens
+
+Revision ID: 06cd179c5b96
+Revises: eff72a0190d9
+Create Date: 2026-10-18 13:07:37.619821+00:00
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '06cd179c5b96'
+down_revision: str | None = 'eff72a0190d9'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_revoked_tokens_created_at'), 'revoked_tokens', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_revoked_tokens_created_at'), table_name='revoked_tokens')
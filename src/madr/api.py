@@ -4,24 +4,42 @@ from importlib.metadata import version
 import sqlalchemy as sa
 from fastapi import FastAPI, HTTPException
 from fastapi.requests import Request
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import Response
 from sqlalchemy.exc import SQLAlchemyError
 
+from .compression import CompressionMiddleware, uncompressed
 from .database import T_DbSession
 from .errors import HttpError
-from .routers import auth, conta, livro, romancista
+from .openapi import setup_openapi
+from .responses import FastJSONResponse, FastJSONRoute
+from .routers import auth, busca, conta, importacao, livro, metrics, romancista
 from .schemas import ApiInfo, Message
+from .settings import get_settings
+
+settings = get_settings()
 
 app = FastAPI(
     title='MADR API',
     description='Meu Acervo Digital de Romances',
     version=version('madr'),
+    default_response_class=FastJSONResponse,
+)
+app.router.route_class = FastJSONRoute
+app.add_middleware(
+    CompressionMiddleware,
+    encodings=settings.COMPRESSION_ENCODINGS,
+    levels={
+        'zstd': settings.COMPRESSION_ZSTD_LEVEL,
+        'br': settings.COMPRESSION_BROTLI_LEVEL,
+        'gzip': settings.COMPRESSION_GZIP_LEVEL,
+    },
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
 )
 
 
 @app.exception_handler(HttpError)
 async def http_error_handler(_request: Request, exc: HttpError) -> Response:
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=exc.http_status_code,
         content=Message(message=exc.message).model_dump(),
     )
@@ -33,7 +51,7 @@ async def http_error_handler(_request: Request, exc: HttpError) -> Response:
     tags=['API'],
     status_code=HTTPStatus.OK,
 )
-def index() -> ApiInfo:
+async def index() -> ApiInfo:
     return ApiInfo(
         name=app.title,
         description=app.description,
@@ -47,9 +65,10 @@ def index() -> ApiInfo:
     tags=['API'],
     status_code=HTTPStatus.OK,
 )
-def health(dbsession: T_DbSession) -> Message:
+@uncompressed
+async def health(dbsession: T_DbSession) -> Message:
     try:
-        dbsession.execute(sa.select(sa.text('1'))).one()
+        (await dbsession.execute(sa.select(sa.text('1')))).one()
     except SQLAlchemyError as e:
         raise HTTPException(status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail='Error on database connection') from e
 
@@ -60,3 +79,8 @@ app.include_router(auth.router)
 app.include_router(conta.router)
 app.include_router(romancista.router)
 app.include_router(livro.router)
+app.include_router(busca.router)
+app.include_router(importacao.router)
+app.include_router(metrics.router)
+
+setup_openapi(app, settings)
@@ -0,0 +1,136 @@
+import math
+from collections import OrderedDict
+from time import monotonic
+from typing import Generic, TypeVar
+
+from .schemas import CacheStats
+
+K = TypeVar('K')
+V = TypeVar('V')
+
+
+class TTLCache(Generic[K, V]):
+    """Cache LRU em memória do processo, com expiração por tempo e contadores de acertos e falhas.
+
+    Com `maxsize` igual a zero nada é armazenado, desligando o cache.
+    """
+
+    def __init__(self, *, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K, /) -> V | None:
+        item = self._data.get(key)
+        if item is None or item[0] <= monotonic():
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: K, value: V, /, *, ttl: float | None = None) -> None:
+        if self.maxsize <= 0:
+            return
+
+        self._data[key] = (monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: K, /) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> CacheStats:
+        lookups = self.hits + self.misses
+        return CacheStats(
+            size=len(self._data),
+            maxsize=self.maxsize,
+            hits=self.hits,
+            misses=self.misses,
+            hit_ratio=self.hits / lookups if lookups else 0.0,
+        )
+
+
+class NegativeCache(TTLCache[int, bool]):
+    """Ids sabidamente inexistentes, para responder buscas repetidas por eles sem consultar o banco.
+
+    Quem cria registros chama `discard` com os ids criados, ou `invalidate` quando não os conhece. Uma ausência só é
+    registrada se foi observada depois da última remoção, para que a busca concorrente a uma criação não a desfaça.
+    Cada processo tem o seu cache: um id criado em outro worker responde 404 neste até a entrada expirar.
+    """
+
+    def __init__(self, *, maxsize: int, ttl: float) -> None:
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.generation = 0
+
+    def add(self, key: int, /, *, generation: int) -> None:
+        if generation == self.generation:
+            self.set(key, True)  # noqa: FBT003
+
+    def discard(self, *keys: int) -> None:
+        self.generation += 1
+        for key in keys:
+            self.delete(key)
+
+    def invalidate(self) -> None:
+        self.generation += 1
+        self._data.clear()
+
+
+class BloomFilter:
+    """Conjunto probabilístico compacto: nunca dá falso negativo, e falsos positivos ocorrem na taxa `error_rate`.
+
+    A taxa vale até `capacity` elementos; não há remoção, então o filtro deve ser reconstruído periodicamente.
+    """
+
+    def __init__(self, *, capacity: int, error_rate: float) -> None:
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, key: str) -> bool:
+        # Laço explícito para parar no primeiro bit zerado, que é o caso comum de quem consulta chaves ausentes.
+        first, second = self._hashes(key)
+        bits, size = self._bits, self.size
+        for i in range(self.hash_count):
+            position = (first + i * second) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    @staticmethod
+    def _hashes(key: str) -> tuple[int, int]:
+        # O hash nativo de str varia entre processos, mas cada processo monta o seu filtro; e fica em cache na str.
+        key_hash = hash(key)
+        return key_hash, (key_hash >> 32) | 1
+
+    def add(self, key: str, /) -> None:
+        first, second = self._hashes(key)
+        for i in range(self.hash_count):
+            position = (first + i * second) % self.size
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def clear(self) -> None:
+        self._bits = bytearray(len(self._bits))
+        self.count = 0
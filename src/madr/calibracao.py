@@ -0,0 +1,63 @@
+from argparse import ArgumentParser
+from collections.abc import Sequence
+from statistics import median
+from time import perf_counter
+
+from pwdlib.hashers.argon2 import Argon2Hasher
+
+from .settings import Settings
+
+
+def measure_hash_time(*, time_cost: int, memory_cost: int, parallelism: int, samples: int) -> float:
+    hasher = Argon2Hasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+    times = []
+    for _ in range(samples):
+        start = perf_counter()
+        hasher.hash('calibracao')
+        times.append(perf_counter() - start)
+    return median(times)
+
+
+def calibrate(
+    *, target: float, memory_cost: int, parallelism: int, max_time_cost: int, samples: int
+) -> list[tuple[int, float]]:
+    """Mede o tempo de hash aumentando o `time_cost` até ultrapassar o alvo, retornando as medições."""
+    measurements = []
+    for time_cost in range(1, max_time_cost + 1):
+        elapsed = measure_hash_time(
+            time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism, samples=samples
+        )
+        measurements.append((time_cost, elapsed))
+        if elapsed > target:
+            break
+    return measurements
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    defaults = Settings.model_fields
+    parser = ArgumentParser(description='Calibra os parâmetros do argon2 para uma latência alvo nesta máquina')
+    parser.add_argument('--target-ms', type=float, default=250, help='latência alvo de um hash, em milissegundos')
+    parser.add_argument('--memory-cost', type=int, default=defaults['ARGON2_MEMORY_COST'].default, help='em KiB')
+    parser.add_argument('--parallelism', type=int, default=defaults['ARGON2_PARALLELISM'].default)
+    parser.add_argument('--max-time-cost', type=int, default=20)
+    parser.add_argument('--samples', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    measurements = calibrate(
+        target=args.target_ms / 1000,
+        memory_cost=args.memory_cost,
+        parallelism=args.parallelism,
+        max_time_cost=args.max_time_cost,
+        samples=args.samples,
+    )
+    for time_cost, elapsed in measurements:
+        print(f'# time_cost={time_cost}: {elapsed * 1000:.1f} ms')  # noqa: T201
+
+    within_target = [time_cost for time_cost, elapsed in measurements if elapsed <= args.target_ms / 1000]
+    print(f'ARGON2_TIME_COST={max(within_target, default=1)}')  # noqa: T201
+    print(f'ARGON2_MEMORY_COST={args.memory_cost}')  # noqa: T201
+    print(f'ARGON2_PARALLELISM={args.parallelism}')  # noqa: T201
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,249 @@
+import json
+import random
+import zlib
+from abc import ABC, abstractmethod
+from argparse import ArgumentParser
+from collections.abc import Callable, Mapping, Sequence
+from statistics import median
+from time import perf_counter
+from typing import Any, Literal, TypeVar
+
+import brotli
+import zstandard
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+T_Encoding = Literal['zstd', 'br', 'gzip']
+F = TypeVar('F', bound=Callable[..., Any])
+
+UNCOMPRESSED_ENDPOINTS: set[Callable[..., Any]] = set()
+
+
+def uncompressed(endpoint: F, /) -> F:
+    """Marca uma rota para nunca ter a resposta comprimida."""
+    UNCOMPRESSED_ENDPOINTS.add(endpoint)
+    return endpoint
+
+
+class Compressor(ABC):
+    @abstractmethod
+    def compress(self, data: bytes, /) -> bytes: ...
+
+    @abstractmethod
+    def flush(self) -> bytes:
+        """Emite tudo o que já foi recebido, para que o cliente possa descomprimir um stream parcial."""
+
+    @abstractmethod
+    def finish(self) -> bytes: ...
+
+
+class GzipCompressor(Compressor):
+    def __init__(self, level: int) -> None:
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, /) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliCompressor(Compressor):
+    def __init__(self, level: int) -> None:
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes, /) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdCompressor(Compressor):
+    def __init__(self, level: int) -> None:
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, /) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+COMPRESSORS: dict[T_Encoding, Callable[[int], Compressor]] = {
+    'zstd': ZstdCompressor,
+    'br': BrotliCompressor,
+    'gzip': GzipCompressor,
+}
+
+
+def choose_encoding(accept_encoding: str, encodings: Sequence[T_Encoding], /) -> T_Encoding | None:
+    """Escolhe a codificação de maior `q` aceita pelo cliente, desempatando pela ordem de preferência do servidor."""
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        weight = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+
+    default = weights.get('*', 0.0)
+    chosen: T_Encoding | None = None
+    chosen_weight = 0.0
+    for encoding in encodings:
+        if (weight := weights.get(encoding, default)) > chosen_weight:
+            chosen, chosen_weight = encoding, weight
+    return chosen
+
+
+class CompressionMiddleware:
+    """Comprime as respostas na codificação negociada pelo `Accept-Encoding`.
+
+    Respostas completas menores que `minimum_size` seguem sem compressão. Respostas em streaming são comprimidas
+    pedaço a pedaço, cada um emitido assim que chega, sem esperar o fim do stream.
+    """
+
+    def __init__(
+        self, app: ASGIApp, *, encodings: Sequence[T_Encoding], levels: Mapping[T_Encoding, int], minimum_size: int
+    ) -> None:
+        self.app = app
+        self.encodings = encodings
+        self.levels = levels
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or not (
+            encoding := choose_encoding(Headers(scope=scope).get('accept-encoding', ''), self.encodings)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(
+            scope, send, encoding=encoding, level=self.levels[encoding], minimum_size=self.minimum_size
+        )
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    def __init__(self, scope: Scope, send: Send, *, encoding: T_Encoding, level: int, minimum_size: int) -> None:
+        self.scope = scope
+        self._send = send
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self.start_message: Message | None = None
+        self.compressor: Compressor | None = None
+
+    def compressible(self, status: int, headers: Headers, /) -> bool:
+        # A rota só consta do escopo depois do roteamento, por isso a checagem fica para o início da resposta.
+        endpoint = getattr(self.scope.get('route'), 'endpoint', None)
+        return (
+            status not in {204, 304} and 'content-encoding' not in headers and endpoint not in UNCOMPRESSED_ENDPOINTS
+        )
+
+    async def send(self, message: Message) -> None:
+        if message['type'] == 'http.response.start':
+            # Segura o início até o primeiro pedaço do corpo, que decide se a resposta será comprimida.
+            self.start_message = message
+            return
+        if message['type'] != 'http.response.body':
+            await self._send(message)
+            return
+
+        body: bytes = message.get('body', b'')
+        more_body: bool = message.get('more_body', False)
+
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            headers = MutableHeaders(raw=start['headers'])
+            if self.compressible(start['status'], headers) and (more_body or len(body) >= self.minimum_size):
+                self.compressor = COMPRESSORS[self.encoding](self.level)
+                headers['Content-Encoding'] = self.encoding
+                headers.add_vary_header('Accept-Encoding')
+                # O corpo comprimido é outra representação; ETags fracas continuam valendo nas revalidações.
+                if (etag := headers.get('etag')) and not etag.startswith('W/'):
+                    headers['ETag'] = f'W/{etag}'
+                if more_body:
+                    del headers['Content-Length']
+                else:
+                    body = self.compressor.compress(body) + self.compressor.finish()
+                    headers['Content-Length'] = str(len(body))
+                    await self._send(start)
+                    await self._send({'type': 'http.response.body', 'body': body})
+                    return
+            await self._send(start)
+
+        if self.compressor is None:
+            await self._send(message)
+            return
+
+        if more_body:
+            data = (self.compressor.compress(body) + self.compressor.flush()) if body else b''
+        else:
+            data = self.compressor.compress(body) + self.compressor.finish()
+        await self._send({'type': 'http.response.body', 'body': data, 'more_body': more_body})
+
+
+BENCHMARK_LEVELS: dict[T_Encoding, list[int]] = {'gzip': [1, 6, 9], 'br': [1, 4, 6, 11], 'zstd': [1, 3, 9, 19]}
+
+
+def sample_payload(rows: int, /, *, seed: int = 0) -> bytes:
+    """JSON no formato de uma página de `LivroList`, com títulos sorteados de um vocabulário fixo."""
+    rng = random.Random(seed)  # noqa: S311
+    words = ['dom', 'casmurro', 'memórias', 'póstumas', 'de', 'brás', 'cubas', 'iracema', 'o', 'cortiço', 'senhora']
+    livros = [
+        {
+            'id': i,
+            'title': ' '.join(rng.choices(words, k=rng.randint(2, 6))),
+            'year': rng.randint(1800, 2024),
+            'romancista_id': rng.randint(1, rows // 10 + 1),
+        }
+        for i in range(1, rows + 1)
+    ]
+    return json.dumps({'livros': livros, 'next_cursor': None}, ensure_ascii=False).encode()
+
+
+def measure_compression(payload: bytes, /, *, encoding: T_Encoding, level: int, samples: int) -> tuple[int, float]:
+    """Retorna o tamanho comprimido e a mediana do tempo de compressão do payload inteiro."""
+    times = []
+    for _ in range(samples):
+        start = perf_counter()
+        compressor = COMPRESSORS[encoding](level)
+        size = len(compressor.compress(payload) + compressor.finish())
+        times.append(perf_counter() - start)
+    return size, median(times)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = ArgumentParser(description='Mede o custo de CPU e a economia de bytes de cada codificação')
+    parser.add_argument('--rows', type=int, default=1000, help='livros no payload de exemplo')
+    parser.add_argument('--samples', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    payload = sample_payload(args.rows)
+    print(f'# payload: {len(payload)} bytes')  # noqa: T201
+    for encoding, levels in BENCHMARK_LEVELS.items():
+        for level in levels:
+            size, elapsed = measure_compression(payload, encoding=encoding, level=level, samples=args.samples)
+            print(  # noqa: T201
+                f'{encoding}:{level} {size} bytes ({1 - size / len(payload):.1%} menor), '
+                f'{elapsed * 1000:.2f} ms, {len(payload) / elapsed / 1e6:.1f} MB/s'
+            )
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,46 @@
+from datetime import UTC, datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from http import HTTPStatus
+
+from fastapi import HTTPException, Request, Response
+
+
+def make_etag(resource_id: int, updated_at: datetime, /) -> str:
+    return f'"{resource_id}-{updated_at:%Y%m%d%H%M%S%f}"'
+
+
+def validator_headers(resource_id: int, updated_at: datetime, /) -> dict[str, str]:
+    return {
+        'ETag': make_etag(resource_id, updated_at),
+        'Last-Modified': format_datetime(updated_at.replace(tzinfo=UTC), usegmt=True),
+    }
+
+
+def is_conditional(request: Request, /) -> bool:
+    return 'if-none-match' in request.headers or 'if-modified-since' in request.headers
+
+
+def is_not_modified(request: Request, resource_id: int, updated_at: datetime, /) -> bool:
+    """Avalia `If-None-Match` e, só na sua ausência, `If-Modified-Since`, como manda a RFC 9110."""
+    if (if_none_match := request.headers.get('if-none-match')) is not None:
+        etags = {etag.strip().removeprefix('W/') for etag in if_none_match.split(',')}
+        return '*' in etags or make_etag(resource_id, updated_at) in etags
+
+    try:
+        modified_since = parsedate_to_datetime(request.headers['if-modified-since'])
+    except (KeyError, TypeError, ValueError):
+        return False
+    if modified_since.tzinfo is None:
+        modified_since = modified_since.replace(tzinfo=UTC)
+    # Datas HTTP têm resolução de segundos.
+    return updated_at.replace(tzinfo=UTC, microsecond=0) <= modified_since
+
+
+def check_not_modified(request: Request, resource_id: int, updated_at: datetime, /) -> None:
+    """Interrompe a requisição com 304 se o cliente já tem a versão atual do recurso."""
+    if is_not_modified(request, resource_id, updated_at):
+        raise HTTPException(HTTPStatus.NOT_MODIFIED, headers=validator_headers(resource_id, updated_at))
+
+
+def set_validators(response: Response, resource_id: int, updated_at: datetime, /) -> None:
+    response.headers.update(validator_headers(resource_id, updated_at))
@@ -1,18 +1,340 @@
-from collections.abc import Generator
-from typing import Annotated
+from collections.abc import AsyncGenerator, AsyncIterator, Callable, Generator, Iterator, Sequence
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from dataclasses import dataclass, field
+from functools import cache, partial
+from itertools import count
+from time import monotonic, perf_counter
+from types import TracebackType
+from typing import Annotated, Any, Literal, Self, cast
 
 from fastapi import Depends
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session
+from sqlalchemy import Engine, Result, ScalarResult, create_engine
+from sqlalchemy.exc import InterfaceError, InvalidRequestError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, SessionTransaction, close_all_sessions
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry, NullPool, Pool, QueuePool
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 
-from madr.settings import Settings
+from madr.settings import Settings, get_settings
 
-engine = create_engine(Settings().DATABASE_URL.unicode_string())
+T_SessionMaker = Callable[[], AsyncSession]
+T_SessionFactory = Callable[[], AbstractAsyncContextManager[AsyncSession]]
 
 
-def get_dbsession() -> Generator[Session]:
-    with Session(engine) as session:
+@dataclass(kw_only=True)
+class PoolWaitTime:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def add(self, elapsed: float, /) -> None:
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+
+class WaitTimePoolMixin(Pool):
+    """Registra quanto tempo se espera para obter uma conexão do pool."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.wait_time = PoolWaitTime()
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        start = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_time.add(perf_counter() - start)
+
+
+class WaitTimeQueuePool(WaitTimePoolMixin, QueuePool): ...
+
+
+class WaitTimeAsyncAdaptedQueuePool(WaitTimePoolMixin, AsyncAdaptedQueuePool): ...
+
+
+class WaitTimeNullPool(WaitTimePoolMixin, NullPool): ...
+
+
+class ThreadPoolStreamResult:
+    """Resultado de `ThreadPoolSession.stream`, buscando cada partição do cursor no threadpool."""
+
+    def __init__(self, result: Result[Any] | ScalarResult[Any]) -> None:
+        self.result = result
+
+    def keys(self) -> Sequence[str]:
+        return list(cast(Result[Any], self.result).keys())
+
+    async def partitions(self, size: int | None = None) -> AsyncIterator[Sequence[Any]]:
+        async for partition in iterate_in_threadpool(self.result.partitions(size)):
+            yield partition
+
+
+class ThreadPoolSessionTransaction:
+    """Transação de `ThreadPoolSession`, com início, commit e rollback executados no threadpool."""
+
+    def __init__(
+        self, session: Session, *, nested: bool = False, sync_transaction: SessionTransaction | None = None
+    ) -> None:
+        self.session = session
+        self.nested = nested
+        self._sync_transaction = sync_transaction
+
+    @property
+    def sync_transaction(self) -> SessionTransaction:
+        if self._sync_transaction is None:
+            msg = 'Transação não iniciada'
+            raise InvalidRequestError(msg)
+        return self._sync_transaction
+
+    async def start(self) -> Self:
+        if self.nested:
+            self._sync_transaction = await run_in_threadpool(self.session.begin_nested)
+        else:
+            self._sync_transaction = await run_in_threadpool(self.session.begin)
+        return self
+
+    def __await__(self) -> Generator[Any, None, Self]:
+        return self.start().__await__()
+
+    async def __aenter__(self) -> Self:
+        return await self.start()
+
+    async def __aexit__(
+        self, type_: type[BaseException] | None, value: BaseException | None, traceback: TracebackType | None
+    ) -> None:
+        await run_in_threadpool(self.sync_transaction.__exit__, type_, value, traceback)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_transaction.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_transaction.rollback)
+
+
+class ThreadPoolSession(AsyncSession):
+    """AsyncSession sobre uma engine síncrona, executando o I/O no threadpool.
+
+    Usada com `DATABASE_ASYNC=false` para comparar o driver síncrono com o assíncrono sem duplicar os handlers. Todo
+    método do `AsyncSession` que faz I/O é sobrescrito: o original rodaria a sessão síncrona no event loop.
+    """
+
+    def __init__(self, bind: Engine, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.sync_session.bind = bind
+
+    async def refresh(self, *args: Any, **kwargs: Any) -> None:
+        await run_in_threadpool(self.sync_session.refresh, *args, **kwargs)
+
+    async def connection(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.connection, *args, **kwargs)
+
+    async def run_sync(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def execute(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.execute, *args, **kwargs)
+
+    async def stream(self, *args: Any, **kwargs: Any) -> Any:
+        kwargs['execution_options'] = {**kwargs.get('execution_options', {}), 'stream_results': True}
+        return ThreadPoolStreamResult(await run_in_threadpool(self.sync_session.execute, *args, **kwargs))
+
+    async def stream_scalars(self, *args: Any, **kwargs: Any) -> Any:
+        kwargs['execution_options'] = {**kwargs.get('execution_options', {}), 'stream_results': True}
+        return ThreadPoolStreamResult(await run_in_threadpool(self.sync_session.scalars, *args, **kwargs))
+
+    async def scalar(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.scalar, *args, **kwargs)
+
+    async def scalars(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.scalars, *args, **kwargs)
+
+    async def get(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.get, *args, **kwargs)
+
+    async def get_one(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.get_one, *args, **kwargs)
+
+    async def merge(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.merge, *args, **kwargs)
+
+    async def delete(self, instance: object) -> None:
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self, objects: Any = None) -> None:
+        await run_in_threadpool(self.sync_session.flush, objects)
+
+    def begin(self) -> Any:
+        return ThreadPoolSessionTransaction(self.sync_session)
+
+    def begin_nested(self) -> Any:
+        return ThreadPoolSessionTransaction(self.sync_session, nested=True)
+
+    def get_transaction(self) -> Any:
+        transaction = self.sync_session.get_transaction()
+        return transaction and ThreadPoolSessionTransaction(self.sync_session, sync_transaction=transaction)
+
+    def get_nested_transaction(self) -> Any:
+        transaction = self.sync_session.get_nested_transaction()
+        return transaction and ThreadPoolSessionTransaction(
+            self.sync_session, nested=True, sync_transaction=transaction
+        )
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def invalidate(self) -> None:
+        await run_in_threadpool(self.sync_session.invalidate)
+
+    async def reset(self) -> None:
+        await run_in_threadpool(self.sync_session.reset)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+    async def aclose(self) -> None:
+        await self.close()
+
+    @classmethod
+    async def close_all(cls) -> None:
+        await run_in_threadpool(close_all_sessions)
+
+
+def create_dbengine(settings: Settings, url: str | None = None) -> AsyncEngine | Engine:
+    url = url or settings.DATABASE_URL.unicode_string()
+    kwargs: dict[str, Any] = {
+        'pool_pre_ping': settings.DATABASE_POOL_PRE_PING,
+        'pool_recycle': settings.DATABASE_POOL_RECYCLE,
+    }
+    if settings.DATABASE_POOL_CLASS == 'NullPool':
+        kwargs['poolclass'] = WaitTimeNullPool
+    else:
+        kwargs['poolclass'] = WaitTimeAsyncAdaptedQueuePool if settings.DATABASE_ASYNC else WaitTimeQueuePool
+        kwargs['pool_size'] = settings.DATABASE_POOL_SIZE
+        kwargs['max_overflow'] = settings.DATABASE_POOL_MAX_OVERFLOW
+        kwargs['pool_timeout'] = settings.DATABASE_POOL_TIMEOUT
+
+    if settings.DATABASE_ASYNC:
+        return create_async_engine(url, **kwargs)
+    return create_engine(url, **kwargs)
+
+
+def create_sessionmaker(engine: AsyncEngine | Engine) -> T_SessionMaker:
+    if isinstance(engine, AsyncEngine):
+        return async_sessionmaker(engine)
+    return partial(ThreadPoolSession, engine)
+
+
+@dataclass(kw_only=True)
+class Replica:
+    engine: AsyncEngine | Engine
+    sessionmaker: T_SessionMaker
+    in_use: int = 0
+    unhealthy_until: float = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return monotonic() >= self.unhealthy_until
+
+
+@dataclass(kw_only=True)
+class ReplicaRouter:
+    """Distribui sessões de leitura entre as réplicas saudáveis, usando o primário se nenhuma estiver disponível."""
+
+    replicas: list[Replica]
+    fallback: T_SessionMaker
+    strategy: Literal['round_robin', 'least_connections'] = 'round_robin'
+    retry_interval: float = 30
+    _counter: Iterator[int] = field(default_factory=count, init=False, repr=False)
+
+    def choose(self) -> Replica | None:
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        if self.strategy == 'least_connections':
+            return min(healthy, key=lambda replica: replica.in_use)
+        return healthy[next(self._counter) % len(healthy)]
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        while replica := self.choose():
+            async with replica.sessionmaker() as session:
+                try:
+                    await session.connection()
+                except (OperationalError, InterfaceError):
+                    replica.unhealthy_until = monotonic() + self.retry_interval
+                    continue
+
+                replica.in_use += 1
+                try:
+                    yield session
+                finally:
+                    replica.in_use -= 1
+                return
+
+        async with self.fallback() as session:
+            yield session
+
+
+def create_replica_router(settings: Settings, fallback: T_SessionMaker) -> ReplicaRouter:
+    replicas = []
+    for url in settings.DATABASE_REPLICA_URLS:
+        replica_engine = create_dbengine(settings, url.unicode_string())
+        replicas.append(Replica(engine=replica_engine, sessionmaker=create_sessionmaker(replica_engine)))
+
+    return ReplicaRouter(
+        replicas=replicas,
+        fallback=fallback,
+        strategy=settings.DATABASE_REPLICA_STRATEGY,
+        retry_interval=settings.DATABASE_REPLICA_RETRY_INTERVAL,
+    )
+
+
+# Engines e pools são criados no primeiro uso, e não na importação, para não atrasar o início do processo.
+@cache
+def get_engine() -> AsyncEngine | Engine:
+    return create_dbengine(get_settings())
+
+
+@cache
+def get_sessionmaker() -> T_SessionMaker:
+    return create_sessionmaker(get_engine())
+
+
+@cache
+def get_replica_router() -> ReplicaRouter:
+    return create_replica_router(get_settings(), sessionmaker)
+
+
+def sessionmaker() -> AsyncSession:
+    return get_sessionmaker()()
+
+
+async def get_dbsession() -> AsyncGenerator[AsyncSession]:
+    async with sessionmaker() as session:
         yield session
 
 
-T_DbSession = Annotated[Session, Depends(get_dbsession)]
+async def get_read_dbsession() -> AsyncGenerator[AsyncSession]:
+    async with get_replica_router().session() as session:
+        yield session
+
+
+def get_read_session_factory() -> T_SessionFactory:
+    """Para respostas em streaming, que precisam de uma sessão aberta depois que o handler retorna."""
+    return get_replica_router().session
+
+
+def get_session_factory() -> T_SessionFactory:
+    """Sessões no primário abertas pelo próprio handler, apenas quando ele decide que precisa delas."""
+    return sessionmaker
+
+
+T_DbSession = Annotated[AsyncSession, Depends(get_dbsession)]
+T_ReadDbSession = Annotated[AsyncSession, Depends(get_read_dbsession)]
+T_ReadSessionFactory = Annotated[T_SessionFactory, Depends(get_read_session_factory)]
+T_PrimarySessionFactory = Annotated[T_SessionFactory, Depends(get_session_factory)]
@@ -58,3 +58,23 @@ class ConflictError(HttpError):
     @property
     def message(self) -> str:
         return f'{self.resource} já consta no MADR'
+
+
+class InvalidCursorError(HttpError):
+    @property
+    def http_status_code(self) -> HTTPStatus:
+        return HTTPStatus.BAD_REQUEST
+
+    @property
+    def message(self) -> str:
+        return 'Cursor de paginação inválido'
+
+
+class TooManyRequestsError(HttpError):
+    @property
+    def http_status_code(self) -> HTTPStatus:
+        return HTTPStatus.TOO_MANY_REQUESTS
+
+    @property
+    def message(self) -> str:
+        return 'Muitas tentativas, tente novamente mais tarde'
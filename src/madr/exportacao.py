@@ -0,0 +1,47 @@
+import csv
+import io
+import json
+from collections.abc import AsyncIterator, Sequence
+from typing import Any, Literal
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Row, Select
+
+from .database import T_SessionFactory
+
+T_ExportFormat = Literal['csv', 'ndjson']
+
+MEDIA_TYPES: dict[T_ExportFormat, str] = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+PARTITION_SIZE = 1000
+
+
+def format_rows(rows: Sequence[Row[Any]], file_format: T_ExportFormat, /) -> str:
+    buffer = io.StringIO()
+    if file_format == 'csv':
+        csv.writer(buffer, lineterminator='\n').writerows(rows)
+    else:
+        for row in rows:
+            buffer.write(json.dumps(row._asdict(), ensure_ascii=False))
+            buffer.write('\n')
+    return buffer.getvalue()
+
+
+async def export_rows(
+    session_factory: T_SessionFactory, query: Select[Any], file_format: T_ExportFormat, /
+) -> AsyncIterator[str]:
+    async with session_factory() as session:
+        result = await session.stream(query.execution_options(yield_per=PARTITION_SIZE))
+        if file_format == 'csv':
+            yield ','.join(result.keys()) + '\n'
+        async for partition in result.partitions():
+            yield format_rows(partition, file_format)
+
+
+def export_response(
+    session_factory: T_SessionFactory, query: Select[Any], file_format: T_ExportFormat, /, *, filename: str
+) -> StreamingResponse:
+    return StreamingResponse(
+        export_rows(session_factory, query, file_format),
+        media_type=MEDIA_TYPES[file_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}.{file_format}"'},
+    )
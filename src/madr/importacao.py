@@ -0,0 +1,149 @@
+import codecs
+import csv
+import json
+import sys
+from argparse import ArgumentParser
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Any, Literal
+
+import psycopg
+from sqlalchemy import URL, make_url
+
+from .schemas import ImportResult
+from .settings import get_settings
+from .utils import sanitize
+
+T_ImportFormat = Literal['csv', 'ndjson']
+
+CREATE_STAGING_TABLES = """
+CREATE TEMPORARY TABLE import_livros (title text NOT NULL, year integer NOT NULL, romancista_id integer NOT NULL)
+    ON COMMIT DROP;
+CREATE TEMPORARY TABLE import_romancistas (id integer PRIMARY KEY, name text NOT NULL)
+    ON COMMIT DROP;
+"""
+
+MERGE_ROMANCISTAS = """
+INSERT INTO romancistas (name)
+SELECT name FROM import_romancistas ORDER BY id DESC
+ON CONFLICT (name) DO NOTHING
+"""
+
+# Romancistas novos recebem ids provisórios negativos durante o COPY, resolvidos pelo nome só neste ponto.
+MERGE_LIVROS = """
+INSERT INTO livros (title, year, romancista_id)
+SELECT l.title, l.year, coalesce(r.id, l.romancista_id)
+FROM import_livros l
+LEFT JOIN import_romancistas s ON s.id = l.romancista_id
+LEFT JOIN romancistas r ON r.name = s.name
+ON CONFLICT (title) DO NOTHING
+"""
+
+
+def to_conninfo(url: str | URL, /) -> str:
+    return make_url(url).set(drivername='postgresql').render_as_string(hide_password=False)
+
+
+def iter_lines(chunks: Iterable[bytes], /) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ''
+    for chunk in chunks:
+        *lines, pending = (pending + decoder.decode(chunk)).split('\n')
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def parse_rows(lines: Iterable[str], file_format: T_ImportFormat, /) -> Iterator[dict[str, Any] | None]:
+    if file_format == 'csv':
+        yield from csv.DictReader(lines)
+        return
+
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield None
+        else:
+            yield row if isinstance(row, dict) else None
+
+
+def clean_row(row: dict[str, Any] | None, /) -> tuple[str, int, str] | None:
+    if row is None:
+        return None
+
+    title, year, romancista = row.get('title'), row.get('year'), row.get('romancista')
+    if not isinstance(title, str) or not isinstance(romancista, str) or not isinstance(year, str | int):
+        return None
+    try:
+        year = int(year)
+    except ValueError:
+        return None
+
+    title, romancista = sanitize(title), sanitize(romancista)
+    if not title or not romancista or year <= 0:
+        return None
+    return title, year, romancista
+
+
+def import_catalog(conn: psycopg.Connection, lines: Iterable[str], file_format: T_ImportFormat, /) -> ImportResult:
+    """Importa livros e seus romancistas, carregando as linhas por COPY em tabelas temporárias.
+
+    Só o mapa de nomes de romancistas fica em memória; as linhas são enviadas ao banco conforme são lidas.
+    """
+    with conn.transaction(), conn.cursor() as cursor:
+        cursor.execute(CREATE_STAGING_TABLES)
+        romancistas: dict[str, int] = dict(cursor.execute('SELECT name, id FROM romancistas').fetchall())
+        new_romancistas: list[str] = []
+
+        total = invalid = 0
+        with cursor.copy('COPY import_livros (title, year, romancista_id) FROM STDIN') as copy:
+            for row in parse_rows(lines, file_format):
+                total += 1
+                if not (cleaned := clean_row(row)):
+                    invalid += 1
+                    continue
+
+                title, year, romancista = cleaned
+                if (romancista_id := romancistas.get(romancista)) is None:
+                    new_romancistas.append(romancista)
+                    romancista_id = romancistas[romancista] = -len(new_romancistas)
+                copy.write_row((title, year, romancista_id))
+
+        with cursor.copy('COPY import_romancistas (id, name) FROM STDIN') as copy:
+            for i, name in enumerate(new_romancistas, start=1):
+                copy.write_row((-i, name))
+
+        cursor.execute('ANALYZE import_livros, import_romancistas')
+        romancistas_created = cursor.execute(MERGE_ROMANCISTAS).rowcount
+        livros_created = cursor.execute(MERGE_LIVROS).rowcount
+
+    return ImportResult(
+        romancistas_created=romancistas_created,
+        livros_created=livros_created,
+        livros_skipped=total - invalid - livros_created,
+        invalid_rows=invalid,
+    )
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = ArgumentParser(description='Importa catálogo de romancistas e livros no MADR')
+    parser.add_argument('file', help='arquivo CSV ou NDJSON com title, year e romancista ("-" para stdin)')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv', dest='file_format')
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    with (
+        psycopg.connect(to_conninfo(settings.DATABASE_URL.unicode_string())) as conn,
+        sys.stdin if args.file == '-' else open(args.file, encoding='utf-8', newline='') as file,  # noqa: PTH123
+    ):
+        result = import_catalog(conn, file, args.file_format)
+
+    print(result.model_dump_json())  # noqa: T201
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
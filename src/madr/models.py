@@ -1,6 +1,7 @@
 from datetime import datetime
 
-from sqlalchemy import ForeignKey, func
+from sqlalchemy import DDL, Computed, DateTime, ForeignKey, Index, event, func, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import DeclarativeBase, Mapped, MappedAsDataclass, mapped_column, relationship
 
 
@@ -14,20 +15,32 @@ class TimestampMixin(MappedAsDataclass):
 class Base(DeclarativeBase, MappedAsDataclass): ...
 
 
+event.listen(Base.metadata, 'before_create', DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+
+
 class User(TimestampMixin, Base, kw_only=True):
     __tablename__ = 'users'
+    __table_args__ = (Index('ix_users_email_lower', text('lower(email)'), unique=True),)
 
     id: Mapped[int] = mapped_column(primary_key=True, init=False)
-    email: Mapped[str] = mapped_column(unique=True)
+    email: Mapped[str]
     username: Mapped[str] = mapped_column(unique=True)
     password: Mapped[str]
+    token_version: Mapped[int] = mapped_column(init=False, default=0, server_default=text('0'))
 
 
 class Romancista(TimestampMixin, Base, kw_only=True):
     __tablename__ = 'romancistas'
+    __table_args__ = (
+        Index('ix_romancistas_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        Index('ix_romancistas_search_vector', 'search_vector', postgresql_using='gin'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, init=False)
     name: Mapped[str] = mapped_column(unique=True)
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR, Computed("to_tsvector('simple', name)", persisted=True), init=False, repr=False, deferred=True
+    )
 
     livros: Mapped[list['Livro']] = relationship(
         back_populates='romancista', cascade='all, delete-orphan', init=False, repr=False
@@ -36,9 +49,37 @@ class Romancista(TimestampMixin, Base, kw_only=True):
 
 class Livro(TimestampMixin, Base, kw_only=True):
     __tablename__ = 'livros'
+    __table_args__ = (
+        Index('ix_livros_title_trgm', 'title', postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'}),
+        Index('ix_livros_search_vector', 'search_vector', postgresql_using='gin'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, init=False)
     title: Mapped[str] = mapped_column(unique=True)
     year: Mapped[int]
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR, Computed("to_tsvector('portuguese', title)", persisted=True), init=False, repr=False, deferred=True
+    )
     romancista_id: Mapped[int] = mapped_column(ForeignKey('romancistas.id'), init=False)
     romancista: Mapped['Romancista'] = relationship(back_populates='livros', repr=False)
+
+
+class RateLimitBucket(Base, kw_only=True):
+    """Balde de fichas compartilhado entre processos para limitar tentativas de login."""
+
+    __tablename__ = 'rate_limit_buckets'
+    __table_args__ = {'prefixes': ['UNLOGGED']}  # noqa: RUF012
+
+    key: Mapped[str] = mapped_column(primary_key=True)
+    tokens: Mapped[float]
+    updated_at: Mapped[datetime]
+
+
+class RevokedToken(Base, kw_only=True):
+    """Id de token revogado (ou de família de refresh tokens), mantido até o token expirar."""
+
+    __tablename__ = 'revoked_tokens'
+
+    id: Mapped[str] = mapped_column(primary_key=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    created_at: Mapped[datetime] = mapped_column(init=False, repr=False, server_default=func.now(), index=True)
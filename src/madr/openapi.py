@@ -0,0 +1,81 @@
+import inspect
+import json
+import sys
+from argparse import ArgumentParser
+from collections.abc import Iterator, Sequence
+from hashlib import sha256
+from pathlib import Path
+from typing import get_args, get_type_hints
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+from .settings import Settings
+
+# Chave do arquivo gerado com a impressão digital das rotas; é removida antes de o schema ser servido.
+FINGERPRINT_KEY = 'x-madr-fingerprint'
+
+
+def iter_models(annotation: object, /) -> Iterator[type[BaseModel]]:
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        yield annotation
+    for arg in get_args(annotation):
+        yield from iter_models(arg)
+
+
+def schema_fingerprint(app: FastAPI, /) -> str:
+    """Identifica o que define o schema sem gerá-lo: as rotas e o código dos módulos dos endpoints e dos modelos.
+
+    A versão do pacote não muda a cada build, por isso não serve para saber se o arquivo gerado ainda vale.
+    """
+    digest = sha256(f'{app.title}\0{app.version}\0{app.description}'.encode())
+    modules = set()
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        digest.update(f'{route.path}\0{sorted(route.methods)}\0{route.unique_id}\0{route.status_code}\0'.encode())
+        modules.add(route.endpoint.__module__)
+        for annotation in [*get_type_hints(route.endpoint, include_extras=True).values(), route.response_model]:
+            modules.update(model.__module__ for model in iter_models(annotation))
+    for module in sorted(modules):
+        digest.update(inspect.getsource(sys.modules[module]).encode())
+    return digest.hexdigest()
+
+
+def write_openapi_schema(app: FastAPI, path: Path, /) -> None:
+    path.write_bytes(to_json({**app.openapi(), FINGERPRINT_KEY: schema_fingerprint(app)}, indent=2))
+
+
+def load_openapi_schema(app: FastAPI, path: Path, /) -> bool:
+    """Usa o schema gerado no build, que o FastAPI passa a servir sem montá-lo a partir das rotas.
+
+    Um arquivo gerado a partir de outras rotas ou de outro código é ignorado, e o schema volta a ser gerado no
+    primeiro acesso.
+    """
+    schema = json.loads(path.read_bytes())
+    if schema.pop(FINGERPRINT_KEY, None) != schema_fingerprint(app):
+        return False
+    app.openapi_schema = schema
+    return True
+
+
+def setup_openapi(app: FastAPI, settings: Settings, /) -> None:
+    if settings.OPENAPI_SCHEMA_FILE is not None:
+        load_openapi_schema(app, settings.OPENAPI_SCHEMA_FILE)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = ArgumentParser(description='Gera o openapi.json da API, para ser servido sem gerá-lo em cada processo')
+    parser.add_argument('output', type=Path, help='arquivo de saída, apontado depois por OPENAPI_SCHEMA_FILE')
+    args = parser.parse_args(argv)
+
+    # Importado aqui porque a própria aplicação usa este módulo.
+    from .api import app
+
+    write_openapi_schema(app, args.output)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
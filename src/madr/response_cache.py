@@ -0,0 +1,143 @@
+import math
+from abc import ABC, abstractmethod
+from collections import Counter
+from dataclasses import dataclass
+from hashlib import sha256
+from time import monotonic
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from fastapi import Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+from .cache import NegativeCache, TTLCache
+from .schemas import ResponseCacheStats
+from .settings import get_settings
+
+
+class CacheBackend(ABC):
+    """Armazenamento das respostas; um backend externo (Redis, Memcached) compartilha o cache entre workers."""
+
+    @abstractmethod
+    async def get(self, key: str, /) -> bytes | None: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, /, *, ttl: float | None = None) -> None:
+        """Armazena o valor por `ttl` segundos, ou sem expiração se `None`."""
+
+    @abstractmethod
+    async def clear(self) -> None: ...
+
+
+class MemoryCacheBackend(CacheBackend):
+    """LRU em memória do processo; com vários workers, cada um tem o seu cache e vê só as próprias invalidações."""
+
+    def __init__(self, *, maxsize: int) -> None:
+        self.cache: TTLCache[str, bytes] = TTLCache(maxsize=maxsize, ttl=math.inf)
+
+    async def get(self, key: str, /) -> bytes | None:
+        return self.cache.get(key)
+
+    async def set(self, key: str, value: bytes, /, *, ttl: float | None = None) -> None:
+        self.cache.set(key, value, ttl=ttl)
+
+    async def clear(self) -> None:
+        self.cache.clear()
+
+
+@dataclass(frozen=True, kw_only=True)
+class CacheKey:
+    route: str
+    key: str
+
+
+class ResponseCache:
+    """Cache das respostas JSON das listagens, por rota e parâmetros de consulta normalizados.
+
+    As chaves incluem a geração atual da rota, e invalidar a rota troca a geração: as respostas anteriores ficam
+    inalcançáveis de uma vez, sem varrer o backend, e saem dele pelo TTL ou pelo LRU. Como a chave é montada antes
+    da consulta, uma resposta calculada durante uma invalidação é gravada na geração antiga e nunca é servida.
+
+    Por `primary_window` segundos após uma invalidação feita neste processo, `refill_from_primary` indica que a rota
+    deve recalcular suas respostas no primário: uma réplica que ainda não recebeu a escrita gravaria no cache a
+    resposta anterior a ela.
+    """
+
+    def __init__(
+        self, backend: CacheBackend, *, ttl: float, primary_window: float = 0, max_query_length: int = 256
+    ) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.primary_window = primary_window
+        self.max_query_length = max_query_length
+        self.invalidated_at: dict[str, float] = {}
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+
+    async def _generation(self, route: str, /) -> str:
+        key = f'{route}:generation'
+        if (generation := await self.backend.get(key)) is None:
+            # Geração descartada pelo backend: uma nova, para não reaproveitar respostas de gerações passadas.
+            generation = uuid4().hex.encode()
+            await self.backend.set(key, generation)
+        return generation.decode()
+
+    async def key(self, route: str, /, **params: object) -> CacheKey:
+        """Parâmetros ausentes são omitidos e os demais ordenados, para que consultas equivalentes dividam a chave.
+
+        Consultas longas, como um filtro de texto enorme, entram na chave pelo seu hash, que tem tamanho fixo.
+        """
+        query = urlencode(sorted((name, value) for name, value in params.items() if value is not None))
+        if len(query) > self.max_query_length:
+            query = sha256(query.encode()).hexdigest()
+        return CacheKey(route=route, key=f'{route}:{await self._generation(route)}:{query}')
+
+    async def get(self, key: CacheKey, /) -> Response | None:
+        body = await self.backend.get(key.key)
+        if body is None:
+            self.misses[key.route] += 1
+            return None
+
+        self.hits[key.route] += 1
+        return Response(body, media_type='application/json')
+
+    async def set(self, key: CacheKey, model: BaseModel, /) -> Response:
+        body = to_json(model)
+        await self.backend.set(key.key, body, ttl=self.ttl)
+        return Response(body, media_type='application/json')
+
+    async def invalidate(self, *routes: str) -> None:
+        for route in routes:
+            await self.backend.set(f'{route}:generation', uuid4().hex.encode())
+            self.invalidated_at[route] = monotonic()
+
+    def refill_from_primary(self, route: str, /) -> bool:
+        return monotonic() < self.invalidated_at.get(route, -math.inf) + self.primary_window
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+        self.hits.clear()
+        self.misses.clear()
+        self.invalidated_at.clear()
+
+    def stats(self) -> dict[str, ResponseCacheStats]:
+        return {
+            route: ResponseCacheStats(
+                hits=self.hits[route],
+                misses=self.misses[route],
+                hit_ratio=self.hits[route] / (self.hits[route] + self.misses[route]),
+            )
+            for route in sorted(self.hits.keys() | self.misses.keys())
+        }
+
+
+settings = get_settings()
+response_cache = ResponseCache(
+    MemoryCacheBackend(maxsize=settings.RESPONSE_CACHE_SIZE),
+    ttl=settings.RESPONSE_CACHE_TTL,
+    primary_window=settings.RESPONSE_CACHE_PRIMARY_WINDOW,
+)
+# Ids de livros e romancistas buscados e não encontrados; as criações os removem do cache do recurso correspondente.
+missing_livros = NegativeCache(maxsize=settings.MISSING_ID_CACHE_SIZE, ttl=settings.MISSING_ID_CACHE_TTL)
+missing_romancistas = NegativeCache(maxsize=settings.MISSING_ID_CACHE_SIZE, ttl=settings.MISSING_ID_CACHE_TTL)
@@ -0,0 +1,158 @@
+import inspect
+from argparse import ArgumentParser
+from collections.abc import Awaitable, Callable, Sequence
+from functools import wraps
+from http import HTTPStatus
+from statistics import median
+from time import perf_counter
+from typing import Any, cast
+
+from fastapi import Response
+from fastapi.datastructures import Default, DefaultPlaceholder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+
+from .schemas import LivroList, LivroPublic
+
+# Parâmetro acrescentado pela `FastJSONRoute` aos endpoints sem um parâmetro `Response` próprio.
+SUB_RESPONSE_PARAMETER = 'fast_json_sub_response'
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON codificado pelo pydantic-core; conteúdo em bytes é tomado como JSON já serializado pela `FastJSONRoute`."""
+
+    def render(self, content: object) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return to_json(content)
+
+
+class FastJSONRoute(APIRoute):
+    """Rota que entrega o modelo de resposta serializado uma vez só.
+
+    Por padrão o FastAPI converte o modelo validado num dict de tipos JSON e o `JSONResponse` codifica esse dict de
+    novo com o módulo `json`. Quando a resposta é uma `FastJSONResponse`, o endpoint é envolvido por uma função que
+    valida o retorno e o serializa direto para bytes com um `TypeAdapter` do modelo, criado uma vez por rota; o
+    FastAPI recebe a resposta pronta e a envia sem recodificar.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:  # noqa: ANN401
+        response_model = kwargs.get('response_model', Default(None))
+        if isinstance(response_model, DefaultPlaceholder):
+            response_model = get_return_model(endpoint)
+        response_class = kwargs.get('response_class', Default(JSONResponse))
+        if isinstance(response_class, DefaultPlaceholder):
+            response_class = response_class.value
+        if (
+            response_model is None
+            or not issubclass(response_class, FastJSONResponse)
+            or not inspect.iscoroutinefunction(endpoint)
+        ):
+            super().__init__(path, endpoint, **kwargs)
+            return
+
+        wrapped = self.serialize_response(endpoint, TypeAdapter(response_model), response_class)
+        super().__init__(path, wrapped, **{**kwargs, 'response_model': response_model})
+        # A rota continua identificada pelo endpoint original, por exemplo ao ser incluída em outro router.
+        self.endpoint = endpoint
+
+    def serialize_response(
+        self, endpoint: Callable[..., Awaitable[Any]], adapter: TypeAdapter[Any], response_class: type[Response], /
+    ) -> Callable[..., Awaitable[Any]]:
+        # O FastAPI entrega a resposta temporária, com o status e os cabeçalhos definidos pelo endpoint, a um único
+        # parâmetro: o do próprio endpoint, se houver, ou um acrescentado aqui.
+        signature = inspect.signature(endpoint, eval_str=True)
+        response_parameter = next(
+            (
+                name
+                for name, parameter in signature.parameters.items()
+                if isinstance(parameter.annotation, type) and issubclass(parameter.annotation, Response)
+            ),
+            None,
+        )
+
+        @wraps(endpoint)
+        async def serialized(*args: object, **kwargs: object) -> object:
+            if response_parameter is None:
+                sub_response = cast(Response, kwargs.pop(SUB_RESPONSE_PARAMETER))
+            else:
+                sub_response = cast(Response, kwargs[response_parameter])
+            content = await endpoint(*args, **kwargs)
+            if isinstance(content, Response):
+                return content
+            body = adapter.dump_json(
+                adapter.validate_python(content, from_attributes=True),
+                include=self.response_model_include,
+                exclude=self.response_model_exclude,
+                by_alias=self.response_model_by_alias,
+                exclude_unset=self.response_model_exclude_unset,
+                exclude_defaults=self.response_model_exclude_defaults,
+                exclude_none=self.response_model_exclude_none,
+            )
+            response = response_class(body, status_code=sub_response.status_code or self.status_code or HTTPStatus.OK)
+            response.headers.raw.extend(sub_response.headers.raw)
+            return response
+
+        if response_parameter is None:
+            parameter = inspect.Parameter(SUB_RESPONSE_PARAMETER, inspect.Parameter.KEYWORD_ONLY, annotation=Response)
+            serialized.__signature__ = signature.replace(  # type: ignore[attr-defined]
+                parameters=[*signature.parameters.values(), parameter]
+            )
+        return serialized
+
+
+def get_return_model(endpoint: Callable[..., Any], /) -> object:
+    """O modelo que o FastAPI deduziria da anotação de retorno, ou `None` se o endpoint retorna uma `Response`."""
+    annotation = inspect.signature(endpoint, eval_str=True).return_annotation
+    if annotation is inspect.Signature.empty or (isinstance(annotation, type) and issubclass(annotation, Response)):
+        return None
+    return annotation
+
+
+def sample_livro_list(rows: int, /) -> LivroList:
+    return LivroList(
+        livros=[
+            LivroPublic(id=i, title=f'livro {i}', year=1900 + i % 100, romancista_id=i % 50 + 1)
+            for i in range(1, rows + 1)
+        ],
+        next_cursor=None,
+    )
+
+
+def measure_render(
+    render: Callable[[LivroList], Response], content: LivroList, /, *, samples: int
+) -> tuple[bytes, float]:
+    times = []
+    for _ in range(samples):
+        start = perf_counter()
+        body = bytes(render(content).body)
+        times.append(perf_counter() - start)
+    return body, median(times)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = ArgumentParser(description='Compara a serialização padrão do FastAPI com a FastJSONResponse')
+    parser.add_argument('--rows', type=int, default=1000, help='livros na página de exemplo')
+    parser.add_argument('--samples', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    content = sample_livro_list(args.rows)
+    adapter = TypeAdapter(LivroList)
+
+    # O caminho padrão do FastAPI: dict de tipos JSON, codificado depois pelo `JSONResponse`.
+    default_body, default_time = measure_render(
+        lambda content: JSONResponse(adapter.dump_python(content, mode='json')), content, samples=args.samples
+    )
+    fast_body, fast_time = measure_render(
+        lambda content: FastJSONResponse(adapter.dump_json(content)), content, samples=args.samples
+    )
+
+    print(f'# {args.rows} livros, {len(fast_body)} bytes')  # noqa: T201
+    print(f'JSONResponse: {default_time * 1000:.2f} ms ({len(default_body)} bytes)')  # noqa: T201
+    print(f'FastJSONResponse: {fast_time * 1000:.2f} ms ({default_time / fast_time:.1f}x)')  # noqa: T201
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,112 @@
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+from time import monotonic
+
+import sqlalchemy as sa
+from sqlalchemy import Row
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import BloomFilter
+from .models import RevokedToken
+
+
+class RevocationList:
+    """Ids de tokens revogados, num filtro de Bloom em memória persistido na tabela `revoked_tokens`.
+
+    A tabela só é consultada quando o filtro acusa algum dos ids, seja revogado de fato ou falso positivo.
+    O filtro é carregado da tabela no primeiro uso, com a sessão da requisição, e depois recebe a cada
+    `sync_interval` segundos as revogações feitas por outros processos.
+    """
+
+    # Transações que terminam fora de ordem podem gravar `created_at` anterior ao da última sincronização.
+    sync_overlap = timedelta(minutes=1)
+
+    def __init__(self, *, capacity: int, error_rate: float, sync_interval: float = 5) -> None:
+        self.bloom = BloomFilter(capacity=capacity, error_rate=error_rate)
+        self.sync_interval = sync_interval
+        self.loaded = False
+        self.synced_at: datetime | None = None
+        self.next_sync = 0.0
+
+    def _add(self, rows: Sequence[Row[tuple[str, datetime]]], /) -> None:
+        for token_id, created_at in rows:
+            if token_id not in self.bloom:
+                self.bloom.add(token_id)
+            if self.synced_at is None or created_at > self.synced_at:
+                self.synced_at = created_at
+        self.next_sync = monotonic() + self.sync_interval
+
+    async def load(self, session: AsyncSession, /) -> None:
+        """Reconstrói o filtro a partir da tabela, descartando as revogações de tokens já expirados."""
+        await session.execute(sa.delete(RevokedToken).where(RevokedToken.expires_at < sa.func.now()))
+        rows = (await session.execute(sa.select(RevokedToken.id, RevokedToken.created_at))).all()
+        await session.commit()
+
+        self.bloom.clear()
+        self.synced_at = None
+        self._add(rows)
+        self.loaded = True
+
+    async def sync(self, session: AsyncSession, /) -> None:
+        if len(self.bloom) >= self.bloom.capacity:
+            await self.load(session)
+            return
+
+        query = sa.select(RevokedToken.id, RevokedToken.created_at)
+        if self.synced_at is not None:
+            query = query.where(RevokedToken.created_at >= self.synced_at - self.sync_overlap)
+        self._add((await session.execute(query)).all())
+
+    async def is_revoked(self, session: AsyncSession, /, *token_ids: str) -> bool:
+        if not self.loaded:
+            await self.load(session)
+        elif monotonic() >= self.next_sync:
+            await self.sync(session)
+
+        candidates = [token_id for token_id in token_ids if token_id in self.bloom]
+        if not candidates:
+            return False
+        return (
+            await session.scalar(sa.select(RevokedToken.id).where(RevokedToken.id.in_(candidates)).limit(1))
+            is not None
+        )
+
+    async def revoke(self, session: AsyncSession, token_id: str, /, *, expires_at: datetime) -> None:
+        await session.execute(
+            insert(RevokedToken)
+            .values(id=token_id, expires_at=expires_at)
+            .on_conflict_do_nothing(index_elements=['id'])
+        )
+        await session.commit()
+        self.bloom.add(token_id)
+
+    async def consume(self, session: AsyncSession, token_id: str, /, *, family: str, expires_at: datetime) -> bool:
+        """Revoga um refresh token no seu uso, retornando `False` se já tinha sido usado ou sua família revogada.
+
+        A checagem e a revogação são um único INSERT, então dois usos simultâneos do mesmo token não passam juntos.
+        """
+        if await self.is_revoked(session, token_id, family):
+            return False
+
+        family_revoked = sa.exists().where(RevokedToken.id == family)
+        inserted = await session.scalar(
+            insert(RevokedToken)
+            .from_select(
+                ['id', 'expires_at'],
+                sa.select(sa.literal(token_id), sa.literal(expires_at, sa.DateTime(timezone=True))).where(
+                    ~family_revoked
+                ),
+            )
+            .on_conflict_do_nothing(index_elements=['id'])
+            .returning(RevokedToken.id)
+        )
+        await session.commit()
+        self.bloom.add(token_id)
+        return inserted is not None
+
+    def clear(self) -> None:
+        self.bloom.clear()
+        self.loaded = False
+        self.synced_at = None
+        self.next_sync = 0.0
@@ -2,16 +2,29 @@ from http import HTTPStatus
 from typing import Annotated
 
 import sqlalchemy as sa
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from fastapi.security import OAuth2PasswordRequestForm
 
 from madr.database import T_DbSession
-from madr.errors import InvalidLoginError
+from madr.errors import InvalidLoginError, UnauthorizedError
 from madr.models import User
-from madr.schemas import Token
-from madr.security import T_CurrentUser, create_access_token, verify_password
+from madr.responses import FastJSONRoute
+from madr.schemas import Message, RefreshTokenSchema, Token
+from madr.security import (
+    T_CurrentUser,
+    T_Token,
+    check_and_update_password,
+    create_access_token,
+    create_refresh_token,
+    decode_refresh_token,
+    login_throttle,
+    password_verification_gate,
+    revoke_access_token,
+    revoke_refresh_token_family,
+    rotate_refresh_token,
+)
 
-router = APIRouter(tags=['Auth'])
+router = APIRouter(tags=['Auth'], route_class=FastJSONRoute)
 
 T_OAuth2Form = Annotated[OAuth2PasswordRequestForm, Depends()]
 
@@ -21,14 +34,31 @@ T_OAuth2Form = Annotated[OAuth2PasswordRequestForm, Depends()]
     summary='Entra no sistema e gera token de acesso',
     status_code=HTTPStatus.OK,
 )
-def login_for_access_token(dbsession: T_DbSession, form_data: T_OAuth2Form) -> Token:
-    user = dbsession.scalar(
-        sa.select(User).where(sa.or_(User.email == form_data.username, User.username == form_data.username))
-    )
-    if not user or not verify_password(form_data.password, user.password):
+async def login_for_access_token(request: Request, dbsession: T_DbSession, form_data: T_OAuth2Form) -> Token:
+    await login_throttle.check(ip=request.client.host if request.client else None, username=form_data.username)
+
+    # Um ramo por índice: com OR o planejador pode cair num BitmapOr ou numa leitura sequencial da tabela.
+    lookup = sa.union_all(
+        sa.select(User).where(sa.func.lower(User.email) == sa.func.lower(form_data.username)),
+        sa.select(User).where(User.username == form_data.username),
+    ).limit(1)
+    user = await dbsession.scalar(sa.select(User).from_statement(lookup))
+    if not user:
+        raise InvalidLoginError
+    async with password_verification_gate.admit():
+        valid, updated_hash = await check_and_update_password(form_data.password, user.password)
+    if not valid:
         raise InvalidLoginError
 
-    return Token(access_token=create_access_token(email=user.email))
+    token = Token(
+        access_token=create_access_token(user_id=user.id, token_version=user.token_version),
+        refresh_token=create_refresh_token(user_id=user.id, token_version=user.token_version),
+    )
+    if updated_hash:
+        user.password = updated_hash
+        await dbsession.commit()
+
+    return token
 
 
 @router.post(
@@ -36,5 +66,31 @@ def login_for_access_token(dbsession: T_DbSession, form_data: T_OAuth2Form) -> T
     summary='Atualiza token de acesso',
     status_code=HTTPStatus.OK,
 )
-def refresh_access_token(user: T_CurrentUser) -> Token:
-    return Token(access_token=create_access_token(email=user.email))
+async def refresh_access_token(user: T_CurrentUser) -> Token:
+    return Token(access_token=create_access_token(user_id=user.id, token_version=user.token_version))
+
+
+@router.post(
+    '/token/refresh',
+    summary='Troca o refresh token por novos tokens de acesso e de atualização',
+    status_code=HTTPStatus.OK,
+)
+async def refresh_tokens(dbsession: T_DbSession, body: RefreshTokenSchema) -> Token:
+    access_token, refresh_token = await rotate_refresh_token(dbsession, body.refresh_token)
+    return Token(access_token=access_token, refresh_token=refresh_token)
+
+
+@router.post(
+    '/logout',
+    summary='Sai do sistema, revogando o token de acesso e, se informado, o refresh token',
+    status_code=HTTPStatus.OK,
+)
+async def logout(dbsession: T_DbSession, token: T_Token, body: RefreshTokenSchema | None = None) -> Message:
+    payload = await revoke_access_token(dbsession, token)
+    if body:
+        refresh_payload = decode_refresh_token(body.refresh_token)
+        if refresh_payload['sub'] != payload['sub']:
+            raise UnauthorizedError
+        await revoke_refresh_token_family(dbsession, refresh_payload['fam'])
+
+    return Message(message='Logout realizado com sucesso')
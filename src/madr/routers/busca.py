@@ -0,0 +1,55 @@
+from http import HTTPStatus
+
+import sqlalchemy as sa
+from fastapi import APIRouter, Query
+
+from madr.database import T_ReadDbSession
+from madr.models import Livro, Romancista
+from madr.responses import FastJSONRoute
+from madr.schemas import BuscaList
+
+router = APIRouter(prefix='/busca', tags=['Busca'], route_class=FastJSONRoute)
+
+
+@router.get(
+    '/',
+    summary='Busca livros e romancistas no MADR',
+    status_code=HTTPStatus.OK,
+)
+async def busca(
+    dbsession: T_ReadDbSession,
+    q: str = Query(min_length=1),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=0),
+) -> BuscaList:
+    # Cada ramo é limitado a offset + limit para que a ordenação final trabalhe só com os melhores candidatos
+    # de cada tabela, em vez de ordenar todos os documentos que casam com a consulta.
+    livro_query = sa.func.websearch_to_tsquery('portuguese', q)
+    livro_rank = sa.func.ts_rank(Livro.search_vector, livro_query)
+    livros = (
+        sa.select(sa.literal('livro').label('kind'), Livro.id, Livro.title.label('text'), livro_rank.label('rank'))
+        .where(Livro.search_vector.bool_op('@@')(livro_query))
+        .order_by(livro_rank.desc())
+        .limit(offset + limit)
+    )
+
+    romancista_query = sa.func.websearch_to_tsquery('simple', q)
+    romancista_rank = sa.func.ts_rank(Romancista.search_vector, romancista_query)
+    romancistas = (
+        sa.select(
+            sa.literal('romancista').label('kind'),
+            Romancista.id,
+            Romancista.name.label('text'),
+            romancista_rank.label('rank'),
+        )
+        .where(Romancista.search_vector.bool_op('@@')(romancista_query))
+        .order_by(romancista_rank.desc())
+        .limit(offset + limit)
+    )
+
+    hits = sa.union_all(livros, romancistas).subquery()
+    query = sa.select(hits).order_by(hits.c.rank.desc(), hits.c.kind, hits.c.id).offset(offset).limit(limit)
+
+    result = await dbsession.execute(query)
+
+    return BuscaList.model_validate({'hits': result.mappings().all()})
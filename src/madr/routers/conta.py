@@ -6,10 +6,11 @@ from sqlalchemy.exc import IntegrityError
 from madr.database import T_DbSession
 from madr.errors import ConflictError, UnauthorizedError
 from madr.models import User
+from madr.responses import FastJSONRoute
 from madr.schemas import Message, UserPublic, UserSchema
-from madr.security import T_CurrentUser
+from madr.security import T_CurrentUser, check_password, hash_password, revoke_user_tokens, user_revocation_id
 
-router = APIRouter(prefix='/conta', tags=['Conta'])
+router = APIRouter(prefix='/conta', tags=['Conta'], route_class=FastJSONRoute)
 
 
 @router.post(
@@ -17,16 +18,16 @@ router = APIRouter(prefix='/conta', tags=['Conta'])
     summary='Cria conta no MADR',
     status_code=HTTPStatus.CREATED,
 )
-def create_user(dbsession: T_DbSession, user: UserSchema) -> UserPublic:
-    db_user = User(email=user.email, username=user.username, password=user.password)
+async def create_user(dbsession: T_DbSession, user: UserSchema) -> UserPublic:
+    db_user = User(email=user.email, username=user.username, password=await hash_password(user.password))
     dbsession.add(db_user)
     try:
-        dbsession.commit()
+        await dbsession.commit()
     except IntegrityError as e:
         if e.orig.__class__.__name__ == 'UniqueViolation':
             raise ConflictError(resource='Conta') from None
         raise  # pragma: no cover
-    dbsession.refresh(db_user)
+    await dbsession.refresh(db_user)
 
     return UserPublic.model_validate(db_user)
 
@@ -36,22 +37,38 @@ def create_user(dbsession: T_DbSession, user: UserSchema) -> UserPublic:
     summary='Atualiza conta no MADR',
     status_code=HTTPStatus.OK,
 )
-def update_user(dbsession: T_DbSession, current_user: T_CurrentUser, user: UserSchema, user_id: int) -> UserPublic:
+async def update_user(
+    dbsession: T_DbSession, current_user: T_CurrentUser, user: UserSchema, user_id: int
+) -> UserPublic:
     if current_user.id != user_id:
         raise UnauthorizedError
 
-    current_user.email = user.email
-    current_user.username = user.username
-    current_user.password = user.password
+    db_user = await dbsession.get(User, user_id)
+    if not db_user:
+        raise UnauthorizedError
+
+    # Trocar a senha invalida os tokens emitidos antes da troca, inclusive os antigos que identificam o usuário pelo
+    # email, e trocar o email invalida esses antigos; a revogação chega aos demais processos pela lista de revogação.
+    token_ids = []
+    password_changed = not await check_password(user.password, db_user.password)
+    if password_changed:
+        token_ids.append(user_revocation_id(str(db_user.id), db_user.token_version))
+        db_user.token_version += 1
+    if password_changed or user.email.lower() != db_user.email.lower():
+        token_ids.append(user_revocation_id(db_user.email))
+    db_user.email = user.email
+    db_user.username = user.username
+    db_user.password = await hash_password(user.password)
     try:
-        dbsession.commit()
+        await dbsession.commit()
     except IntegrityError as e:
         if e.orig.__class__.__name__ == 'UniqueViolation':
             raise ConflictError(resource='Conta') from None
         raise  # pragma: no cover
-    dbsession.refresh(current_user)
+    await revoke_user_tokens(dbsession, current_user, *token_ids)
+    await dbsession.refresh(db_user)
 
-    return UserPublic.model_validate(current_user)
+    return UserPublic.model_validate(db_user)
 
 
 @router.delete(
@@ -59,11 +76,18 @@ def update_user(dbsession: T_DbSession, current_user: T_CurrentUser, user: UserS
     summary='Remove conta no MADR',
     status_code=HTTPStatus.OK,
 )
-def delete_user(dbsession: T_DbSession, current_user: T_CurrentUser, user_id: int) -> Message:
+async def delete_user(dbsession: T_DbSession, current_user: T_CurrentUser, user_id: int) -> Message:
     if current_user.id != user_id:
         raise UnauthorizedError
 
-    dbsession.delete(current_user)
-    dbsession.commit()
+    db_user = await dbsession.get(User, user_id)
+    if not db_user:
+        raise UnauthorizedError
+
+    await dbsession.delete(db_user)
+    await dbsession.commit()
+    await revoke_user_tokens(
+        dbsession, current_user, user_revocation_id(str(current_user.id)), user_revocation_id(current_user.email)
+    )
 
     return Message(message='Conta deletada com sucesso')
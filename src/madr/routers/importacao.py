@@ -0,0 +1,61 @@
+from collections.abc import AsyncIterator, Iterator
+from http import HTTPStatus
+from typing import Annotated
+
+import anyio.from_thread
+import psycopg
+from fastapi import APIRouter, Query, Request
+from starlette.concurrency import run_in_threadpool
+
+from madr.database import T_DbSession
+from madr.importacao import T_ImportFormat, import_catalog, iter_lines, to_conninfo
+from madr.response_cache import missing_livros, missing_romancistas, response_cache
+from madr.responses import FastJSONRoute
+from madr.schemas import ImportResult
+from madr.security import T_CurrentUserId
+
+router = APIRouter(prefix='/importacao', tags=['Importação'], route_class=FastJSONRoute)
+
+
+def iter_from_async(chunks: AsyncIterator[bytes], /) -> Iterator[bytes]:
+    async def receive() -> bytes:
+        return await anext(chunks)
+
+    while True:
+        try:
+            yield anyio.from_thread.run(receive)
+        except StopAsyncIteration:
+            return
+
+
+@router.post(
+    '/',
+    summary='Importa catálogo de romancistas e livros no MADR',
+    status_code=HTTPStatus.OK,
+    openapi_extra={
+        'requestBody': {
+            'required': True,
+            'content': {'text/csv': {}, 'application/x-ndjson': {}},
+        },
+    },
+)
+async def import_catalogo(
+    request: Request,
+    dbsession: T_DbSession,
+    _user_id: T_CurrentUserId,
+    file_format: Annotated[T_ImportFormat, Query(alias='format')] = 'csv',
+) -> ImportResult:
+    # A importação usa uma conexão própria durante toda a carga, sem prender uma conexão do pool.
+    conninfo = to_conninfo(dbsession.get_bind().engine.url)
+    await dbsession.close()
+
+    def run() -> ImportResult:
+        with psycopg.connect(conninfo) as conn:
+            return import_catalog(conn, iter_lines(iter_from_async(request.stream())), file_format)
+
+    result = await run_in_threadpool(run)
+    # Os ids criados pela importação não são conhecidos aqui.
+    missing_livros.invalidate()
+    missing_romancistas.invalidate()
+    await response_cache.invalidate('livros', 'romancistas')
+    return result
@@ -1,17 +1,33 @@
 from http import HTTPStatus
+from typing import Annotated
 
 import sqlalchemy as sa
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Body, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 
-from madr.database import T_DbSession
+from madr.conditional import check_not_modified, is_conditional, set_validators
+from madr.database import T_DbSession, T_PrimarySessionFactory, T_ReadDbSession, T_ReadSessionFactory
 from madr.errors import ConflictError, NotFoundError
+from madr.exportacao import T_ExportFormat, export_response
 from madr.models import Livro, Romancista
-from madr.schemas import NO_ARG, LivroList, LivroPatch, LivroPublic, LivroSchema, Message
-from madr.security import T_CurrentUser
-from madr.utils import sanitize
+from madr.response_cache import missing_livros, response_cache
+from madr.responses import FastJSONRoute
+from madr.schemas import (
+    NO_ARG,
+    LivroBulkItem,
+    LivroBulkResult,
+    LivroList,
+    LivroPatch,
+    LivroPublic,
+    LivroSchema,
+    Message,
+)
+from madr.security import T_CurrentUserId
+from madr.utils import decode_cursor, encode_cursor, sanitize
 
-router = APIRouter(prefix='/livro', tags=['Livro'])
+router = APIRouter(prefix='/livro', tags=['Livro'], route_class=FastJSONRoute)
 
 
 @router.post(
@@ -19,34 +35,119 @@ router = APIRouter(prefix='/livro', tags=['Livro'])
     summary='Cria livro no MADR',
     status_code=HTTPStatus.CREATED,
 )
-def create_livro(dbsession: T_DbSession, _user: T_CurrentUser, livro: LivroSchema) -> LivroPublic:
-    db_romancista = dbsession.scalar(sa.select(Romancista).where(Romancista.id == livro.romancista_id))
+async def create_livro(dbsession: T_DbSession, _user_id: T_CurrentUserId, livro: LivroSchema) -> LivroPublic:
+    db_romancista = await dbsession.scalar(sa.select(Romancista).where(Romancista.id == livro.romancista_id))
     if not db_romancista:
         raise NotFoundError(resource='Romancista')
 
     db_livro = Livro(title=livro.title, year=livro.year, romancista=db_romancista)
     dbsession.add(db_livro)
     try:
-        dbsession.commit()
+        await dbsession.commit()
     except IntegrityError as e:
         if e.orig.__class__.__name__ == 'UniqueViolation':
             raise ConflictError(resource='Livro') from None
+        if e.orig.__class__.__name__ == 'ForeignKeyViolation':
+            raise NotFoundError(resource='Romancista') from None
         raise  # pragma: no cover
-    dbsession.refresh(db_livro)
+    await response_cache.invalidate('livros')
+    await dbsession.refresh(db_livro)
+    missing_livros.discard(db_livro.id)
 
     return LivroPublic.model_validate(db_livro)
 
 
+@router.post(
+    '/bulk',
+    summary='Cria livros em lote no MADR',
+    status_code=HTTPStatus.OK,
+)
+async def create_livros_bulk(
+    dbsession: T_DbSession,
+    _user_id: T_CurrentUserId,
+    livros: Annotated[list[LivroSchema], Body(min_length=1, max_length=10_000)],
+) -> LivroBulkResult:
+    romancista_ids = set(
+        await dbsession.scalars(
+            sa.select(Romancista.id).where(Romancista.id.in_({livro.romancista_id for livro in livros}))
+        )
+    )
+
+    # Títulos repetidos no próprio lote são inseridos uma única vez; as demais ocorrências viram conflito.
+    rows: dict[str, dict[str, object]] = {}
+    for livro in livros:
+        if livro.romancista_id in romancista_ids:
+            rows.setdefault(livro.title, livro.model_dump())
+
+    created = {}
+    try:
+        if rows:
+            result = await dbsession.execute(
+                insert(Livro)
+                .on_conflict_do_nothing(index_elements=[Livro.title])
+                .returning(Livro.id, Livro.title, Livro.year, Livro.romancista_id),
+                list(rows.values()),
+            )
+            created = {row.title: row for row in result}
+        await dbsession.commit()
+    except IntegrityError as e:
+        # Um romancista removido depois da consulta acima derruba o lote inteiro, como na criação de um só livro.
+        if e.orig.__class__.__name__ == 'ForeignKeyViolation':
+            raise NotFoundError(resource='Romancista') from None
+        raise  # pragma: no cover
+    if created:
+        missing_livros.discard(*(row.id for row in created.values()))
+        await response_cache.invalidate('livros')
+
+    results = []
+    for livro in livros:
+        if livro.romancista_id not in romancista_ids:
+            results.append(LivroBulkItem(status='not_found', message=NotFoundError(resource='Romancista').message))
+        elif row := created.pop(livro.title, None):
+            results.append(LivroBulkItem(status='created', livro=LivroPublic.model_validate(row)))
+        else:
+            results.append(LivroBulkItem(status='conflict', message=ConflictError(resource='Livro').message))
+
+    return LivroBulkResult(results=results)
+
+
+@router.get(
+    '/export',
+    summary='Exporta todos os livros do MADR',
+    status_code=HTTPStatus.OK,
+)
+async def export_livros(
+    session_factory: T_ReadSessionFactory,
+    file_format: Annotated[T_ExportFormat, Query(alias='format')] = 'ndjson',
+) -> StreamingResponse:
+    query = sa.select(Livro.id, Livro.title, Livro.year, Livro.romancista_id).order_by(Livro.id)
+    return export_response(session_factory, query, file_format, filename='livros')
+
+
 @router.get(
     '/{livro_id}',
     summary='Recupera livro pelo id no MADR',
     status_code=HTTPStatus.OK,
 )
-def get_livro(dbsession: T_DbSession, livro_id: int) -> LivroPublic:
-    db_livro = dbsession.scalar(sa.select(Livro).where(Livro.id == livro_id))
+async def get_livro(dbsession: T_ReadDbSession, livro_id: int, request: Request, response: Response) -> LivroPublic:
+    if missing_livros.get(livro_id):
+        raise NotFoundError(resource='Livro')
+    generation = missing_livros.generation
+
+    # Revalidações consultam só o updated_at; a linha completa é carregada apenas se o cliente precisar dela.
+    if is_conditional(request):
+        updated_at = await dbsession.scalar(sa.select(Livro.updated_at).where(Livro.id == livro_id))
+        if updated_at is None:
+            missing_livros.add(livro_id, generation=generation)
+            raise NotFoundError(resource='Livro')
+        check_not_modified(request, livro_id, updated_at)
+
+    db_livro = await dbsession.scalar(sa.select(Livro).where(Livro.id == livro_id))
     if not db_livro:
+        missing_livros.add(livro_id, generation=generation)
         raise NotFoundError(resource='Livro')
 
+    set_validators(response, db_livro.id, db_livro.updated_at)
     return LivroPublic.model_validate(db_livro)
 
 
@@ -54,24 +155,46 @@ def get_livro(dbsession: T_DbSession, livro_id: int) -> LivroPublic:
     '/',
     summary='Lista livros no MADR',
     status_code=HTTPStatus.OK,
+    response_model=LivroList,
 )
-def list_livros(
-    dbsession: T_DbSession,
+async def list_livros(  # noqa: PLR0913
+    session_factory: T_ReadSessionFactory,
+    primary_session_factory: T_PrimarySessionFactory,
     title: str | None = Query(None),
     year: int | None = Query(None),
     offset: int | None = Query(None),
-    limit: int | None = Query(20),
-) -> LivroList:
-    query = sa.select(Livro)
+    limit: int = Query(20),
+    cursor: str | None = Query(None),
+) -> Response:
+    # Normalizado antes da chave, para que buscas equivalentes dividam a mesma entrada do cache.
+    title = sanitize(title or '') or None
+    cache_key = await response_cache.key('livros', title=title, year=year, offset=offset, limit=limit, cursor=cursor)
+    if cached := await response_cache.get(cache_key):
+        return cached
+
+    query = sa.select(Livro).order_by(Livro.id)
 
     if title:
-        query = query.filter(Livro.title.contains(sanitize(title)))
+        query = query.filter(Livro.title.contains(title))
     if year:
         query = query.filter(Livro.year == year)
 
-    livros = dbsession.scalars(query.offset(offset).limit(limit)).all()
+    if cursor:
+        query = query.filter(Livro.id > decode_cursor(cursor))
+
+    # Logo após uma escrita deste processo, uma réplica atrasada gravaria no cache a listagem anterior a ela.
+    if response_cache.refill_from_primary('livros'):
+        session_factory = primary_session_factory
+    async with session_factory() as dbsession:
+        livros = (await dbsession.scalars(query.offset(offset).limit(limit + 1))).all()
+
+    has_next = len(livros) > limit
+    livros = livros[:limit]
+    next_cursor = encode_cursor(livros[-1].id) if has_next and livros else None
 
-    return LivroList.model_validate({'livros': livros})
+    return await response_cache.set(
+        cache_key, LivroList.model_validate({'livros': livros, 'next_cursor': next_cursor})
+    )
 
 
 @router.patch(
@@ -79,8 +202,10 @@ def list_livros(
     summary='Atualiza livro no MADR',
     status_code=HTTPStatus.OK,
 )
-def patch_livro(dbsession: T_DbSession, _user: T_CurrentUser, livro: LivroPatch, livro_id: int) -> LivroPublic:
-    db_livro = dbsession.scalar(sa.select(Livro).where(Livro.id == livro_id))
+async def patch_livro(
+    dbsession: T_DbSession, _user_id: T_CurrentUserId, livro: LivroPatch, livro_id: int
+) -> LivroPublic:
+    db_livro = await dbsession.scalar(sa.select(Livro).where(Livro.id == livro_id))
     if not db_livro:
         raise NotFoundError(resource='Livro')
 
@@ -90,14 +215,15 @@ def patch_livro(dbsession: T_DbSession, _user: T_CurrentUser, livro: LivroPatch,
             continue
         setattr(db_livro, field, value)
     try:
-        dbsession.commit()
+        await dbsession.commit()
     except IntegrityError as e:
         if e.orig.__class__.__name__ == 'UniqueViolation':
             raise ConflictError(resource='Livro') from None
         if e.orig.__class__.__name__ == 'ForeignKeyViolation':
             raise NotFoundError(resource='Romancista') from None
         raise  # pragma: no cover
-    dbsession.refresh(db_livro)
+    await response_cache.invalidate('livros')
+    await dbsession.refresh(db_livro)
 
     return LivroPublic.model_validate(db_livro)
 
@@ -107,11 +233,12 @@ def patch_livro(dbsession: T_DbSession, _user: T_CurrentUser, livro: LivroPatch,
     summary='Romove livro no MADR',
     status_code=HTTPStatus.OK,
 )
-def delete_romancista(dbsession: T_DbSession, _user: T_CurrentUser, livro_id: int) -> Message:
-    deleted_id = dbsession.scalar(sa.delete(Livro).where(Livro.id == livro_id).returning(Livro.id))
+async def delete_romancista(dbsession: T_DbSession, _user_id: T_CurrentUserId, livro_id: int) -> Message:
+    deleted_id = await dbsession.scalar(sa.delete(Livro).where(Livro.id == livro_id).returning(Livro.id))
     if not deleted_id:
         raise NotFoundError(resource='Livro')
 
-    dbsession.commit()
+    await dbsession.commit()
+    await response_cache.invalidate('livros')
 
     return Message(message='Livro deletado com sucesso')
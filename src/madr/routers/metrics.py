@@ -0,0 +1,105 @@
+from http import HTTPStatus
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.pool import Pool, QueuePool
+
+from madr.compression import uncompressed
+from madr.database import PoolWaitTime, WaitTimePoolMixin, get_engine, get_replica_router
+from madr.response_cache import missing_livros, missing_romancistas, response_cache
+from madr.responses import FastJSONRoute
+from madr.schemas import CacheStats, DatabasePoolStats, LoginStats, PoolStats, ResponseCacheStats
+from madr.security import (
+    access_token_cache,
+    current_user_cache,
+    get_current_user_id,
+    login_throttle,
+    password_verification_gate,
+)
+from madr.throttling import AdmissionGate, LoginThrottle
+
+# As métricas descrevem a infraestrutura interna e não devem ser públicas.
+router = APIRouter(
+    prefix='/metrics',
+    tags=['Métricas'],
+    route_class=FastJSONRoute,
+    dependencies=[Depends(get_current_user_id)],
+)
+
+
+def get_pool_stats(pool: Pool, /) -> PoolStats:
+    wait_time = pool.wait_time if isinstance(pool, WaitTimePoolMixin) else PoolWaitTime()
+    queue_pool = pool if isinstance(pool, QueuePool) else None
+
+    return PoolStats(
+        pool_class=pool.__class__.__name__,
+        size=queue_pool.size() if queue_pool else None,
+        checked_out=queue_pool.checkedout() if queue_pool else None,
+        idle=queue_pool.checkedin() if queue_pool else None,
+        overflow=queue_pool.overflow() if queue_pool else None,
+        wait_count=wait_time.count,
+        wait_time_total=wait_time.total,
+        wait_time_max=wait_time.max,
+    )
+
+
+def get_login_stats(throttle: LoginThrottle, gate: AdmissionGate, /) -> LoginStats:
+    return LoginStats(
+        throttled_ip=throttle.throttled_ip,
+        throttled_username=throttle.throttled_username,
+        verifications_active=gate.active,
+        verifications_waiting=gate.waiting,
+        verifications_queued=gate.queued,
+        verifications_rejected=gate.rejected,
+    )
+
+
+@router.get(
+    '/pool',
+    summary='Estatísticas dos pools de conexões com o banco de dados principal e as réplicas',
+    status_code=HTTPStatus.OK,
+)
+@uncompressed
+async def pool_stats() -> DatabasePoolStats:
+    return DatabasePoolStats(
+        **get_pool_stats(get_engine().pool).model_dump(),
+        # As réplicas são identificadas pela posição em DATABASE_REPLICA_URLS, sem expor host ou banco.
+        replicas={
+            f'replica{index}': get_pool_stats(replica.engine.pool)
+            for index, replica in enumerate(get_replica_router().replicas)
+        },
+    )
+
+
+@router.get(
+    '/cache',
+    summary='Estatísticas dos caches em memória',
+    status_code=HTTPStatus.OK,
+)
+@uncompressed
+async def cache_stats() -> dict[str, CacheStats]:
+    return {
+        'current_user': current_user_cache.stats(),
+        'access_token': access_token_cache.stats(),
+        'missing_livros': missing_livros.stats(),
+        'missing_romancistas': missing_romancistas.stats(),
+    }
+
+
+@router.get(
+    '/login',
+    summary='Estatísticas de limitação e fila das tentativas de login',
+    status_code=HTTPStatus.OK,
+)
+@uncompressed
+async def login_stats() -> LoginStats:
+    return get_login_stats(login_throttle, password_verification_gate)
+
+
+@router.get(
+    '/response-cache',
+    summary='Taxa de acertos do cache de respostas, por rota',
+    status_code=HTTPStatus.OK,
+)
+@uncompressed
+async def response_cache_stats() -> dict[str, ResponseCacheStats]:
+    return response_cache.stats()
@@ -1,17 +1,23 @@
 from http import HTTPStatus
+from typing import Annotated
 
 import sqlalchemy as sa
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.exc import IntegrityError
 
-from madr.database import T_DbSession
+from madr.conditional import check_not_modified, is_conditional, set_validators
+from madr.database import T_DbSession, T_PrimarySessionFactory, T_ReadDbSession, T_ReadSessionFactory
 from madr.errors import ConflictError, NotFoundError
+from madr.exportacao import T_ExportFormat, export_response
 from madr.models import Romancista
+from madr.response_cache import missing_romancistas, response_cache
+from madr.responses import FastJSONRoute
 from madr.schemas import Message, RomancistaList, RomancistaPublic, RomancistaSchema
-from madr.security import T_CurrentUser
-from madr.utils import sanitize
+from madr.security import T_CurrentUserId
+from madr.utils import decode_cursor, encode_cursor, sanitize
 
-router = APIRouter(prefix='/romancista', tags=['Romancista'])
+router = APIRouter(prefix='/romancista', tags=['Romancista'], route_class=FastJSONRoute)
 
 
 @router.post(
@@ -19,30 +25,63 @@ router = APIRouter(prefix='/romancista', tags=['Romancista'])
     summary='Cria romancista no MADR',
     status_code=HTTPStatus.CREATED,
 )
-def create_romancista(dbsession: T_DbSession, _user: T_CurrentUser, romancista: RomancistaSchema) -> RomancistaPublic:
+async def create_romancista(
+    dbsession: T_DbSession, _user_id: T_CurrentUserId, romancista: RomancistaSchema
+) -> RomancistaPublic:
     db_romancista = Romancista(name=romancista.name)
     dbsession.add(db_romancista)
     try:
-        dbsession.commit()
+        await dbsession.commit()
     except IntegrityError as e:
         if e.orig.__class__.__name__ == 'UniqueViolation':
             raise ConflictError(resource='Romancista') from None
         raise  # pragma: no cover
-    dbsession.refresh(db_romancista)
+    await response_cache.invalidate('romancistas')
+    await dbsession.refresh(db_romancista)
+    missing_romancistas.discard(db_romancista.id)
 
     return RomancistaPublic.model_validate(db_romancista)
 
 
+@router.get(
+    '/export',
+    summary='Exporta todos os romancistas do MADR',
+    status_code=HTTPStatus.OK,
+)
+async def export_romancistas(
+    session_factory: T_ReadSessionFactory,
+    file_format: Annotated[T_ExportFormat, Query(alias='format')] = 'ndjson',
+) -> StreamingResponse:
+    query = sa.select(Romancista.id, Romancista.name).order_by(Romancista.id)
+    return export_response(session_factory, query, file_format, filename='romancistas')
+
+
 @router.get(
     '/{romancista_id}',
     summary='Recupera romancista pelo id no MADR',
     status_code=HTTPStatus.OK,
 )
-def get_romancista(dbsession: T_DbSession, romancista_id: int) -> RomancistaPublic:
-    db_romancista = dbsession.scalar(sa.select(Romancista).where(Romancista.id == romancista_id))
+async def get_romancista(
+    dbsession: T_ReadDbSession, romancista_id: int, request: Request, response: Response
+) -> RomancistaPublic:
+    if missing_romancistas.get(romancista_id):
+        raise NotFoundError(resource='Romancista')
+    generation = missing_romancistas.generation
+
+    # Revalidações consultam só o updated_at; a linha completa é carregada apenas se o cliente precisar dela.
+    if is_conditional(request):
+        updated_at = await dbsession.scalar(sa.select(Romancista.updated_at).where(Romancista.id == romancista_id))
+        if updated_at is None:
+            missing_romancistas.add(romancista_id, generation=generation)
+            raise NotFoundError(resource='Romancista')
+        check_not_modified(request, romancista_id, updated_at)
+
+    db_romancista = await dbsession.scalar(sa.select(Romancista).where(Romancista.id == romancista_id))
     if not db_romancista:
+        missing_romancistas.add(romancista_id, generation=generation)
         raise NotFoundError(resource='Romancista')
 
+    set_validators(response, db_romancista.id, db_romancista.updated_at)
     return RomancistaPublic.model_validate(db_romancista)
 
 
@@ -50,21 +89,43 @@ def get_romancista(dbsession: T_DbSession, romancista_id: int) -> RomancistaPubl
     '/',
     summary='Lista romancistas no MADR',
     status_code=HTTPStatus.OK,
+    response_model=RomancistaList,
 )
-def list_romancista(
-    dbsession: T_DbSession,
+async def list_romancista(  # noqa: PLR0913
+    session_factory: T_ReadSessionFactory,
+    primary_session_factory: T_PrimarySessionFactory,
     name: str | None = Query(None),
     offset: int | None = Query(None),
-    limit: int | None = Query(20),
-) -> RomancistaList:
-    query = sa.select(Romancista)
+    limit: int = Query(20),
+    cursor: str | None = Query(None),
+) -> Response:
+    # Normalizado antes da chave, para que buscas equivalentes dividam a mesma entrada do cache.
+    name = sanitize(name or '') or None
+    cache_key = await response_cache.key('romancistas', name=name, offset=offset, limit=limit, cursor=cursor)
+    if cached := await response_cache.get(cache_key):
+        return cached
+
+    query = sa.select(Romancista).order_by(Romancista.id)
 
     if name:
-        query = query.filter(Romancista.name.contains(sanitize(name)))
+        query = query.filter(Romancista.name.contains(name))
+
+    if cursor:
+        query = query.filter(Romancista.id > decode_cursor(cursor))
+
+    # Logo após uma escrita deste processo, uma réplica atrasada gravaria no cache a listagem anterior a ela.
+    if response_cache.refill_from_primary('romancistas'):
+        session_factory = primary_session_factory
+    async with session_factory() as dbsession:
+        romancistas = (await dbsession.scalars(query.offset(offset).limit(limit + 1))).all()
 
-    romancistas = dbsession.scalars(query.offset(offset).limit(limit)).all()
+    has_next = len(romancistas) > limit
+    romancistas = romancistas[:limit]
+    next_cursor = encode_cursor(romancistas[-1].id) if has_next and romancistas else None
 
-    return RomancistaList.model_validate({'romancistas': romancistas})
+    return await response_cache.set(
+        cache_key, RomancistaList.model_validate({'romancistas': romancistas, 'next_cursor': next_cursor})
+    )
 
 
 @router.put(
@@ -72,21 +133,22 @@ def list_romancista(
     summary='Atualiza romancista no MADR',
     status_code=HTTPStatus.OK,
 )
-def update_romancista(
-    dbsession: T_DbSession, _user: T_CurrentUser, romancista: RomancistaSchema, romancista_id: int
+async def update_romancista(
+    dbsession: T_DbSession, _user_id: T_CurrentUserId, romancista: RomancistaSchema, romancista_id: int
 ) -> RomancistaPublic:
-    db_romancista = dbsession.scalar(sa.select(Romancista).where(Romancista.id == romancista_id))
+    db_romancista = await dbsession.scalar(sa.select(Romancista).where(Romancista.id == romancista_id))
     if not db_romancista:
         raise NotFoundError(resource='Romancista')
 
     db_romancista.name = romancista.name
     try:
-        dbsession.commit()
+        await dbsession.commit()
     except IntegrityError as e:
         if e.orig.__class__.__name__ == 'UniqueViolation':
             raise ConflictError(resource='Romancista') from None
         raise  # pragma: no cover
-    dbsession.refresh(db_romancista)
+    await response_cache.invalidate('romancistas')
+    await dbsession.refresh(db_romancista)
 
     return RomancistaPublic.model_validate(db_romancista)
 
@@ -96,11 +158,14 @@ def update_romancista(
     summary='Remove romancista no MADR',
     status_code=HTTPStatus.OK,
 )
-def delete_romancista(dbsession: T_DbSession, _user: T_CurrentUser, romancista_id: int) -> Message:
-    deleted_id = dbsession.scalar(sa.delete(Romancista).where(Romancista.id == romancista_id).returning(Romancista.id))
+async def delete_romancista(dbsession: T_DbSession, _user_id: T_CurrentUserId, romancista_id: int) -> Message:
+    deleted_id = await dbsession.scalar(
+        sa.delete(Romancista).where(Romancista.id == romancista_id).returning(Romancista.id)
+    )
     if not deleted_id:
         raise NotFoundError(resource='Romancista')
 
-    dbsession.commit()
+    await dbsession.commit()
+    await response_cache.invalidate('romancistas')
 
     return Message(message='Romancista deletado com sucesso')
@@ -3,7 +3,6 @@ from typing import Literal
 
 from pydantic import BaseModel, EmailStr, Field, PositiveInt, field_validator
 
-from .security import get_password_hash
 from .utils import sanitize
 
 
@@ -27,6 +26,11 @@ class ApiInfo(BaseModel):
 class Token(BaseModel):
     token_type: Literal['bearer'] = 'bearer'
     access_token: str
+    refresh_token: str | None = None
+
+
+class RefreshTokenSchema(BaseModel):
+    refresh_token: str
 
 
 class UserSchema(BaseModel):
@@ -42,11 +46,6 @@ class UserSchema(BaseModel):
             raise ValueError('username não deve estar em branco')
         return v
 
-    @field_validator('password')
-    @classmethod
-    def password_validate(cls, v: str) -> str:
-        return get_password_hash(v)
-
 
 class UserPublic(BaseModel):
     model_config = {'from_attributes': True}
@@ -56,6 +55,10 @@ class UserPublic(BaseModel):
     username: str
 
 
+class CurrentUser(UserPublic):
+    token_version: int
+
+
 class RomancistaSchema(BaseModel):
     name: str = Field(min_length=1)
 
@@ -77,6 +80,7 @@ class RomancistaPublic(BaseModel):
 
 class RomancistaList(BaseModel):
     romancistas: list[RomancistaPublic]
+    next_cursor: str | None = None
 
 
 class LivroSchema(BaseModel):
@@ -118,3 +122,70 @@ class LivroPublic(BaseModel):
 
 class LivroList(BaseModel):
     livros: list[LivroPublic]
+    next_cursor: str | None = None
+
+
+class LivroBulkItem(BaseModel):
+    status: Literal['created', 'conflict', 'not_found']
+    livro: LivroPublic | None = None
+    message: str | None = None
+
+
+class LivroBulkResult(BaseModel):
+    results: list[LivroBulkItem]
+
+
+class PoolStats(BaseModel):
+    pool_class: str
+    size: int | None
+    checked_out: int | None
+    idle: int | None
+    overflow: int | None
+    wait_count: int
+    wait_time_total: float
+    wait_time_max: float
+
+
+class DatabasePoolStats(PoolStats):
+    replicas: dict[str, PoolStats]
+
+
+class BuscaHit(BaseModel):
+    kind: Literal['livro', 'romancista']
+    id: int
+    text: str
+    rank: float
+
+
+class BuscaList(BaseModel):
+    hits: list[BuscaHit]
+
+
+class CacheStats(BaseModel):
+    size: int
+    maxsize: int
+    hits: int
+    misses: int
+    hit_ratio: float
+
+
+class ResponseCacheStats(BaseModel):
+    hits: int
+    misses: int
+    hit_ratio: float
+
+
+class LoginStats(BaseModel):
+    throttled_ip: int
+    throttled_username: int
+    verifications_active: int
+    verifications_waiting: int
+    verifications_queued: int
+    verifications_rejected: int
+
+
+class ImportResult(BaseModel):
+    romancistas_created: int
+    livros_created: int
+    livros_skipped: int
+    invalid_rows: int
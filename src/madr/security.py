@@ -1,5 +1,13 @@
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
-from typing import Annotated
+from hashlib import sha256
+from multiprocessing import get_context
+from time import time
+from typing import Annotated, Any, TypeVar
+from uuid import uuid4
 from zoneinfo import ZoneInfo
 
 import jwt
@@ -7,15 +15,85 @@ import sqlalchemy as sa
 from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer
 from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from madr.database import T_DbSession
+from madr.cache import TTLCache
+from madr.database import T_DbSession, sessionmaker
 from madr.errors import UnauthorizedError
 from madr.models import User
-from madr.settings import Settings
+from madr.revocation import RevocationList
+from madr.schemas import CurrentUser
+from madr.settings import get_settings
+from madr.throttling import AdmissionGate, LoginThrottle, create_rate_limiter
 
-settings = Settings()
-pwd_context = PasswordHash.recommended()
+T = TypeVar('T')
+
+
+class PasswordExecutor:
+    """Processos que calculam os hashes de senha, recriados se algum deles morrer.
+
+    Um `ProcessPoolExecutor` cujo processo foi encerrado (por exemplo, pelo OOM killer) rejeita todas as tarefas
+    seguintes; sem recriá-lo, nenhum login no worker voltaria a funcionar.
+    """
+
+    def __init__(self, *, max_workers: int) -> None:
+        self.max_workers = max_workers
+        self.executor = self._create()
+
+    def _create(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=get_context('spawn'))
+
+    async def run(self, fn: Callable[..., T], /, *args: object) -> T:
+        executor = self.executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            # Só a primeira tarefa a encontrar o pool quebrado o recria; as demais apenas tentam de novo no novo pool.
+            if self.executor is executor:
+                executor.shutdown(wait=False)
+                self.executor = self._create()
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+
+settings = get_settings()
+pwd_context = PasswordHash(
+    (
+        Argon2Hasher(
+            time_cost=settings.ARGON2_TIME_COST,
+            memory_cost=settings.ARGON2_MEMORY_COST,
+            parallelism=settings.ARGON2_PARALLELISM,
+        ),
+    )
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='token')
+# O argon2 é caro em CPU; roda em processos separados para não disputar o GIL com as demais requisições.
+password_executor = PasswordExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+# Usuários autenticados pelo `sub` do token. Quem altera ou remove usuários deve invalidar a entrada correspondente.
+current_user_cache: TTLCache[str, CurrentUser] = TTLCache(
+    maxsize=settings.CURRENT_USER_CACHE_SIZE, ttl=settings.CURRENT_USER_CACHE_TTL
+)
+# Claims de tokens já verificados, pelo digest do token; cada entrada expira junto com o token.
+access_token_cache: TTLCache[bytes, dict[str, Any]] = TTLCache(maxsize=settings.ACCESS_TOKEN_CACHE_SIZE, ttl=0)
+# Tokens de acesso revogados no logout, refresh tokens já usados e famílias de refresh tokens revogadas.
+revocation_list = RevocationList(
+    capacity=settings.REVOCATION_LIST_CAPACITY,
+    error_rate=settings.REVOCATION_LIST_ERROR_RATE,
+    sync_interval=settings.REVOCATION_LIST_SYNC_INTERVAL,
+)
+login_throttle = LoginThrottle(
+    create_rate_limiter(settings, sessionmaker),
+    ip_rate=settings.LOGIN_THROTTLE_IP_RATE,
+    ip_burst=settings.LOGIN_THROTTLE_IP_BURST,
+    username_rate=settings.LOGIN_THROTTLE_USERNAME_RATE,
+    username_burst=settings.LOGIN_THROTTLE_USERNAME_BURST,
+)
+# Só as verificações de senha do login passam por aqui; o restante da API não disputa estas vagas.
+password_verification_gate = AdmissionGate(
+    max_concurrent=settings.LOGIN_MAX_CONCURRENT_VERIFICATIONS,
+    max_queue=settings.LOGIN_VERIFICATION_QUEUE_SIZE,
+    timeout=settings.LOGIN_VERIFICATION_QUEUE_TIMEOUT,
+)
 
 
 def get_password_hash(password: str, /) -> str:
@@ -26,35 +104,212 @@ def verify_password(plain_password: str, hashed_password: str, /) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
-def create_access_token(*, email: str) -> str:
+def verify_and_update_password(plain_password: str, hashed_password: str, /) -> tuple[bool, str | None]:
+    """Verifica a senha e, se o hash usar parâmetros diferentes dos configurados, retorna um novo hash."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+async def hash_password(password: str, /) -> str:
+    return await password_executor.run(get_password_hash, password)
+
+
+async def check_password(plain_password: str, hashed_password: str, /) -> bool:
+    return await password_executor.run(verify_password, plain_password, hashed_password)
+
+
+async def check_and_update_password(plain_password: str, hashed_password: str, /) -> tuple[bool, str | None]:
+    return await password_executor.run(verify_and_update_password, plain_password, hashed_password)
+
+
+def create_access_token(*, user_id: int, token_version: int) -> str:
     return jwt.encode(
         {
-            'sub': email,
+            'sub': str(user_id),
+            'ver': token_version,
+            'jti': uuid4().hex,
             'exp': datetime.now(ZoneInfo('UTC')) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
         },
         algorithm=settings.ACCESS_TOKEN_ALGORITHM,
-        key=settings.SECRET_KEY,
+        key=settings.access_token_signing_key,
     )
 
 
-T_Token = Annotated[str, Depends(oauth2_scheme)]
+def create_refresh_token(*, user_id: int, token_version: int, family: str | None = None) -> str:
+    """Cria um refresh token de uso único; os tokens obtidos em cada troca compartilham a mesma família."""
+    return jwt.encode(
+        {
+            'sub': str(user_id),
+            'ver': token_version,
+            'typ': 'refresh',
+            'jti': uuid4().hex,
+            'fam': family or uuid4().hex,
+            'exp': datetime.now(ZoneInfo('UTC')) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+        },
+        algorithm=settings.ACCESS_TOKEN_ALGORITHM,
+        key=settings.access_token_signing_key,
+    )
 
 
-def get_current_user(dbsession: T_DbSession, token: T_Token) -> User:
+def decode_refresh_token(token: str, /) -> dict[str, Any]:
     try:
-        payload = jwt.decode(token, algorithms=[settings.ACCESS_TOKEN_ALGORITHM], key=settings.SECRET_KEY)
+        payload = jwt.decode(
+            token,
+            algorithms=[settings.ACCESS_TOKEN_ALGORITHM],
+            key=settings.access_token_verification_key,
+            options={'require': ['sub', 'ver', 'jti', 'fam', 'exp']},
+        )
     except jwt.PyJWTError:
         raise UnauthorizedError from None
 
-    email: str = payload.get('sub', '')
-    if not email:
+    if payload.get('typ') != 'refresh' or not str(payload['sub']).isdigit():
         raise UnauthorizedError
+    return payload
+
+
+async def revoke_refresh_token_family(dbsession: AsyncSession, family: str, /) -> None:
+    # Toda a família expira até um prazo de validade depois do último token emitido, que é agora.
+    await revocation_list.revoke(
+        dbsession,
+        family,
+        expires_at=datetime.now(ZoneInfo('UTC')) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+
+
+async def rotate_refresh_token(dbsession: AsyncSession, token: str, /) -> tuple[str, str]:
+    """Troca um refresh token por um novo par de tokens, sem consultar a tabela de usuários.
+
+    Reusar um refresh token já trocado indica que ele vazou: toda a família é revogada, inclusive o token mais recente.
+    Uma troca de senha ou a remoção da conta, registradas na lista de revogação, também revogam a família.
+    """
+    payload = decode_refresh_token(token)
+    user_token_ids = user_revocation_id(payload['sub']), user_revocation_id(payload['sub'], payload['ver'])
+    if await revocation_list.is_revoked(dbsession, *user_token_ids):
+        await revoke_refresh_token_family(dbsession, payload['fam'])
+        raise UnauthorizedError
+
+    expires_at = datetime.fromtimestamp(payload['exp'], ZoneInfo('UTC'))
+    if not await revocation_list.consume(dbsession, payload['jti'], family=payload['fam'], expires_at=expires_at):
+        await revoke_refresh_token_family(dbsession, payload['fam'])
+        raise UnauthorizedError
+
+    user_id, token_version = int(payload['sub']), payload['ver']
+    return (
+        create_access_token(user_id=user_id, token_version=token_version),
+        create_refresh_token(user_id=user_id, token_version=token_version, family=payload['fam']),
+    )
+
 
-    user = dbsession.scalar(sa.select(User).where(User.email == email))
-    if not user:
+def decode_access_token(token: str, /) -> dict[str, Any]:
+    """Decodifica o token, garantindo que exista um `sub`.
+
+    Tokens novos carregam o id do usuário no `sub` e sua versão em `ver`; tokens antigos, apenas o email no `sub`.
+    Tokens válidos ficam em cache até o `exp`, evitando verificar a assinatura a cada requisição.
+    """
+    digest = sha256(token.encode()).digest()
+    if cached := access_token_cache.get(digest):
+        return cached
+
+    try:
+        payload = jwt.decode(
+            token, algorithms=[settings.ACCESS_TOKEN_ALGORITHM], key=settings.access_token_verification_key
+        )
+    except jwt.PyJWTError:
+        raise UnauthorizedError from None
+
+    if not isinstance(payload.get('sub'), str) or not payload['sub'] or payload.get('typ') == 'refresh':
         raise UnauthorizedError
+    if isinstance(payload.get('exp'), int | float):
+        access_token_cache.set(digest, payload, ttl=payload['exp'] - time())
+    return payload
+
 
+def check_token_version(payload: dict[str, Any], user: CurrentUser, /) -> CurrentUser:
+    if 'ver' in payload and payload['ver'] != user.token_version:
+        raise UnauthorizedError
     return user
 
 
-T_CurrentUser = Annotated[User, Depends(get_current_user)]
+T_Token = Annotated[str, Depends(oauth2_scheme)]
+
+
+def user_revocation_id(subject: str, token_version: int | None = None, /) -> str:
+    """Id na lista de revogação que invalida os tokens de um usuário, de todas as versões ou só da indicada."""
+    if token_version is None:
+        return f'user:{subject.lower()}'
+    return f'user:{subject.lower()}:{token_version}'
+
+
+async def revoke_user_tokens(dbsession: AsyncSession, user: CurrentUser, /, *token_ids: str) -> None:
+    """Revoga tokens do usuário em todos os processos, e não só no cache deste.
+
+    `token_ids` vêm de `user_revocation_id`; os demais processos recebem a revogação na próxima sincronização da lista.
+    A revogação dura o prazo dos refresh tokens, que também são checados contra ela.
+    """
+    expires_at = datetime.now(ZoneInfo('UTC')) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    for token_id in token_ids:
+        await revocation_list.revoke(dbsession, token_id, expires_at=expires_at)
+
+    current_user_cache.delete(str(user.id))
+    current_user_cache.delete(user.email)
+
+
+async def verify_access_token(dbsession: AsyncSession, token: str, /) -> dict[str, Any]:
+    """Decodifica o token e rejeita os revogados; na maioria das requisições tudo se resolve em memória."""
+    payload = decode_access_token(token)
+    token_ids = [user_revocation_id(payload['sub'])]
+    if isinstance(payload.get('ver'), int):
+        token_ids.append(user_revocation_id(payload['sub'], payload['ver']))
+    if 'jti' in payload:
+        token_ids.append(payload['jti'])
+    if await revocation_list.is_revoked(dbsession, *token_ids):
+        raise UnauthorizedError
+    return payload
+
+
+async def revoke_access_token(dbsession: AsyncSession, token: str, /) -> dict[str, Any]:
+    payload = await verify_access_token(dbsession, token)
+    if 'jti' not in payload or 'exp' not in payload:
+        raise UnauthorizedError
+
+    await revocation_list.revoke(
+        dbsession, payload['jti'], expires_at=datetime.fromtimestamp(payload['exp'], ZoneInfo('UTC'))
+    )
+    return payload
+
+
+async def get_current_user(dbsession: T_DbSession, token: T_Token) -> CurrentUser:
+    payload = await verify_access_token(dbsession, token)
+    subject: str = payload['sub']
+
+    # Uma versão diferente da do cache pode vir de uma troca de senha feita em outro processo; o banco decide.
+    user = current_user_cache.get(subject)
+    if user is not None and payload.get('ver', user.token_version) == user.token_version:
+        return user
+
+    if subject.isdigit():
+        db_user = await dbsession.get(User, int(subject))
+    else:
+        db_user = await dbsession.scalar(sa.select(User).where(sa.func.lower(User.email) == sa.func.lower(subject)))
+    if not db_user:
+        raise UnauthorizedError
+
+    user = CurrentUser.model_validate(db_user)
+    current_user_cache.set(subject, user)
+    return check_token_version(payload, user)
+
+
+async def get_current_user_id(dbsession: T_DbSession, token: T_Token) -> int:
+    """Identifica o usuário para checagens que só precisam saber quem está autenticado.
+
+    No modo `ACCESS_TOKEN_STATELESS` confia nas claims assinadas dos tokens novos, sem consultar o banco de dados.
+    """
+    if settings.ACCESS_TOKEN_STATELESS:
+        subject: str = (await verify_access_token(dbsession, token))['sub']
+        if subject.isdigit():
+            return int(subject)
+
+    return (await get_current_user(dbsession, token)).id
+
+
+T_CurrentUser = Annotated[CurrentUser, Depends(get_current_user)]
+T_CurrentUserId = Annotated[int, Depends(get_current_user_id)]
@@ -0,0 +1,82 @@
+import math
+import os
+import random
+import socket
+from pathlib import Path
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from .settings import Settings, get_settings
+
+CGROUP_ROOT = Path('/sys/fs/cgroup')
+
+
+def read_cpu_quota(cgroup_root: Path = CGROUP_ROOT, /) -> float | None:
+    """CPUs liberadas pela cota do cgroup (v2 ou v1) do container, ou `None` se não há limite."""
+    if (cpu_max := cgroup_root / 'cpu.max').exists():
+        quota, period = cpu_max.read_text().split()
+    elif (cfs_quota := cgroup_root / 'cpu' / 'cpu.cfs_quota_us').exists():
+        quota, period = cfs_quota.read_text().strip(), (cgroup_root / 'cpu' / 'cpu.cfs_period_us').read_text().strip()
+    else:
+        return None
+
+    if quota in {'max', '-1'}:
+        return None
+    return int(quota) / int(period)
+
+
+def default_workers(cgroup_root: Path = CGROUP_ROOT, /) -> int:
+    """Um worker por CPU da cota, arredondando para cima, sem passar das CPUs em que o processo pode rodar."""
+    cpus = len(os.sched_getaffinity(0))
+    quota = read_cpu_quota(cgroup_root)
+    if quota is None:
+        return cpus
+    return max(1, min(cpus, math.ceil(quota)))
+
+
+class RecyclingServer(uvicorn.Server):
+    """Servidor de cada worker, que encerra graciosamente após `limit_max_requests` requisições.
+
+    O limite recebe um acréscimo aleatório de até `max_requests_jitter`, sorteado no próprio worker, para que os
+    workers não sejam reciclados todos ao mesmo tempo.
+    """
+
+    def __init__(self, config: uvicorn.Config, *, max_requests_jitter: int) -> None:
+        super().__init__(config)
+        self.max_requests_jitter = max_requests_jitter
+
+    def run(self, sockets: list[socket.socket] | None = None) -> None:
+        if self.config.limit_max_requests is not None:
+            self.config.limit_max_requests += random.randint(0, self.max_requests_jitter)  # noqa: S311
+        super().run(sockets)
+
+
+def create_config(settings: Settings, /) -> uvicorn.Config:
+    return uvicorn.Config(
+        'madr.api:app',
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=settings.SERVER_WORKERS or default_workers(),
+        loop='uvloop',
+        http='httptools',
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEP_ALIVE,
+        limit_max_requests=settings.SERVER_MAX_REQUESTS,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+        access_log=settings.SERVER_ACCESS_LOG,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.SERVER_FORWARDED_ALLOW_IPS,
+    )
+
+
+def main() -> None:
+    settings = get_settings()
+    config = create_config(settings)
+    server = RecyclingServer(config, max_requests_jitter=settings.SERVER_MAX_REQUESTS_JITTER)
+    # Mesmo com um único worker, o supervisor repõe o worker que sai ao atingir o limite de requisições.
+    Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,71 @@
+import subprocess
+import sys
+from argparse import ArgumentParser
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, kw_only=True)
+class ImportTime:
+    module: str
+    self_time: float
+    cumulative: float
+
+    @property
+    def package(self) -> str:
+        return self.module.partition('.')[0]
+
+
+def parse_importtime(lines: Iterable[str], /) -> list[ImportTime]:
+    """Interpreta a saída de `python -X importtime`, com os tempos convertidos de microssegundos para segundos."""
+    times = []
+    for line in lines:
+        _, _, data = line.partition('import time:')
+        self_time, _, rest = data.partition('|')
+        cumulative, _, module = rest.partition('|')
+        if not self_time.strip().isdigit():
+            continue
+        times.append(
+            ImportTime(module=module.strip(), self_time=int(self_time) / 1e6, cumulative=int(cumulative) / 1e6)
+        )
+    return times
+
+
+def measure_imports(module: str, /) -> list[ImportTime]:
+    """Importa o módulo num interpretador novo, como no início de um processo da API."""
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True, text=True, check=True
+    )
+    return parse_importtime(result.stderr.splitlines())
+
+
+def group_by_package(times: Iterable[ImportTime], /) -> list[tuple[str, float]]:
+    """Soma o tempo próprio de cada módulo no seu pacote raiz; a soma de todos os pacotes é o tempo total."""
+    packages: defaultdict[str, float] = defaultdict(float)
+    for time in times:
+        packages[time.package] += time.self_time
+    return sorted(packages.items(), key=lambda item: -item[1])
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = ArgumentParser(description='Relata o tempo de importação da aplicação, por pacote ou por módulo')
+    parser.add_argument('--module', default='madr.api')
+    parser.add_argument('--by', choices=['package', 'module'], default='package')
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    times = measure_imports(args.module)
+    total = sum(time.self_time for time in times)
+    if args.by == 'package':
+        rows = group_by_package(times)
+    else:
+        rows = [(time.module, time.self_time) for time in sorted(times, key=lambda time: -time.self_time)]
+
+    print(f'# {args.module}: {total * 1000:.1f} ms, {len(times)} módulos')  # noqa: T201
+    for name, elapsed in rows[: args.top]:
+        print(f'{name} {elapsed * 1000:.1f} ms ({elapsed / total:.1%})')  # noqa: T201
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,169 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from time import monotonic
+
+import anyio
+import sqlalchemy as sa
+
+from .database import T_SessionMaker
+from .errors import TooManyRequestsError
+from .models import RateLimitBucket
+from .settings import Settings
+
+# Só atualiza o balde se houver ao menos uma ficha após a recarga; sem linha retornada, a tentativa é negada.
+HIT_BUCKET = sa.text("""
+INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at) VALUES (:key, :burst - 1, now())
+ON CONFLICT (key) DO UPDATE
+SET tokens = least(:burst, b.tokens + extract(epoch FROM now() - b.updated_at) * :rate) - 1, updated_at = now()
+WHERE least(:burst, b.tokens + extract(epoch FROM now() - b.updated_at) * :rate) >= 1
+RETURNING 1
+""")
+
+
+class RateLimiter(ABC):
+    """Token bucket: cada chave acumula até `burst` fichas, recarregadas a `rate` fichas por segundo."""
+
+    @abstractmethod
+    async def hit(self, key: str, /, *, rate: float, burst: int) -> bool:
+        """Consome uma ficha da chave, retornando se a tentativa é permitida."""
+
+    @abstractmethod
+    async def clear(self) -> None: ...
+
+
+class MemoryRateLimiter(RateLimiter):
+    """Baldes em memória do processo; com vários workers, cada um aplica o limite separadamente."""
+
+    def __init__(self, *, maxsize: int = 100_000) -> None:
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def hit(self, key: str, /, *, rate: float, burst: int) -> bool:
+        now = monotonic()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+
+        allowed = tokens >= 1
+        self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return allowed
+
+    async def clear(self) -> None:
+        self._buckets.clear()
+
+
+class DatabaseRateLimiter(RateLimiter):
+    """Baldes compartilhados entre workers e instâncias, numa tabela UNLOGGED do banco."""
+
+    def __init__(self, sessionmaker: T_SessionMaker, *, cleanup_every: int = 1000, max_idle: float = 3600) -> None:
+        self.sessionmaker = sessionmaker
+        self.cleanup_every = cleanup_every
+        self.max_idle = max_idle
+        self._hits = 0
+
+    async def hit(self, key: str, /, *, rate: float, burst: int) -> bool:
+        async with self.sessionmaker() as session:
+            allowed = await session.scalar(HIT_BUCKET, {'key': key, 'rate': rate, 'burst': burst}) is not None
+
+            self._hits += 1
+            if self._hits % self.cleanup_every == 0:
+                await session.execute(
+                    sa.delete(RateLimitBucket).where(
+                        RateLimitBucket.updated_at < sa.func.now() - timedelta(seconds=self.max_idle)
+                    )
+                )
+            await session.commit()
+        return allowed
+
+    async def clear(self) -> None:
+        async with self.sessionmaker() as session:
+            await session.execute(sa.delete(RateLimitBucket))
+            await session.commit()
+
+
+def create_rate_limiter(settings: Settings, sessionmaker: T_SessionMaker) -> RateLimiter:
+    if settings.LOGIN_THROTTLE_BACKEND == 'database':
+        return DatabaseRateLimiter(sessionmaker)
+    return MemoryRateLimiter()
+
+
+class LoginThrottle:
+    """Limita tentativas de login por IP do cliente e por nome de usuário."""
+
+    def __init__(
+        self, limiter: RateLimiter, *, ip_rate: float, ip_burst: int, username_rate: float, username_burst: int
+    ) -> None:
+        self.limiter = limiter
+        self.ip_rate = ip_rate
+        self.ip_burst = ip_burst
+        self.username_rate = username_rate
+        self.username_burst = username_burst
+        self.throttled_ip = 0
+        self.throttled_username = 0
+
+    async def check(self, *, ip: str | None, username: str) -> None:
+        if ip and not await self.limiter.hit(f'ip:{ip}', rate=self.ip_rate, burst=self.ip_burst):
+            self.throttled_ip += 1
+            raise TooManyRequestsError
+        if not await self.limiter.hit(
+            f'username:{username.lower()}', rate=self.username_rate, burst=self.username_burst
+        ):
+            self.throttled_username += 1
+            raise TooManyRequestsError
+
+    async def reset(self) -> None:
+        await self.limiter.clear()
+        self.throttled_ip = 0
+        self.throttled_username = 0
+
+
+class AdmissionGate:
+    """Limita operações simultâneas; excedentes aguardam numa fila limitada ou são rejeitados.
+
+    Usado nas verificações de senha, para que uma enxurrada de logins sature só o login e não o restante da API.
+    """
+
+    def __init__(self, *, max_concurrent: int, max_queue: int, timeout: float) -> None:
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.waiting = 0
+        self.queued = 0
+        self.rejected = 0
+        self._semaphore = anyio.Semaphore(max_concurrent)
+
+    @property
+    def active(self) -> int:
+        return self.max_concurrent - self._semaphore.value
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        if self._semaphore.value == 0:
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise TooManyRequestsError
+
+            self.queued += 1
+            self.waiting += 1
+            try:
+                with anyio.fail_after(self.timeout):
+                    await self._semaphore.acquire()
+            except TimeoutError:
+                self.rejected += 1
+                raise TooManyRequestsError from None
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        try:
+            yield
+        finally:
+            self._semaphore.release()
@@ -1,6 +1,24 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from string import punctuation
 
+from .errors import InvalidCursorError
+
 
 def sanitize(value: str, /) -> str:
     value = ''.join(c for c in value.lower() if c not in punctuation)
     return ' '.join(word for word in value.split() if word)
+
+
+def encode_cursor(last_id: int, /) -> str:
+    return urlsafe_b64encode(json.dumps({'id': last_id}).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, /) -> int:
+    try:
+        last_id = json.loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))['id']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursorError from None
+    if not isinstance(last_id, int):
+        raise InvalidCursorError
+    return last_id
@@ -1,16 +1,26 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
+from functools import partial
 from urllib.parse import urlparse
 
+import anyio
 import psycopg
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import Engine, create_engine
+from sqlalchemy import Engine, NullPool, create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import Session
 
 from madr.api import app
-from madr.database import get_dbsession
+from madr.database import get_dbsession, get_read_dbsession, get_read_session_factory, get_session_factory
 from madr.models import Base, Livro, Romancista
-from madr.security import create_access_token
+from madr.response_cache import missing_livros, missing_romancistas, response_cache
+from madr.security import (
+    access_token_cache,
+    create_access_token,
+    current_user_cache,
+    login_throttle,
+    revocation_list,
+)
 from madr.settings import Settings
 from tests.factories import LivroFactory, RomancistaFactory, UserFactory
 from tests.utils import UserWithAttrs, randstr
@@ -44,12 +54,26 @@ def dbsession(dbengine: Engine) -> Generator[Session]:
 
 
 @pytest.fixture
-def client(dbsession: Session) -> Generator[TestClient]:
-    def get_session_override() -> Session:
-        return dbsession
+def client(dbengine: Engine, dbsession: Session) -> Generator[TestClient]:
+    async_dbengine = create_async_engine(dbengine.url, poolclass=NullPool)
+
+    async def get_session_override() -> AsyncGenerator[AsyncSession]:
+        async with AsyncSession(async_dbengine) as session:
+            yield session
+
+    current_user_cache.clear()
+    access_token_cache.clear()
+    revocation_list.clear()
+    missing_livros.clear()
+    missing_romancistas.clear()
+    anyio.run(login_throttle.reset)
+    anyio.run(response_cache.clear)
 
     with TestClient(app) as client:
         app.dependency_overrides[get_dbsession] = get_session_override
+        app.dependency_overrides[get_read_dbsession] = get_session_override
+        app.dependency_overrides[get_read_session_factory] = lambda: partial(AsyncSession, async_dbengine)
+        app.dependency_overrides[get_session_factory] = lambda: partial(AsyncSession, async_dbengine)
         yield client
 
     app.dependency_overrides.clear()
@@ -81,7 +105,7 @@ def other_user(dbsession: Session) -> UserWithAttrs:
 
 @pytest.fixture
 def token(user: UserWithAttrs) -> str:
-    return create_access_token(email=user.model.email)
+    return create_access_token(user_id=user.model.id, token_version=user.model.token_version)
 
 
 @pytest.fixture
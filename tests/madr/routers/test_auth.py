@@ -1,12 +1,29 @@
 from http import HTTPStatus
+from unittest.mock import patch
 
 import jwt
+import pytest
+import sqlalchemy as sa
+from faker import Faker
 from fastapi.testclient import TestClient
 from freezegun import freeze_time
+from pwdlib.hashers.argon2 import Argon2Hasher
+from sqlalchemy.orm import Session
 
-from madr.security import create_access_token
+from madr.security import (
+    create_access_token,
+    create_refresh_token,
+    current_user_cache,
+    decode_access_token,
+    decode_refresh_token,
+    login_throttle,
+    revocation_list,
+    verify_and_update_password,
+)
+from madr.server import create_config
 from madr.settings import Settings
-from tests.utils import UserWithAttrs
+from madr.throttling import AdmissionGate
+from tests.utils import UserWithAttrs, capture_queries, explain
 
 
 class TestLoginForAccessToken:
@@ -25,7 +42,9 @@ class TestLoginForAccessToken:
 
         assert response.status_code == HTTPStatus.OK
         assert token['token_type'] == 'bearer'
-        assert decoded['sub'] == user.model.email
+        assert decoded['sub'] == str(user.model.id)
+        assert decoded['ver'] == user.model.token_version
+        assert decode_refresh_token(token['refresh_token'])['sub'] == str(user.model.id)
 
     def test_login_with_username(self, client: TestClient, user: UserWithAttrs) -> None:
         response = client.post(
@@ -39,7 +58,26 @@ class TestLoginForAccessToken:
 
         assert response.status_code == HTTPStatus.OK
         assert token['token_type'] == 'bearer'
-        assert decoded['sub'] == user.model.email
+        assert decoded['sub'] == str(user.model.id)
+        assert decoded['ver'] == user.model.token_version
+
+    def test_login_with_email_in_different_case(self, client: TestClient, user: UserWithAttrs) -> None:
+        response = client.post(
+            self.url,
+            data={'username': user.model.email.upper(), 'password': user.clean_password},
+        )
+
+        assert response.status_code == HTTPStatus.OK
+
+    def test_rehash_outdated_password(self, client: TestClient, dbsession: Session, user: UserWithAttrs) -> None:
+        user.model.password = Argon2Hasher(time_cost=1, memory_cost=1024, parallelism=1).hash(user.clean_password)
+        dbsession.commit()
+
+        response = client.post(self.url, data={'username': user.model.email, 'password': user.clean_password})
+
+        assert response.status_code == HTTPStatus.OK
+        dbsession.refresh(user.model)
+        assert verify_and_update_password(user.clean_password, user.model.password) == (True, None)
 
     def test_invalid_user(self, client: TestClient) -> None:
         response = client.post(
@@ -59,11 +97,259 @@ class TestLoginForAccessToken:
         assert response.status_code == HTTPStatus.BAD_REQUEST
         assert response.json() == {'message': 'Email ou senha incorretos'}
 
+    def test_throttle_by_username(self, client: TestClient, user: UserWithAttrs) -> None:
+        for _ in range(self.settings.LOGIN_THROTTLE_USERNAME_BURST):
+            client.post(self.url, data={'username': user.model.username, 'password': 'invalid'})
+
+        response = client.post(self.url, data={'username': user.model.username, 'password': user.clean_password})
+
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+        assert response.json() == {'message': 'Muitas tentativas, tente novamente mais tarde'}
+        assert login_throttle.throttled_username == 1
+
+    def test_throttle_by_ip(self, client: TestClient) -> None:
+        for i in range(self.settings.LOGIN_THROTTLE_IP_BURST):
+            client.post(self.url, data={'username': f'invalid{i}', 'password': 'invalid'})
+
+        response = client.post(self.url, data={'username': 'other', 'password': 'invalid'})
+
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+        assert login_throttle.throttled_ip == 1
+
+    def test_throttle_by_forwarded_ip(self, client: TestClient) -> None:
+        # O app como o madr-server o carrega, atrás de um proxy confiável que informa o cliente em X-Forwarded-For.
+        config = create_config(Settings(SERVER_WORKERS=1, SERVER_FORWARDED_ALLOW_IPS='testclient'))
+        config.load()
+        proxied_client = TestClient(config.loaded_app)
+
+        for i in range(self.settings.LOGIN_THROTTLE_IP_BURST):
+            proxied_client.post(
+                self.url,
+                data={'username': f'invalid{i}', 'password': 'invalid'},
+                headers={'X-Forwarded-For': '1.1.1.1'},
+            )
+
+        other_client = proxied_client.post(
+            self.url, data={'username': 'other', 'password': 'invalid'}, headers={'X-Forwarded-For': '2.2.2.2'}
+        )
+        same_client = proxied_client.post(
+            self.url, data={'username': 'other', 'password': 'invalid'}, headers={'X-Forwarded-For': '1.1.1.1'}
+        )
+
+        assert other_client.status_code == HTTPStatus.BAD_REQUEST
+        assert same_client.status_code == HTTPStatus.TOO_MANY_REQUESTS
+
+    def test_verification_queue_full(self, client: TestClient, user: UserWithAttrs) -> None:
+        with patch(
+            'madr.routers.auth.password_verification_gate', AdmissionGate(max_concurrent=0, max_queue=0, timeout=1)
+        ):
+            response = client.post(self.url, data={'username': user.model.email, 'password': user.clean_password})
+
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+
+
+class TestLoginIndexes:
+    url = '/token'
+
+    def test_uses_unique_indexes(self, client: TestClient, dbsession: Session, user: UserWithAttrs) -> None:
+        dbsession.execute(
+            sa.text(
+                'INSERT INTO users (email, username, password) '
+                "SELECT 'user' || i || '@example.com', 'user' || i, 'invalid' FROM generate_series(1, 200000) i"
+            )
+        )
+        dbsession.execute(sa.text('ANALYZE users'))
+        dbsession.commit()
+        data = {'username': user.model.username, 'password': user.clean_password}
+
+        with capture_queries() as queries:
+            response = client.post(self.url, data=data)
+
+        assert response.status_code == HTTPStatus.OK
+        statement, parameters = next(query for query in queries if 'FROM users' in query[0])
+        plan = explain(dbsession, statement, parameters)
+        assert 'ix_users_email_lower' in plan
+        assert 'users_username_key' in plan
+        assert 'Seq Scan' not in plan
+
+
+class TestRefreshTokens:
+    url = '/token/refresh'
+
+    @pytest.fixture
+    def refresh_token(self, user: UserWithAttrs) -> str:
+        return create_refresh_token(user_id=user.model.id, token_version=user.model.token_version)
+
+    def test_rotate(self, client: TestClient, user: UserWithAttrs, refresh_token: str) -> None:
+        user_id = user.model.id
+        with capture_queries() as queries:
+            response = client.post(self.url, json={'refresh_token': refresh_token})
+
+        assert response.status_code == HTTPStatus.OK
+        tokens = response.json()
+        assert decode_access_token(tokens['access_token'])['sub'] == str(user_id)
+        new_payload = decode_refresh_token(tokens['refresh_token'])
+        old_payload = decode_refresh_token(refresh_token)
+        assert new_payload['fam'] == old_payload['fam']
+        assert new_payload['jti'] != old_payload['jti']
+        assert not [statement for statement, _ in queries if 'FROM users' in statement]
+
+    def test_reuse_revokes_family(self, client: TestClient, refresh_token: str) -> None:
+        rotated = client.post(self.url, json={'refresh_token': refresh_token}).json()['refresh_token']
+
+        reused = client.post(self.url, json={'refresh_token': refresh_token})
+        response = client.post(self.url, json={'refresh_token': rotated})
+
+        assert reused.status_code == HTTPStatus.UNAUTHORIZED
+        assert reused.json() == {'message': 'Não autorizado'}
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_other_families_unaffected(self, client: TestClient, user: UserWithAttrs, refresh_token: str) -> None:
+        other = create_refresh_token(user_id=user.model.id, token_version=user.model.token_version)
+        client.post(self.url, json={'refresh_token': refresh_token})
+        client.post(self.url, json={'refresh_token': refresh_token})
+
+        response = client.post(self.url, json={'refresh_token': other})
+
+        assert response.status_code == HTTPStatus.OK
+
+    def test_rejected_after_password_change(
+        self, client: TestClient, user: UserWithAttrs, token: str, refresh_token: str, faker: Faker
+    ) -> None:
+        client.put(
+            f'/conta/{user.model.id}',
+            headers={'Authorization': f'Bearer {token}'},
+            json={'email': user.model.email, 'username': user.model.username, 'password': faker.password()},
+        )
+
+        response = client.post(self.url, json={'refresh_token': refresh_token})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+        assert response.json() == {'message': 'Não autorizado'}
+
+    def test_rejected_by_other_worker_after_password_change(
+        self, client: TestClient, user: UserWithAttrs, token: str, refresh_token: str, faker: Faker
+    ) -> None:
+        client.put(
+            f'/conta/{user.model.id}',
+            headers={'Authorization': f'Bearer {token}'},
+            json={'email': user.model.email, 'username': user.model.username, 'password': faker.password()},
+        )
+        # Outro worker carrega a lista de revogação do banco.
+        revocation_list.clear()
+
+        response = client.post(self.url, json={'refresh_token': refresh_token})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_rejected_after_delete(
+        self, client: TestClient, user: UserWithAttrs, token: str, refresh_token: str
+    ) -> None:
+        client.delete(f'/conta/{user.model.id}', headers={'Authorization': f'Bearer {token}'})
+
+        response = client.post(self.url, json={'refresh_token': refresh_token})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_access_token_rejected(self, client: TestClient, token: str) -> None:
+        response = client.post(self.url, json={'refresh_token': token})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_refresh_token_rejected_as_access_token(self, client: TestClient, refresh_token: str) -> None:
+        response = client.post('/refresh-token', headers={'Authorization': f'Bearer {refresh_token}'})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_invalid_token(self, client: TestClient) -> None:
+        response = client.post(self.url, json={'refresh_token': 'invalid'})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_expired_token(self, client: TestClient, user: UserWithAttrs) -> None:
+        with freeze_time('2000-01-01 00:00:00'):
+            refresh_token = create_refresh_token(user_id=user.model.id, token_version=user.model.token_version)
+
+        response = client.post(self.url, json={'refresh_token': refresh_token})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+class TestLogout:
+    url = '/logout'
+
+    def test_logout(self, client: TestClient, token: str) -> None:
+        response = client.post(self.url, headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {'message': 'Logout realizado com sucesso'}
+        response = client.post('/refresh-token', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_other_tokens_unaffected(self, client: TestClient, user: UserWithAttrs, token: str) -> None:
+        other = create_access_token(user_id=user.model.id, token_version=user.model.token_version)
+        client.post(self.url, headers={'Authorization': f'Bearer {token}'})
+
+        with capture_queries() as queries:
+            response = client.post('/refresh-token', headers={'Authorization': f'Bearer {other}'})
+
+        assert response.status_code == HTTPStatus.OK
+        assert not [statement for statement, _ in queries if 'revoked_tokens' in statement]
+
+    def test_logout_with_refresh_token(self, client: TestClient, user: UserWithAttrs, token: str) -> None:
+        refresh_token = create_refresh_token(user_id=user.model.id, token_version=user.model.token_version)
+
+        response = client.post(
+            self.url, headers={'Authorization': f'Bearer {token}'}, json={'refresh_token': refresh_token}
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        response = client.post('/token/refresh', json={'refresh_token': refresh_token})
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_refresh_token_from_other_user(self, client: TestClient, token: str, other_user: UserWithAttrs) -> None:
+        refresh_token = create_refresh_token(user_id=other_user.model.id, token_version=0)
+
+        response = client.post(
+            self.url, headers={'Authorization': f'Bearer {token}'}, json={'refresh_token': refresh_token}
+        )
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+        response = client.post('/token/refresh', json={'refresh_token': refresh_token})
+        assert response.status_code == HTTPStatus.OK
+
+    def test_token_already_revoked(self, client: TestClient, token: str) -> None:
+        client.post(self.url, headers={'Authorization': f'Bearer {token}'})
+
+        response = client.post(self.url, headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_legacy_token_without_jti(self, client: TestClient, user: UserWithAttrs) -> None:
+        token = jwt.encode(
+            {'sub': user.model.email}, algorithm=Settings().ACCESS_TOKEN_ALGORITHM, key=Settings().SECRET_KEY
+        )
+
+        response = client.post(self.url, headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
 
 class TestRefreshAccessToken:
     url = '/refresh-token'
     settings = Settings()
 
+    def test_current_user_cached(self, client: TestClient, user: UserWithAttrs, token: str) -> None:
+        client.post(self.url, headers={'Authorization': f'Bearer {token}'})
+
+        with capture_queries() as queries:
+            response = client.post(self.url, headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == HTTPStatus.OK
+        assert queries == []
+        assert current_user_cache.hits == 1
+        assert current_user_cache.misses == 1
+
     def test_refresh_token(self, client: TestClient, user: UserWithAttrs, token: str) -> None:
         response = client.post(
             self.url,
@@ -76,7 +362,56 @@ class TestRefreshAccessToken:
 
         assert response.status_code == HTTPStatus.OK
         assert new_token['token_type'] == 'bearer'
-        assert decoded['sub'] == user.model.email
+        assert decoded['sub'] == str(user.model.id)
+
+    def test_lookup_by_primary_key(self, client: TestClient, user: UserWithAttrs, token: str) -> None:
+        with capture_queries() as queries:
+            response = client.post(self.url, headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == HTTPStatus.OK
+        users_queries = [statement for statement, _ in queries if 'FROM users' in statement]
+        assert len(users_queries) == 1
+        assert 'WHERE users.id = ' in users_queries[0]
+
+    def test_legacy_email_token(self, client: TestClient, user: UserWithAttrs) -> None:
+        token = jwt.encode(
+            {'sub': user.model.email}, algorithm=self.settings.ACCESS_TOKEN_ALGORITHM, key=self.settings.SECRET_KEY
+        )
+
+        response = client.post(self.url, headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == HTTPStatus.OK
+        decoded = jwt.decode(
+            response.json()['access_token'],
+            algorithms=[self.settings.ACCESS_TOKEN_ALGORITHM],
+            key=self.settings.SECRET_KEY,
+        )
+        assert decoded['sub'] == str(user.model.id)
+
+    def test_legacy_email_token_not_in_database(self, client: TestClient) -> None:
+        token = jwt.encode(
+            {'sub': 'invalid@test.com'}, algorithm=self.settings.ACCESS_TOKEN_ALGORITHM, key=self.settings.SECRET_KEY
+        )
+
+        response = client.post(self.url, headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_outdated_token_version(self, client: TestClient, user: UserWithAttrs) -> None:
+        token = create_access_token(user_id=user.model.id, token_version=user.model.token_version - 1)
+
+        response = client.post(self.url, headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+        assert response.json() == {'message': 'Não autorizado'}
+
+    def test_outdated_token_version_cached(self, client: TestClient, user: UserWithAttrs, token: str) -> None:
+        client.post(self.url, headers={'Authorization': f'Bearer {token}'})
+        outdated = create_access_token(user_id=user.model.id, token_version=user.model.token_version - 1)
+
+        response = client.post(self.url, headers={'Authorization': f'Bearer {outdated}'})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
 
     def test_invalid_token(self, client: TestClient) -> None:
         response = client.post(
@@ -89,7 +424,7 @@ class TestRefreshAccessToken:
 
     def test_expired_token(self, client: TestClient, user: UserWithAttrs) -> None:
         with freeze_time('2000-01-01 00:00:00'):
-            token = create_access_token(email=user.model.email)
+            token = create_access_token(user_id=user.model.id, token_version=user.model.token_version)
 
         with freeze_time('2020-01-01 00:00:00'):
             response = client.post(
@@ -112,7 +447,7 @@ class TestRefreshAccessToken:
         assert response.json() == {'message': 'Não autorizado'}
 
     def test_token_with_user_not_in_database(self, client: TestClient) -> None:
-        token = create_access_token(email='invalid')
+        token = create_access_token(user_id=1, token_version=0)
 
         response = client.post(
             self.url,
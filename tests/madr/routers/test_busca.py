@@ -0,0 +1,113 @@
+from http import HTTPStatus
+
+import sqlalchemy as sa
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from madr.models import Base, Livro, Romancista
+from tests.utils import capture_queries, explain
+
+
+class TestBusca:
+    url = '/busca'
+
+    def test_busca(self, client: TestClient, dbsession: Session) -> None:
+        romancista = Romancista(name='machado de assis')
+        dbsession.add_all(
+            [
+                Livro(title='memórias póstumas de brás cubas', year=1881, romancista=romancista),
+                Livro(title='memórias de um sargento de milícias', year=1854, romancista=romancista),
+                Livro(title='dom casmurro', year=1899, romancista=romancista),
+            ]
+        )
+        dbsession.commit()
+
+        response = client.get(self.url, params={'q': 'memórias'})
+
+        assert response.status_code == HTTPStatus.OK
+        hits = response.json()['hits']
+        assert [(hit['kind'], hit['text']) for hit in hits] == [
+            ('livro', 'memórias póstumas de brás cubas'),
+            ('livro', 'memórias de um sargento de milícias'),
+        ]
+        assert all(hit['rank'] > 0 for hit in hits)
+
+    def test_both_kinds(self, client: TestClient, dbsession: Session) -> None:
+        romancista = Romancista(name='josé de alencar')
+        dbsession.add(Livro(title='alencar por alencar', year=1900, romancista=romancista))
+        dbsession.commit()
+
+        response = client.get(self.url, params={'q': 'alencar'})
+
+        assert response.status_code == HTTPStatus.OK
+        hits = response.json()['hits']
+        assert {(hit['kind'], hit['id']) for hit in hits} == {('livro', 1), ('romancista', romancista.id)}
+        assert hits == sorted(hits, key=lambda hit: hit['rank'], reverse=True)
+
+    def test_ranking(self, client: TestClient, dbsession: Session) -> None:
+        dbsession.add_all([Romancista(name='graciliano ramos'), Romancista(name='ramos ramos ramos')])
+        dbsession.commit()
+
+        response = client.get(self.url, params={'q': 'ramos'})
+
+        assert response.status_code == HTTPStatus.OK
+        assert [hit['text'] for hit in response.json()['hits']] == ['ramos ramos ramos', 'graciliano ramos']
+
+    def test_pagination(self, client: TestClient, dbsession: Session) -> None:
+        dbsession.add_all([Romancista(name=f'autor {i}') for i in range(5)])
+        dbsession.commit()
+
+        all_hits = client.get(self.url, params={'q': 'autor', 'limit': 10}).json()['hits']
+        response = client.get(self.url, params={'q': 'autor', 'offset': 2, 'limit': 2})
+
+        assert response.status_code == HTTPStatus.OK
+        assert len(all_hits) == 5  # noqa: PLR2004
+        assert response.json()['hits'] == all_hits[2:4]
+
+    def test_not_found(self, client: TestClient, romancista: Romancista) -> None:
+        response = client.get(self.url, params={'q': 'inexistente'})
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {'hits': []}
+
+    def test_empty_query(self, client: TestClient) -> None:
+        response = client.get(self.url, params={'q': ''})
+
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+class TestBuscaIndexes:
+    url = '/busca'
+
+    def test_uses_gin_indexes(self, client: TestClient, dbsession: Session) -> None:
+        indexes = [
+            index
+            for table in ('livros', 'romancistas')
+            for index in Base.metadata.tables[table].indexes
+            if index.name in {'ix_livros_search_vector', 'ix_romancistas_search_vector'}
+        ]
+        for index in indexes:
+            index.drop(dbsession.connection())
+        dbsession.execute(
+            sa.text('INSERT INTO romancistas (name) SELECT md5(i::text) FROM generate_series(1, 200000) i')
+        )
+        dbsession.execute(
+            sa.text(
+                'INSERT INTO livros (title, year, romancista_id) '
+                'SELECT md5(i::text), 2000, (SELECT min(id) FROM romancistas) FROM generate_series(1, 200000) i'
+            )
+        )
+        for index in indexes:
+            index.create(dbsession.connection())
+        dbsession.execute(sa.text('ANALYZE livros, romancistas'))
+        dbsession.commit()
+
+        with capture_queries() as queries:
+            response = client.get(self.url, params={'q': 'c4ca4238a0b923820dcc509a6f75849b'})
+
+        assert response.status_code == HTTPStatus.OK
+        assert len(response.json()['hits']) == 2  # noqa: PLR2004
+        statement, parameters = next(query for query in queries if 'UNION ALL' in query[0])
+        plan = explain(dbsession, statement, parameters)
+        assert 'ix_livros_search_vector' in plan
+        assert 'ix_romancistas_search_vector' in plan
@@ -1,12 +1,14 @@
 from http import HTTPStatus
 
+import jwt
 import sqlalchemy as sa
 from faker import Faker
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
 from madr.models import User
-from madr.security import verify_password
+from madr.schemas import CurrentUser
+from madr.security import create_access_token, current_user_cache, revocation_list, settings, verify_password
 from madr.utils import sanitize
 from tests.utils import UserWithAttrs
 
@@ -75,6 +77,21 @@ class TestCreateUser:
         assert response.status_code == HTTPStatus.CONFLICT
         assert response.json() == {'message': 'Conta já consta no MADR'}
 
+    def test_email_already_exists_with_different_case(
+        self, client: TestClient, faker: Faker, other_user: UserWithAttrs
+    ) -> None:
+        response = client.post(
+            self.url,
+            json={
+                'email': other_user.model.email.upper(),
+                'username': faker.user_name(),
+                'password': faker.password(),
+            },
+        )
+
+        assert response.status_code == HTTPStatus.CONFLICT
+        assert response.json() == {'message': 'Conta já consta no MADR'}
+
     def test_empty_username(self, client: TestClient, faker: Faker) -> None:
         response = client.post(
             self.url,
@@ -154,9 +171,121 @@ class TestUpdateUser:
             'email': email,
             'username': sanitize(username),
         }
+        dbsession.expire_all()
         assert verify_password(
             password, dbsession.scalars(sa.select(User).where(User.id == user.model.id)).one().password
         )
+        assert current_user_cache.get(str(user.model.id)) is None
+
+    def test_password_change_revokes_tokens(
+        self, client: TestClient, user: UserWithAttrs, token: str, faker: Faker
+    ) -> None:
+        client.put(
+            self.url.format(user_id=user.model.id),
+            headers={'Authorization': f'Bearer {token}'},
+            json={'email': user.model.email, 'username': user.model.username, 'password': faker.password()},
+        )
+
+        response = client.post('/refresh-token', headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_password_change_reaches_other_workers(
+        self, client: TestClient, user: UserWithAttrs, token: str, faker: Faker
+    ) -> None:
+        stale_user = CurrentUser.model_validate(user.model)
+        client.put(
+            self.url.format(user_id=user.model.id),
+            headers={'Authorization': f'Bearer {token}'},
+            json={'email': user.model.email, 'username': user.model.username, 'password': faker.password()},
+        )
+        # Outro worker: o usuário continua no seu cache e a lista de revogação é carregada do banco.
+        current_user_cache.set(str(user.model.id), stale_user)
+        revocation_list.clear()
+
+        response = client.post('/refresh-token', headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_password_change_revokes_legacy_tokens(
+        self, client: TestClient, user: UserWithAttrs, token: str, faker: Faker
+    ) -> None:
+        legacy_token = jwt.encode(
+            {'sub': user.model.email}, algorithm=settings.ACCESS_TOKEN_ALGORITHM, key=settings.SECRET_KEY
+        )
+        client.put(
+            self.url.format(user_id=user.model.id),
+            headers={'Authorization': f'Bearer {token}'},
+            json={'email': user.model.email, 'username': user.model.username, 'password': faker.password()},
+        )
+
+        response = client.post('/refresh-token', headers={'Authorization': f'Bearer {legacy_token}'})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_username_change_keeps_legacy_tokens(
+        self, client: TestClient, user: UserWithAttrs, token: str, faker: Faker
+    ) -> None:
+        legacy_token = jwt.encode(
+            {'sub': user.model.email}, algorithm=settings.ACCESS_TOKEN_ALGORITHM, key=settings.SECRET_KEY
+        )
+        client.put(
+            self.url.format(user_id=user.model.id),
+            headers={'Authorization': f'Bearer {token}'},
+            json={'email': user.model.email, 'username': faker.user_name(), 'password': user.clean_password},
+        )
+
+        response = client.post('/refresh-token', headers={'Authorization': f'Bearer {legacy_token}'})
+
+        assert response.status_code == HTTPStatus.OK
+
+    def test_new_token_with_stale_cache(
+        self, client: TestClient, user: UserWithAttrs, token: str, faker: Faker
+    ) -> None:
+        stale_user = CurrentUser.model_validate(user.model)
+        client.put(
+            self.url.format(user_id=user.model.id),
+            headers={'Authorization': f'Bearer {token}'},
+            json={'email': user.model.email, 'username': user.model.username, 'password': faker.password()},
+        )
+        current_user_cache.set(str(user.model.id), stale_user)
+        new_token = create_access_token(user_id=user.model.id, token_version=stale_user.token_version + 1)
+
+        response = client.post('/refresh-token', headers={'Authorization': f'Bearer {new_token}'})
+
+        assert response.status_code == HTTPStatus.OK
+        cached_user = current_user_cache.get(str(user.model.id))
+        assert cached_user is not None
+        assert cached_user.token_version == stale_user.token_version + 1
+
+    def test_email_change_keeps_tokens(
+        self, client: TestClient, user: UserWithAttrs, token: str, faker: Faker
+    ) -> None:
+        client.put(
+            self.url.format(user_id=user.model.id),
+            headers={'Authorization': f'Bearer {token}'},
+            json={'email': faker.email(), 'username': user.model.username, 'password': user.clean_password},
+        )
+
+        response = client.post('/refresh-token', headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == HTTPStatus.OK
+
+    def test_user_removed_after_cached(
+        self, client: TestClient, dbsession: Session, user: UserWithAttrs, token: str, faker: Faker
+    ) -> None:
+        current_user_cache.set(str(user.model.id), CurrentUser.model_validate(user.model))
+        dbsession.delete(user.model)
+        dbsession.commit()
+
+        response = client.put(
+            self.url.format(user_id=user.model.id),
+            headers={'Authorization': f'Bearer {token}'},
+            json={'email': faker.email(), 'username': faker.user_name(), 'password': faker.password()},
+        )
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+        assert response.json() == {'message': 'Não autorizado'}
 
     def test_without_token(self, client: TestClient, user: UserWithAttrs, faker: Faker) -> None:
         response = client.put(
@@ -304,6 +433,48 @@ class TestDeleteUser:
         assert response.status_code == HTTPStatus.OK
         assert response.json() == {'message': 'Conta deletada com sucesso'}
         assert dbsession.scalar(sa.select(User).where(User.id == user.model.id)) is None
+        assert current_user_cache.get(str(user.model.id)) is None
+
+    def test_token_rejected_after_delete(self, client: TestClient, user: UserWithAttrs, token: str) -> None:
+        client.delete(self.url.format(user_id=user.model.id), headers={'Authorization': f'Bearer {token}'})
+
+        response = client.delete(self.url.format(user_id=user.model.id), headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_delete_reaches_other_workers(self, client: TestClient, user: UserWithAttrs, token: str) -> None:
+        stale_user = CurrentUser.model_validate(user.model)
+        client.delete(self.url.format(user_id=user.model.id), headers={'Authorization': f'Bearer {token}'})
+        current_user_cache.set(str(user.model.id), stale_user)
+        revocation_list.clear()
+
+        response = client.post('/refresh-token', headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_delete_revokes_legacy_tokens(self, client: TestClient, user: UserWithAttrs, token: str) -> None:
+        stale_user = CurrentUser.model_validate(user.model)
+        legacy_token = jwt.encode(
+            {'sub': user.model.email.upper()}, algorithm=settings.ACCESS_TOKEN_ALGORITHM, key=settings.SECRET_KEY
+        )
+        client.delete(self.url.format(user_id=user.model.id), headers={'Authorization': f'Bearer {token}'})
+        current_user_cache.set(user.model.email.upper(), stale_user)
+
+        response = client.post('/refresh-token', headers={'Authorization': f'Bearer {legacy_token}'})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_user_removed_after_cached(
+        self, client: TestClient, dbsession: Session, user: UserWithAttrs, token: str
+    ) -> None:
+        current_user_cache.set(str(user.model.id), CurrentUser.model_validate(user.model))
+        dbsession.delete(user.model)
+        dbsession.commit()
+
+        response = client.delete(self.url.format(user_id=user.model.id), headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+        assert response.json() == {'message': 'Não autorizado'}
 
     def test_without_token(self, client: TestClient, user: UserWithAttrs) -> None:
         response = client.delete(
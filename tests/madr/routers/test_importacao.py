@@ -0,0 +1,89 @@
+from collections.abc import Iterator
+from http import HTTPStatus
+
+import sqlalchemy as sa
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from madr.models import Livro, Romancista
+
+
+class TestImportCatalogo:
+    url = '/importacao'
+
+    def test_csv(self, client: TestClient, dbsession: Session, token: str) -> None:
+        def body() -> Iterator[bytes]:
+            yield b'title,year,romancista\n'
+            yield b'Dom Casmurro,1899,Machado'
+            yield b' de Assis\nIracema,1865,Jos\xc3'
+            yield b'\xa9 de Alencar\n'
+
+        response = client.post(
+            self.url,
+            headers={'Authorization': f'Bearer {token}', 'Content-Type': 'text/csv'},
+            content=body(),
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {
+            'romancistas_created': 2,
+            'livros_created': 2,
+            'livros_skipped': 0,
+            'invalid_rows': 0,
+        }
+        assert set(dbsession.scalars(sa.select(Romancista.name))) == {'machado de assis', 'josé de alencar'}
+
+    def test_ndjson(self, client: TestClient, dbsession: Session, token: str, livro: Livro) -> None:
+        response = client.post(
+            self.url,
+            params={'format': 'ndjson'},
+            headers={'Authorization': f'Bearer {token}', 'Content-Type': 'application/x-ndjson'},
+            content=f'{{"title": "{livro.title}", "year": 2000, "romancista": "x"}}\n{{"title": "?"}}\n',
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {
+            'romancistas_created': 1,
+            'livros_created': 0,
+            'livros_skipped': 1,
+            'invalid_rows': 1,
+        }
+
+    def test_invalidates_response_cache(self, client: TestClient, token: str) -> None:
+        client.get('/livro')
+        client.get('/romancista')
+
+        client.post(
+            self.url,
+            headers={'Authorization': f'Bearer {token}', 'Content-Type': 'text/csv'},
+            content=b'title,year,romancista\nIracema,1865,Alencar\n',
+        )
+
+        assert client.get('/livro').json()['livros'][0]['title'] == 'iracema'
+        assert client.get('/romancista').json()['romancistas'][0]['name'] == 'alencar'
+
+    def test_invalidates_missing_ids(self, client: TestClient, token: str) -> None:
+        client.get('/livro/1')
+        client.get('/romancista/1')
+
+        client.post(
+            self.url,
+            headers={'Authorization': f'Bearer {token}', 'Content-Type': 'text/csv'},
+            content=b'title,year,romancista\nIracema,1865,Alencar\n',
+        )
+
+        assert client.get('/livro/1').json()['title'] == 'iracema'
+        assert client.get('/romancista/1').json()['name'] == 'alencar'
+
+    def test_invalid_format(self, client: TestClient, token: str) -> None:
+        response = client.post(
+            self.url, params={'format': 'xml'}, headers={'Authorization': f'Bearer {token}'}, content=b''
+        )
+
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+    def test_without_token(self, client: TestClient) -> None:
+        response = client.post(self.url, content=b'title,year,romancista\n')
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+        assert response.json() == {'detail': 'Not authenticated'}
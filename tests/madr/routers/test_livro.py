@@ -1,14 +1,27 @@
+import csv
+import io
+import json
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime
 from http import HTTPStatus
 from random import randint
+from unittest.mock import Mock
 
+import pytest
 import sqlalchemy as sa
 from faker import Faker
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
-from madr.models import Livro, Romancista
-from madr.utils import sanitize
+from madr.api import app
+from madr.conditional import make_etag
+from madr.database import get_read_session_factory, get_session_factory
+from madr.models import Base, Livro, Romancista
+from madr.response_cache import missing_livros, response_cache
+from madr.utils import encode_cursor, sanitize
 from tests.factories import LivroFactory, RomancistaFactory
+from tests.utils import before_statement, capture_queries, explain, randstr
 
 
 class TestCreateLivro:
@@ -119,6 +132,153 @@ class TestCreateLivro:
         assert response.status_code == HTTPStatus.NOT_FOUND
         assert response.json() == {'message': 'Romancista não consta no MADR'}
 
+    def test_romancista_removed_concurrently(
+        self, client: TestClient, dbsession: Session, romancista: Romancista, token: str
+    ) -> None:
+        def remove_romancista() -> None:
+            dbsession.delete(romancista)
+            dbsession.commit()
+
+        with before_statement('INSERT INTO livros', remove_romancista):
+            response = client.post(
+                self.url,
+                headers={'Authorization': f'Bearer {token}'},
+                json={'title': 'livro', 'year': 2000, 'romancista_id': romancista.id},
+            )
+
+        assert response.status_code == HTTPStatus.NOT_FOUND
+        assert response.json() == {'message': 'Romancista não consta no MADR'}
+
+
+class TestCreateLivroBulk:
+    url = '/livro/bulk'
+
+    def test_create_livros(self, client: TestClient, romancista: Romancista, token: str) -> None:
+        livros = [{'title': f'livro {i}', 'year': 2000 + i, 'romancista_id': romancista.id} for i in range(3)]
+
+        response = client.post(self.url, headers={'Authorization': f'Bearer {token}'}, json=livros)
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {
+            'results': [
+                {'status': 'created', 'livro': {'id': i + 1, **livro}, 'message': None}
+                for i, livro in enumerate(livros)
+            ]
+        }
+
+    def test_per_item_errors(self, client: TestClient, romancista: Romancista, token: str, livro: Livro) -> None:
+        response = client.post(
+            self.url,
+            headers={'Authorization': f'Bearer {token}'},
+            json=[
+                {'title': 'novo', 'year': 2000, 'romancista_id': romancista.id},
+                {'title': livro.title, 'year': 2000, 'romancista_id': romancista.id},
+                {'title': 'sem romancista', 'year': 2000, 'romancista_id': 999},
+                {'title': 'novo', 'year': 2001, 'romancista_id': romancista.id},
+            ],
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        results = response.json()['results']
+        assert [result['status'] for result in results] == ['created', 'conflict', 'not_found', 'conflict']
+        assert results[0]['livro']['title'] == 'novo'
+        assert results[1] == {'status': 'conflict', 'livro': None, 'message': 'Livro já consta no MADR'}
+        assert results[2] == {'status': 'not_found', 'livro': None, 'message': 'Romancista não consta no MADR'}
+
+    def test_all_romancistas_not_found(self, client: TestClient, token: str) -> None:
+        response = client.post(
+            self.url,
+            headers={'Authorization': f'Bearer {token}'},
+            json=[{'title': 'livro', 'year': 2000, 'romancista_id': 1}],
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['results'][0]['status'] == 'not_found'
+
+    def test_romancista_removed_concurrently(
+        self, client: TestClient, dbsession: Session, romancista: Romancista, token: str
+    ) -> None:
+        def remove_romancista() -> None:
+            dbsession.delete(romancista)
+            dbsession.commit()
+
+        with before_statement('INSERT INTO livros', remove_romancista):
+            response = client.post(
+                self.url,
+                headers={'Authorization': f'Bearer {token}'},
+                json=[{'title': 'livro', 'year': 2000, 'romancista_id': romancista.id}],
+            )
+
+        assert response.status_code == HTTPStatus.NOT_FOUND
+        assert response.json() == {'message': 'Romancista não consta no MADR'}
+
+    def test_constant_number_of_queries(self, client: TestClient, romancista: Romancista, token: str) -> None:
+        livros = [{'title': f'livro {i}', 'year': 2000, 'romancista_id': romancista.id} for i in range(500)]
+
+        with capture_queries() as queries:
+            response = client.post(self.url, headers={'Authorization': f'Bearer {token}'}, json=livros)
+
+        assert response.status_code == HTTPStatus.OK
+        assert all(result['status'] == 'created' for result in response.json()['results'])
+        assert len([query for query in queries if 'INSERT INTO livros' in query[0]]) == 1
+        assert len([query for query in queries if 'FROM romancistas' in query[0]]) == 1
+
+    def test_without_token(self, client: TestClient, romancista: Romancista) -> None:
+        response = client.post(self.url, json=[{'title': 'livro', 'year': 2000, 'romancista_id': romancista.id}])
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+        assert response.json() == {'detail': 'Not authenticated'}
+
+    def test_empty_list(self, client: TestClient, token: str) -> None:
+        response = client.post(self.url, headers={'Authorization': f'Bearer {token}'}, json=[])
+
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+    def test_invalid_item(self, client: TestClient, romancista: Romancista, token: str) -> None:
+        response = client.post(
+            self.url,
+            headers={'Authorization': f'Bearer {token}'},
+            json=[{'title': '?', 'year': 2000, 'romancista_id': romancista.id}],
+        )
+
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+        assert response.json()['detail'][0]['loc'] == ['body', 0, 'title']
+
+
+class TestExportLivro:
+    url = '/livro/export'
+
+    def test_ndjson(self, client: TestClient, dbsession: Session) -> None:
+        livros = LivroFactory.build_batch(3)
+        dbsession.add_all(livros)
+        dbsession.commit()
+
+        response = client.get(self.url)
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers['content-type'] == 'application/x-ndjson'
+        assert response.headers['content-disposition'] == 'attachment; filename="livros.ndjson"'
+        assert [json.loads(line) for line in response.text.splitlines()] == [
+            {'id': livro.id, 'title': livro.title, 'year': livro.year, 'romancista_id': livro.romancista_id}
+            for livro in livros
+        ]
+
+    def test_csv(self, client: TestClient, livro: Livro) -> None:
+        response = client.get(self.url, params={'format': 'csv'})
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers['content-type'].startswith('text/csv')
+        assert list(csv.reader(io.StringIO(response.text))) == [
+            ['id', 'title', 'year', 'romancista_id'],
+            [str(livro.id), livro.title, str(livro.year), str(livro.romancista_id)],
+        ]
+
+    def test_empty(self, client: TestClient) -> None:
+        response = client.get(self.url)
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.text == ''
+
 
 class TesteGetLivro:
     url = '/livro/{livro_id}'
@@ -144,6 +304,93 @@ class TesteGetLivro:
         assert response.status_code == HTTPStatus.NOT_FOUND
         assert response.json() == {'message': 'Livro não consta no MADR'}
 
+    def test_validators(self, client: TestClient, livro: Livro) -> None:
+        response = client.get(self.url.format(livro_id=livro.id))
+
+        assert response.headers['etag'] == make_etag(livro.id, livro.updated_at)
+        assert response.headers['last-modified'] == format_datetime(livro.updated_at.replace(tzinfo=UTC), usegmt=True)
+
+    @pytest.mark.parametrize('if_none_match', ['{etag}', 'W/{etag}', '"other", {etag}', '*'])
+    def test_if_none_match(self, client: TestClient, livro: Livro, if_none_match: str) -> None:
+        etag = make_etag(livro.id, livro.updated_at)
+
+        response = client.get(
+            self.url.format(livro_id=livro.id), headers={'If-None-Match': if_none_match.format(etag=etag)}
+        )
+
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+        assert response.content == b''
+        assert response.headers['etag'] == etag
+
+    def test_if_none_match_changed(self, client: TestClient, livro: Livro) -> None:
+        response = client.get(self.url.format(livro_id=livro.id), headers={'If-None-Match': '"other"'})
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['id'] == livro.id
+
+    def test_if_none_match_takes_precedence(self, client: TestClient, livro: Livro) -> None:
+        response = client.get(
+            self.url.format(livro_id=livro.id),
+            headers={
+                'If-None-Match': '"other"',
+                'If-Modified-Since': format_datetime(datetime.now(UTC), usegmt=True),
+            },
+        )
+
+        assert response.status_code == HTTPStatus.OK
+
+    @pytest.mark.parametrize('offset', [timedelta(0), timedelta(hours=1)])
+    def test_if_modified_since(self, client: TestClient, livro: Livro, offset: timedelta) -> None:
+        modified_since = livro.updated_at.replace(tzinfo=UTC) + offset
+
+        response = client.get(
+            self.url.format(livro_id=livro.id),
+            headers={'If-Modified-Since': format_datetime(modified_since, usegmt=True)},
+        )
+
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+    def test_if_modified_since_without_timezone(self, client: TestClient, livro: Livro) -> None:
+        modified_since = livro.updated_at.replace(tzinfo=None) + timedelta(hours=1)
+
+        response = client.get(
+            self.url.format(livro_id=livro.id), headers={'If-Modified-Since': format_datetime(modified_since)}
+        )
+
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+    @pytest.mark.parametrize('modified_since', ['Mon, 01 Jan 2001 00:00:00 GMT', 'invalid'])
+    def test_if_modified_since_changed(self, client: TestClient, livro: Livro, modified_since: str) -> None:
+        response = client.get(self.url.format(livro_id=livro.id), headers={'If-Modified-Since': modified_since})
+
+        assert response.status_code == HTTPStatus.OK
+
+    def test_etag_changes_after_update(self, client: TestClient, token: str, livro: Livro) -> None:
+        etag = client.get(self.url.format(livro_id=livro.id)).headers['etag']
+        client.patch(
+            self.url.format(livro_id=livro.id), headers={'Authorization': f'Bearer {token}'}, json={'year': 1900}
+        )
+
+        response = client.get(self.url.format(livro_id=livro.id), headers={'If-None-Match': etag})
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers['etag'] != etag
+
+    def test_not_modified_only_queries_timestamp(self, client: TestClient, livro: Livro) -> None:
+        url, etag = self.url.format(livro_id=livro.id), make_etag(livro.id, livro.updated_at)
+
+        with capture_queries() as queries:
+            response = client.get(url, headers={'If-None-Match': etag})
+
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+        [(statement, _)] = [query for query in queries if 'FROM livros' in query[0]]
+        assert statement.startswith('SELECT livros.updated_at \nFROM livros')
+
+    def test_conditional_not_found(self, client: TestClient) -> None:
+        response = client.get(self.url.format(livro_id=1), headers={'If-None-Match': '*'})
+
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
 
 class TestListLivro:
     url = '/livro'
@@ -162,7 +409,8 @@ class TestListLivro:
             'livros': [
                 {'id': livro.id, 'title': livro.title, 'year': livro.year, 'romancista_id': livro.romancista_id}
                 for livro in livros
-            ]
+            ],
+            'next_cursor': None,
         }
 
     def test_empty_list(self, client: TestClient) -> None:
@@ -171,7 +419,7 @@ class TestListLivro:
         )
 
         assert response.status_code == HTTPStatus.OK
-        assert response.json() == {'livros': []}
+        assert response.json() == {'livros': [], 'next_cursor': None}
 
     def test_partial_title(self, client: TestClient, dbsession: Session) -> None:
         livros = [LivroFactory.build(title=f'{'a' if i % 2 else 'b'}{i}') for i in range(randint(3, 10))]
@@ -189,7 +437,8 @@ class TestListLivro:
                 {'id': livro.id, 'title': livro.title, 'year': livro.year, 'romancista_id': livro.romancista_id}
                 for livro in livros
                 if 'a' in livro.title
-            ]
+            ],
+            'next_cursor': None,
         }
 
     def test_year_title(self, client: TestClient, dbsession: Session) -> None:
@@ -210,7 +459,8 @@ class TestListLivro:
                 {'id': livro.id, 'title': livro.title, 'year': livro.year, 'romancista_id': livro.romancista_id}
                 for livro in livros
                 if livro.year == year
-            ]
+            ],
+            'next_cursor': None,
         }
 
     def test_offset(self, client: TestClient, dbsession: Session) -> None:
@@ -227,7 +477,8 @@ class TestListLivro:
             'livros': [
                 {'id': livro.id, 'title': livro.title, 'year': livro.year, 'romancista_id': livro.romancista_id}
                 for livro in livros[:20]
-            ]
+            ],
+            'next_cursor': encode_cursor(livros[19].id),
         }
 
         for i in range(20, len(livros)):
@@ -241,7 +492,8 @@ class TestListLivro:
                 'livros': [
                     {'id': livro.id, 'title': livro.title, 'year': livro.year, 'romancista_id': livro.romancista_id}
                     for livro in livros[i : i + 20]
-                ]
+                ],
+                'next_cursor': encode_cursor(livros[i + 19].id) if i + 20 < len(livros) else None,
             }
 
     def test_limit(self, client: TestClient, dbsession: Session) -> None:
@@ -260,7 +512,8 @@ class TestListLivro:
                 'livros': [
                     {'id': livro.id, 'title': livro.title, 'year': livro.year, 'romancista_id': livro.romancista_id}
                     for livro in livros[:i]
-                ]
+                ],
+                'next_cursor': encode_cursor(livros[i - 1].id) if i else None,
             }
 
     def test_all_params(self, client: TestClient, dbsession: Session) -> None:
@@ -285,9 +538,214 @@ class TestListLivro:
                 'livros': [
                     {'id': livro.id, 'title': livro.title, 'year': livro.year, 'romancista_id': livro.romancista_id}
                     for livro in livros_filtered[i : i + 5]
-                ]
+                ],
+                'next_cursor': encode_cursor(livros_filtered[i + 4].id) if i + 5 < len(livros_filtered) else None,
             }
 
+    def test_cursor(self, client: TestClient, dbsession: Session) -> None:
+        livros = LivroFactory.build_batch(randint(30, 40))
+        dbsession.add_all(livros)
+        dbsession.commit()
+
+        returned = []
+        params = {'limit': 7}
+        while True:
+            response = client.get(self.url, params=params)
+            assert response.status_code == HTTPStatus.OK
+            returned.extend(response.json()['livros'])
+            if not response.json()['next_cursor']:
+                break
+            params['cursor'] = response.json()['next_cursor']
+
+        assert returned == [
+            {'id': livro.id, 'title': livro.title, 'year': livro.year, 'romancista_id': livro.romancista_id}
+            for livro in livros
+        ]
+
+    def test_cursor_with_filters(self, client: TestClient, dbsession: Session) -> None:
+        year = randint(1900, 2100)
+
+        livros = [
+            LivroFactory.build(title=f'{'b' if i % 2 else 'a'}{i}', year=year if i % 4 else year + 10)
+            for i in range(randint(40, 50))
+        ]
+        dbsession.add_all(livros)
+        dbsession.commit()
+        livros_filtered = [livro for livro in livros if 'b' in livro.title and livro.year == year]
+
+        response = client.get(
+            self.url,
+            params={'title': 'b', 'year': year, 'limit': 5, 'cursor': encode_cursor(livros_filtered[4].id)},
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {
+            'livros': [
+                {'id': livro.id, 'title': livro.title, 'year': livro.year, 'romancista_id': livro.romancista_id}
+                for livro in livros_filtered[5:10]
+            ],
+            'next_cursor': encode_cursor(livros_filtered[9].id),
+        }
+
+    def test_invalid_cursor(self, client: TestClient) -> None:
+        response = client.get(
+            self.url,
+            params={'cursor': 'invalid'},
+        )
+
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert response.json() == {'message': 'Cursor de paginação inválido'}
+
+
+class TestListLivroIndexes:
+    url = '/livro'
+
+    def test_title_uses_trigram_index(self, client: TestClient, dbsession: Session) -> None:
+        index = next(index for index in Base.metadata.tables['livros'].indexes if index.name == 'ix_livros_title_trgm')
+        index.drop(dbsession.connection())
+        dbsession.execute(sa.insert(Romancista).values(name=randstr()))
+        dbsession.execute(
+            sa.text(
+                'INSERT INTO livros (title, year, romancista_id) '
+                'SELECT md5(i::text), 2000, (SELECT min(id) FROM romancistas) FROM generate_series(1, 1000000) i'
+            )
+        )
+        index.create(dbsession.connection())
+        dbsession.execute(sa.text('ANALYZE livros'))
+        dbsession.commit()
+
+        with capture_queries() as queries:
+            response = client.get(self.url, params={'title': 'c4ca42'})
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['livros'] != []
+        statement, parameters = next(query for query in queries if 'FROM livros' in query[0])
+        assert 'ix_livros_title_trgm' in explain(dbsession, statement, parameters)
+
+
+class TestListLivroCache:
+    url = '/livro'
+
+    def test_cached(self, client: TestClient, livro: Livro) -> None:
+        first = client.get(self.url, params={'year': livro.year, 'limit': 5})
+
+        with capture_queries() as queries:
+            response = client.get(self.url, params={'limit': '5', 'year': str(livro.year), 'unknown': 'x'})
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == first.json()
+        assert [query for query in queries if 'FROM livros' in query[0]] == []
+        assert response_cache.stats()['livros'].hits == 1
+
+    def test_equivalent_titles(self, client: TestClient, livro: Livro) -> None:
+        first = client.get(self.url, params={'title': livro.title})
+
+        with capture_queries() as queries:
+            response = client.get(self.url, params={'title': f'  {livro.title.upper()}!'})
+
+        assert [item['id'] for item in response.json()['livros']] == [livro.id]
+        assert response.json() == first.json()
+        assert [query for query in queries if 'FROM livros' in query[0]] == []
+
+    def test_invalidated_by_create(self, client: TestClient, token: str, romancista: Romancista) -> None:
+        client.get(self.url)
+
+        client.post(
+            self.url,
+            headers={'Authorization': f'Bearer {token}'},
+            json={'title': 'novo', 'year': 2000, 'romancista_id': romancista.id},
+        )
+
+        assert [livro['title'] for livro in client.get(self.url).json()['livros']] == ['novo']
+
+    @pytest.mark.parametrize(
+        ('write', 'unused_factory'), [(True, get_read_session_factory), (False, get_session_factory)]
+    )
+    def test_refilled_from_primary_after_write(
+        self, client: TestClient, token: str, livro: Livro, *, write: bool, unused_factory: Callable[[], object]
+    ) -> None:
+        if write:
+            client.patch(f'{self.url}/{livro.id}', headers={'Authorization': f'Bearer {token}'}, json={'year': 1900})
+        app.dependency_overrides[unused_factory] = lambda: Mock(side_effect=AssertionError)
+
+        response = client.get(self.url)
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['livros'][0]['id'] == livro.id
+
+    def test_invalidated_by_bulk(self, client: TestClient, token: str, romancista: Romancista) -> None:
+        client.get(self.url)
+
+        client.post(
+            f'{self.url}/bulk',
+            headers={'Authorization': f'Bearer {token}'},
+            json=[{'title': 'novo', 'year': 2000, 'romancista_id': romancista.id}],
+        )
+
+        assert [livro['title'] for livro in client.get(self.url).json()['livros']] == ['novo']
+
+    def test_invalidated_by_patch(self, client: TestClient, token: str, livro: Livro) -> None:
+        client.get(self.url)
+
+        client.patch(f'{self.url}/{livro.id}', headers={'Authorization': f'Bearer {token}'}, json={'year': 1900})
+
+        assert client.get(self.url).json()['livros'][0]['year'] == 1900  # noqa: PLR2004
+
+    def test_invalidated_by_delete(self, client: TestClient, token: str, livro: Livro) -> None:
+        client.get(self.url)
+
+        client.delete(f'{self.url}/{livro.id}', headers={'Authorization': f'Bearer {token}'})
+
+        assert client.get(self.url).json()['livros'] == []
+
+    def test_not_invalidated_by_failed_patch(self, client: TestClient, token: str, livro: Livro) -> None:
+        client.get(self.url)
+
+        client.patch(
+            f'{self.url}/{livro.id}', headers={'Authorization': f'Bearer {token}'}, json={'romancista_id': -1}
+        )
+        client.get(self.url)
+
+        assert response_cache.stats()['livros'].hits == 1
+
+
+class TestMissingLivroCache:
+    url = '/livro'
+
+    @pytest.mark.parametrize('headers', [{}, {'If-None-Match': '*'}])
+    def test_cached(self, client: TestClient, headers: dict[str, str]) -> None:
+        client.get(f'{self.url}/1', headers=headers)
+
+        with capture_queries() as queries:
+            response = client.get(f'{self.url}/1')
+
+        assert response.status_code == HTTPStatus.NOT_FOUND
+        assert response.json() == {'message': 'Livro não consta no MADR'}
+        assert [query for query in queries if 'FROM livros' in query[0]] == []
+        assert missing_livros.stats().hits == 1
+
+    def test_invalidated_by_create(self, client: TestClient, token: str, romancista: Romancista) -> None:
+        client.get(f'{self.url}/1')
+
+        client.post(
+            self.url,
+            headers={'Authorization': f'Bearer {token}'},
+            json={'title': 'novo', 'year': 2000, 'romancista_id': romancista.id},
+        )
+
+        assert client.get(f'{self.url}/1').json()['title'] == 'novo'
+
+    def test_invalidated_by_bulk(self, client: TestClient, token: str, romancista: Romancista) -> None:
+        client.get(f'{self.url}/1')
+
+        client.post(
+            f'{self.url}/bulk',
+            headers={'Authorization': f'Bearer {token}'},
+            json=[{'title': 'novo', 'year': 2000, 'romancista_id': romancista.id}],
+        )
+
+        assert client.get(f'{self.url}/1').json()['title'] == 'novo'
+
 
 class TestPatchLivro:
     url = '/livro/{livro_id}'
@@ -1,14 +1,21 @@
+import json
+from datetime import UTC
+from email.utils import format_datetime
 from http import HTTPStatus
 from random import randint
 
+import pytest
 import sqlalchemy as sa
 from faker import Faker
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
-from madr.models import Romancista
-from madr.utils import sanitize
+from madr.conditional import make_etag
+from madr.models import Base, Livro, Romancista
+from madr.response_cache import missing_romancistas, response_cache
+from madr.utils import encode_cursor, sanitize
 from tests.factories import RomancistaFactory
+from tests.utils import capture_queries, explain
 
 
 class TestCreateRomancista:
@@ -69,6 +76,30 @@ class TestCreateRomancista:
         assert response.json() == {'message': 'Romancista já consta no MADR'}
 
 
+class TestExportRomancista:
+    url = '/romancista/export'
+
+    def test_ndjson(self, client: TestClient, dbsession: Session) -> None:
+        romancistas = RomancistaFactory.build_batch(3)
+        dbsession.add_all(romancistas)
+        dbsession.commit()
+
+        response = client.get(self.url)
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers['content-disposition'] == 'attachment; filename="romancistas.ndjson"'
+        assert [json.loads(line) for line in response.text.splitlines()] == [
+            {'id': romancista.id, 'name': romancista.name} for romancista in romancistas
+        ]
+
+    def test_csv(self, client: TestClient, romancista: Romancista) -> None:
+        response = client.get(self.url, params={'format': 'csv'})
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers['content-disposition'] == 'attachment; filename="romancistas.csv"'
+        assert response.text == f'id,name\n{romancista.id},{romancista.name}\n'
+
+
 class TesteGetRomancista:
     url = '/romancista/{romancista_id}'
 
@@ -91,6 +122,39 @@ class TesteGetRomancista:
         assert response.status_code == HTTPStatus.NOT_FOUND
         assert response.json() == {'message': 'Romancista não consta no MADR'}
 
+    def test_validators(self, client: TestClient, romancista: Romancista) -> None:
+        response = client.get(self.url.format(romancista_id=romancista.id))
+
+        assert response.headers['etag'] == make_etag(romancista.id, romancista.updated_at)
+        assert response.headers['last-modified'] == format_datetime(
+            romancista.updated_at.replace(tzinfo=UTC), usegmt=True
+        )
+
+    def test_not_modified_only_queries_timestamp(self, client: TestClient, romancista: Romancista) -> None:
+        url, etag = self.url.format(romancista_id=romancista.id), make_etag(romancista.id, romancista.updated_at)
+
+        with capture_queries() as queries:
+            response = client.get(url, headers={'If-None-Match': etag})
+
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+        assert response.content == b''
+        [(statement, _)] = [query for query in queries if 'FROM romancistas' in query[0]]
+        assert statement.startswith('SELECT romancistas.updated_at \nFROM romancistas')
+
+    def test_modified(self, client: TestClient, romancista: Romancista) -> None:
+        response = client.get(
+            self.url.format(romancista_id=romancista.id),
+            headers={'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'},
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['id'] == romancista.id
+
+    def test_conditional_not_found(self, client: TestClient) -> None:
+        response = client.get(self.url.format(romancista_id=1), headers={'If-None-Match': '*'})
+
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
 
 class TestListRomancista:
     url = '/romancista'
@@ -106,7 +170,8 @@ class TestListRomancista:
 
         assert response.status_code == HTTPStatus.OK
         assert response.json() == {
-            'romancistas': [{'id': romancista.id, 'name': romancista.name} for romancista in romancistas]
+            'romancistas': [{'id': romancista.id, 'name': romancista.name} for romancista in romancistas],
+            'next_cursor': None,
         }
 
     def test_empty_list(self, client: TestClient) -> None:
@@ -115,7 +180,7 @@ class TestListRomancista:
         )
 
         assert response.status_code == HTTPStatus.OK
-        assert response.json() == {'romancistas': []}
+        assert response.json() == {'romancistas': [], 'next_cursor': None}
 
     def test_partial_name(self, client: TestClient, dbsession: Session) -> None:
         romancistas = [RomancistaFactory.build(name=f'{'a' if i % 2 else 'b'}{i}') for i in range(randint(3, 10))]
@@ -131,7 +196,8 @@ class TestListRomancista:
         assert response.json() == {
             'romancistas': [
                 {'id': romancista.id, 'name': romancista.name} for romancista in romancistas if 'a' in romancista.name
-            ]
+            ],
+            'next_cursor': None,
         }
 
     def test_offset(self, client: TestClient, dbsession: Session) -> None:
@@ -145,7 +211,8 @@ class TestListRomancista:
 
         assert response.status_code == HTTPStatus.OK
         assert response.json() == {
-            'romancistas': [{'id': romancista.id, 'name': romancista.name} for romancista in romancistas[:20]]
+            'romancistas': [{'id': romancista.id, 'name': romancista.name} for romancista in romancistas[:20]],
+            'next_cursor': encode_cursor(romancistas[19].id),
         }
 
         for i in range(20, len(romancistas)):
@@ -158,7 +225,8 @@ class TestListRomancista:
             assert response.json() == {
                 'romancistas': [
                     {'id': romancista.id, 'name': romancista.name} for romancista in romancistas[i : i + 20]
-                ]
+                ],
+                'next_cursor': encode_cursor(romancistas[i + 19].id) if i + 20 < len(romancistas) else None,
             }
 
     def test_limit(self, client: TestClient, dbsession: Session) -> None:
@@ -174,7 +242,8 @@ class TestListRomancista:
 
             assert response.status_code == HTTPStatus.OK
             assert response.json() == {
-                'romancistas': [{'id': romancista.id, 'name': romancista.name} for romancista in romancistas[:i]]
+                'romancistas': [{'id': romancista.id, 'name': romancista.name} for romancista in romancistas[:i]],
+                'next_cursor': encode_cursor(romancistas[i - 1].id) if i else None,
             }
 
     def test_all_params(self, client: TestClient, dbsession: Session) -> None:
@@ -193,9 +262,158 @@ class TestListRomancista:
             assert response.json() == {
                 'romancistas': [
                     {'id': romancista.id, 'name': romancista.name} for romancista in romancistas_filtrados[i : i + 5]
-                ]
+                ],
+                'next_cursor': (
+                    encode_cursor(romancistas_filtrados[i + 4].id) if i + 5 < len(romancistas_filtrados) else None
+                ),
             }
 
+    def test_cursor(self, client: TestClient, dbsession: Session) -> None:
+        romancistas = RomancistaFactory.build_batch(randint(30, 40))
+        dbsession.add_all(romancistas)
+        dbsession.commit()
+
+        returned = []
+        params = {'limit': 7}
+        while True:
+            response = client.get(self.url, params=params)
+            assert response.status_code == HTTPStatus.OK
+            returned.extend(response.json()['romancistas'])
+            if not response.json()['next_cursor']:
+                break
+            params['cursor'] = response.json()['next_cursor']
+
+        assert returned == [{'id': romancista.id, 'name': romancista.name} for romancista in romancistas]
+
+    def test_cursor_with_name(self, client: TestClient, dbsession: Session) -> None:
+        romancistas = [RomancistaFactory.build(name=f'{'a' if i % 2 else 'b'}{i}') for i in range(randint(30, 40))]
+        dbsession.add_all(romancistas)
+        dbsession.commit()
+        romancistas_filtrados = [romancista for romancista in romancistas if 'b' in romancista.name]
+
+        response = client.get(
+            self.url,
+            params={'name': 'b', 'limit': 5, 'cursor': encode_cursor(romancistas_filtrados[4].id)},
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {
+            'romancistas': [
+                {'id': romancista.id, 'name': romancista.name} for romancista in romancistas_filtrados[5:10]
+            ],
+            'next_cursor': encode_cursor(romancistas_filtrados[9].id),
+        }
+
+    def test_invalid_cursor(self, client: TestClient) -> None:
+        response = client.get(
+            self.url,
+            params={'cursor': 'invalid'},
+        )
+
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert response.json() == {'message': 'Cursor de paginação inválido'}
+
+
+class TestListRomancistaIndexes:
+    url = '/romancista'
+
+    def test_name_uses_trigram_index(self, client: TestClient, dbsession: Session) -> None:
+        index = next(
+            index for index in Base.metadata.tables['romancistas'].indexes if index.name == 'ix_romancistas_name_trgm'
+        )
+        index.drop(dbsession.connection())
+        dbsession.execute(
+            sa.text('INSERT INTO romancistas (name) SELECT md5(i::text) FROM generate_series(1, 1000000) i')
+        )
+        index.create(dbsession.connection())
+        dbsession.execute(sa.text('ANALYZE romancistas'))
+        dbsession.commit()
+
+        with capture_queries() as queries:
+            response = client.get(self.url, params={'name': 'c4ca42'})
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['romancistas'] != []
+        statement, parameters = next(query for query in queries if 'FROM romancistas' in query[0])
+        assert 'ix_romancistas_name_trgm' in explain(dbsession, statement, parameters)
+
+
+class TestListRomancistaCache:
+    url = '/romancista'
+
+    def test_cached(self, client: TestClient, romancista: Romancista) -> None:
+        first = client.get(self.url, params={'name': romancista.name})
+
+        with capture_queries() as queries:
+            response = client.get(self.url, params={'name': romancista.name, 'limit': 20})
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == first.json()
+        assert [query for query in queries if 'FROM romancistas' in query[0]] == []
+        assert response_cache.stats()['romancistas'].hits == 1
+
+    def test_equivalent_names(self, client: TestClient, romancista: Romancista) -> None:
+        first = client.get(self.url, params={'name': romancista.name})
+
+        with capture_queries() as queries:
+            response = client.get(self.url, params={'name': f'  {romancista.name.upper()}!'})
+
+        assert [item['id'] for item in response.json()['romancistas']] == [romancista.id]
+        assert response.json() == first.json()
+        assert [query for query in queries if 'FROM romancistas' in query[0]] == []
+
+    def test_invalidated_by_create(self, client: TestClient, token: str) -> None:
+        client.get(self.url)
+
+        client.post(self.url, headers={'Authorization': f'Bearer {token}'}, json={'name': 'novo'})
+
+        assert [romancista['name'] for romancista in client.get(self.url).json()['romancistas']] == ['novo']
+
+    def test_invalidated_by_update(self, client: TestClient, token: str, romancista: Romancista) -> None:
+        client.get(self.url)
+
+        client.put(f'{self.url}/{romancista.id}', headers={'Authorization': f'Bearer {token}'}, json={'name': 'novo'})
+
+        assert client.get(self.url).json()['romancistas'][0]['name'] == 'novo'
+
+    def test_invalidated_by_delete(self, client: TestClient, token: str, romancista: Romancista) -> None:
+        client.get(self.url)
+
+        client.delete(f'{self.url}/{romancista.id}', headers={'Authorization': f'Bearer {token}'})
+
+        assert client.get(self.url).json()['romancistas'] == []
+
+    def test_livro_changes_keep_cache(self, client: TestClient, token: str, livro: Livro) -> None:
+        client.get(self.url)
+
+        client.patch(f'/livro/{livro.id}', headers={'Authorization': f'Bearer {token}'}, json={'year': 1900})
+        client.get(self.url)
+
+        assert response_cache.stats()['romancistas'].hits == 1
+
+
+class TestMissingRomancistaCache:
+    url = '/romancista'
+
+    @pytest.mark.parametrize('headers', [{}, {'If-None-Match': '*'}])
+    def test_cached(self, client: TestClient, headers: dict[str, str]) -> None:
+        client.get(f'{self.url}/1', headers=headers)
+
+        with capture_queries() as queries:
+            response = client.get(f'{self.url}/1')
+
+        assert response.status_code == HTTPStatus.NOT_FOUND
+        assert response.json() == {'message': 'Romancista não consta no MADR'}
+        assert [query for query in queries if 'FROM romancistas' in query[0]] == []
+        assert missing_romancistas.stats().hits == 1
+
+    def test_invalidated_by_create(self, client: TestClient, token: str) -> None:
+        client.get(f'{self.url}/1')
+
+        client.post(self.url, headers={'Authorization': f'Bearer {token}'}, json={'name': 'novo'})
+
+        assert client.get(f'{self.url}/1').json()['name'] == 'novo'
+
 
 class TestUpdateRomancista:
     url = '/romancista/{romancista_id}'
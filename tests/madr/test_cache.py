@@ -0,0 +1,137 @@
+from madr.cache import BloomFilter, NegativeCache, TTLCache
+from tests.utils import randstr
+
+
+class TestTTLCache:
+    def test_get_and_set(self) -> None:
+        cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+
+        assert cache.get('a') is None
+        cache.set('a', 1)
+
+        assert cache.get('a') == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_expired(self) -> None:
+        cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1, ttl=0)
+
+        assert cache.get('a') is None
+        assert len(cache) == 0
+
+    def test_evicts_least_recently_used(self) -> None:
+        cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+
+        cache.set('c', 3)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3  # noqa: PLR2004
+
+    def test_disabled(self) -> None:
+        cache: TTLCache[str, int] = TTLCache(maxsize=0, ttl=60)
+        cache.set('a', 1)
+
+        assert cache.get('a') is None
+
+    def test_delete_and_clear(self) -> None:
+        cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        cache.delete('a')
+        cache.delete('a')
+
+        assert cache.get('a') is None
+        cache.clear()
+        assert len(cache) == 0
+        assert (cache.hits, cache.misses) == (0, 0)
+
+    def test_stats(self) -> None:
+        cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+        assert cache.stats().hit_ratio == 0.0
+
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('b')
+
+        assert cache.stats().model_dump() == {'size': 1, 'maxsize': 2, 'hits': 1, 'misses': 1, 'hit_ratio': 0.5}
+
+
+class TestNegativeCache:
+    def test_add(self) -> None:
+        cache = NegativeCache(maxsize=2, ttl=60)
+
+        assert not cache.get(1)
+        cache.add(1, generation=cache.generation)
+
+        assert cache.get(1)
+
+    def test_invalidate(self) -> None:
+        cache = NegativeCache(maxsize=2, ttl=60)
+        cache.add(1, generation=cache.generation)
+
+        cache.invalidate()
+
+        assert not cache.get(1)
+        assert cache.misses == 1
+
+    def test_discard(self) -> None:
+        cache = NegativeCache(maxsize=2, ttl=60)
+        cache.add(1, generation=cache.generation)
+        cache.add(2, generation=cache.generation)
+
+        cache.discard(1)
+
+        assert not cache.get(1)
+        assert cache.get(2)
+
+    def test_add_observed_before_discard(self) -> None:
+        cache = NegativeCache(maxsize=2, ttl=60)
+        generation = cache.generation
+
+        cache.discard(1)
+        cache.add(1, generation=generation)
+
+        assert len(cache) == 0
+
+    def test_add_observed_before_invalidation(self) -> None:
+        cache = NegativeCache(maxsize=2, ttl=60)
+        generation = cache.generation
+
+        cache.invalidate()
+        cache.add(1, generation=generation)
+
+        assert len(cache) == 0
+
+
+class TestBloomFilter:
+    def test_add(self) -> None:
+        sut = BloomFilter(capacity=1000, error_rate=0.01)
+        keys = [randstr() for _ in range(1000)]
+        for key in keys:
+            sut.add(key)
+
+        assert all(key in sut for key in keys)
+        assert len(sut) == 1000  # noqa: PLR2004
+
+    def test_false_positive_rate(self) -> None:
+        sut = BloomFilter(capacity=1000, error_rate=0.01)
+        for _ in range(1000):
+            sut.add(randstr())
+
+        false_positives = sum(randstr() in sut for _ in range(10_000))
+
+        assert false_positives < 10_000 * 0.01 * 2
+
+    def test_clear(self) -> None:
+        sut = BloomFilter(capacity=10, error_rate=0.01)
+        sut.add('a')
+
+        sut.clear()
+
+        assert 'a' not in sut
+        assert len(sut) == 0
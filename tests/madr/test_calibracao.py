@@ -0,0 +1,29 @@
+import pytest
+
+from madr.calibracao import calibrate, main
+
+
+class TestCalibrate:
+    def test_stops_after_target(self) -> None:
+        measurements = calibrate(target=0, memory_cost=64, parallelism=1, max_time_cost=5, samples=1)
+
+        assert [time_cost for time_cost, _ in measurements] == [1]
+
+    def test_max_time_cost(self) -> None:
+        measurements = calibrate(target=60, memory_cost=64, parallelism=1, max_time_cost=3, samples=1)
+
+        assert [time_cost for time_cost, _ in measurements] == [1, 2, 3]
+
+
+class TestMain:
+    def test_within_target(self, capsys: pytest.CaptureFixture[str]) -> None:
+        main(['--target-ms', '60000', '--memory-cost', '64', '--parallelism', '1', '--max-time-cost', '2'])
+
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[-3:] == ['ARGON2_TIME_COST=2', 'ARGON2_MEMORY_COST=64', 'ARGON2_PARALLELISM=1']
+        assert lines[0].startswith('# time_cost=1: ')
+
+    def test_target_too_low(self, capsys: pytest.CaptureFixture[str]) -> None:
+        main(['--target-ms', '0', '--memory-cost', '64', '--parallelism', '1', '--samples', '1'])
+
+        assert 'ARGON2_TIME_COST=1' in capsys.readouterr().out.splitlines()
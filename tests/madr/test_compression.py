@@ -0,0 +1,253 @@
+import gzip
+import json
+import zlib
+from collections.abc import AsyncIterator
+from http import HTTPStatus
+
+import brotli
+import pytest
+import zstandard
+from fastapi import FastAPI, HTTPException, Response, WebSocket
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from starlette.types import Message
+
+from madr.compression import (
+    COMPRESSORS,
+    CompressionMiddleware,
+    CompressionResponder,
+    T_Encoding,
+    choose_encoding,
+    main,
+    measure_compression,
+    sample_payload,
+    uncompressed,
+)
+from tests.factories import LivroFactory, RomancistaFactory
+
+DECOMPRESS = {
+    'gzip': gzip.decompress,
+    'br': brotli.decompress,
+    'zstd': lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data),
+}
+BODY = b'{"data": "' + b'x' * 2000 + b'"}'
+
+
+class TestChooseEncoding:
+    @pytest.mark.parametrize(
+        ('accept_encoding', 'expected'),
+        [
+            ('gzip, deflate, br, zstd', 'zstd'),
+            ('gzip, br', 'br'),
+            ('gzip;q=1, zstd;q=0.5', 'gzip'),
+            ('GZIP', 'gzip'),
+            ('*', 'zstd'),
+            ('*, zstd;q=0', 'br'),
+            ('gzip;q=invalid, br;q=0', None),
+            ('deflate, identity', None),
+            ('', None),
+        ],
+    )
+    def test_choose_encoding(self, accept_encoding: str, expected: str | None) -> None:
+        assert choose_encoding(accept_encoding, ['zstd', 'br', 'gzip']) == expected
+
+    def test_only_configured_encodings(self) -> None:
+        assert choose_encoding('zstd, br', ['gzip']) is None
+
+
+class TestCompressors:
+    @pytest.mark.parametrize('encoding', ['zstd', 'br', 'gzip'])
+    def test_streaming_round_trip(self, encoding: T_Encoding) -> None:
+        compressor = COMPRESSORS[encoding](3)
+
+        data = compressor.compress(b'primeiro ') + compressor.flush()
+        data += compressor.compress(b'segundo') + compressor.finish()
+
+        assert DECOMPRESS[encoding](data) == b'primeiro segundo'
+
+    def test_flush_emits_decodable_prefix(self) -> None:
+        compressor = COMPRESSORS['gzip'](6)
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        assert decompressor.decompress(compressor.compress(b'parcial') + compressor.flush()) == b'parcial'
+
+
+@uncompressed
+async def opted_out() -> Response:
+    return Response(BODY, media_type='application/json')
+
+
+class TestCompressionMiddleware:
+    @pytest.fixture
+    def client(self) -> TestClient:
+        app = FastAPI()
+        app.add_middleware(
+            CompressionMiddleware,
+            encodings=['zstd', 'br', 'gzip'],
+            levels={'zstd': 3, 'br': 4, 'gzip': 6},
+            minimum_size=1000,
+        )
+
+        @app.get('/large')
+        async def large() -> Response:
+            return Response(BODY, media_type='application/json', headers={'ETag': '"1"'})
+
+        @app.get('/small')
+        async def small() -> Response:
+            return Response(b'{}', media_type='application/json')
+
+        @app.get('/encoded')
+        async def encoded() -> Response:
+            return Response(gzip.compress(BODY), headers={'Content-Encoding': 'gzip'})
+
+        @app.get('/not-modified')
+        async def not_modified() -> Response:
+            raise HTTPException(HTTPStatus.NOT_MODIFIED)
+
+        @app.get('/stream')
+        async def stream() -> StreamingResponse:
+            async def chunks() -> AsyncIterator[bytes]:
+                yield b'a' * 10
+                yield b''
+                yield b'b' * 10
+
+            return StreamingResponse(chunks(), media_type='application/x-ndjson')
+
+        app.get('/opted-out')(opted_out)
+
+        return TestClient(app)
+
+    @pytest.mark.parametrize('encoding', ['zstd', 'br', 'gzip'])
+    def test_compress(self, client: TestClient, encoding: T_Encoding) -> None:
+        with client.stream('GET', '/large', headers={'Accept-Encoding': encoding}) as response:
+            raw = b''.join(response.iter_raw())
+
+        assert response.headers['content-encoding'] == encoding
+        assert response.headers['content-length'] == str(len(raw))
+        assert response.headers['vary'] == 'Accept-Encoding'
+        assert response.headers['etag'] == 'W/"1"'
+        assert DECOMPRESS[encoding](raw) == BODY
+
+    def test_without_accept_encoding(self, client: TestClient) -> None:
+        response = client.get('/large', headers={'Accept-Encoding': 'identity'})
+
+        assert 'content-encoding' not in response.headers
+        assert response.headers['etag'] == '"1"'
+        assert response.content == BODY
+
+    @pytest.mark.parametrize('url', ['/small', '/opted-out', '/encoded'])
+    def test_not_compressed(self, client: TestClient, url: str) -> None:
+        response = client.get(url, headers={'Accept-Encoding': 'br'})
+
+        assert response.headers.get('content-encoding') != 'br'
+        assert response.json() in ({}, json.loads(BODY))
+
+    def test_not_modified(self, client: TestClient) -> None:
+        response = client.get('/not-modified', headers={'Accept-Encoding': 'gzip'})
+
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+        assert 'content-encoding' not in response.headers
+
+    def test_streaming(self, client: TestClient) -> None:
+        response = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+
+        assert response.headers['content-encoding'] == 'gzip'
+        assert 'content-length' not in response.headers
+        assert response.content == b'a' * 10 + b'b' * 10
+
+    def test_websocket_passthrough(self) -> None:
+        app = FastAPI()
+        app.add_middleware(CompressionMiddleware, encodings=['gzip'], levels={'gzip': 6}, minimum_size=0)
+
+        @app.websocket('/ws')
+        async def ws(websocket: WebSocket) -> None:
+            await websocket.accept()
+            await websocket.send_text('ok')
+            await websocket.close()
+
+        with TestClient(app).websocket_connect('/ws', headers={'Accept-Encoding': 'gzip'}) as websocket:
+            assert websocket.receive_text() == 'ok'
+
+
+@pytest.mark.anyio
+class TestCompressionResponder:
+    async def test_streamed_chunks_are_flushed(self) -> None:
+        messages: list[Message] = []
+
+        async def send(message: Message) -> None:
+            messages.append(message)
+
+        sut = CompressionResponder({'type': 'http'}, send, encoding='gzip', level=6, minimum_size=1000)
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        await sut.send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-length', b'9')]})
+        await sut.send({'type': 'http.response.body', 'body': b'primeiro\n', 'more_body': True})
+
+        assert dict(messages[0]['headers'])[b'content-encoding'] == b'gzip'
+        assert b'content-length' not in dict(messages[0]['headers'])
+        assert decompressor.decompress(messages[1]['body']) == b'primeiro\n'
+
+        await sut.send({'type': 'http.response.body', 'body': b'segundo\n'})
+
+        assert decompressor.decompress(messages[2]['body']) == b'segundo\n'
+        assert decompressor.eof
+
+    async def test_other_messages_passthrough(self) -> None:
+        messages: list[Message] = []
+
+        async def send(message: Message) -> None:
+            messages.append(message)
+
+        sut = CompressionResponder({'type': 'http'}, send, encoding='gzip', level=6, minimum_size=0)
+
+        await sut.send({'type': 'http.response.trailers', 'headers': [], 'more_trailers': False})
+
+        assert messages == [{'type': 'http.response.trailers', 'headers': [], 'more_trailers': False}]
+
+
+class TestAppCompression:
+    def test_list_livros(self, client: TestClient, dbsession: Session) -> None:
+        romancista = RomancistaFactory.build()
+        dbsession.add_all(LivroFactory.build_batch(50, romancista=romancista))
+        dbsession.commit()
+
+        response = client.get('/livro', params={'limit': 50}, headers={'Accept-Encoding': 'gzip'})
+
+        assert response.headers['content-encoding'] == 'gzip'
+        assert len(response.json()['livros']) == 50  # noqa: PLR2004
+
+    def test_health_opted_out(self, client: TestClient) -> None:
+        response = client.get('/health', headers={'Accept-Encoding': 'gzip'})
+
+        assert 'content-encoding' not in response.headers
+
+
+class TestBenchmark:
+    def test_measure_compression(self) -> None:
+        payload = sample_payload(100)
+
+        size, elapsed = measure_compression(payload, encoding='gzip', level=6, samples=2)
+
+        assert json.loads(payload)['livros'][99]['id'] == 100  # noqa: PLR2004
+        assert 0 < size < len(payload)
+        assert elapsed > 0
+
+    def test_main(self, capsys: pytest.CaptureFixture[str]) -> None:
+        main(['--rows', '20', '--samples', '1'])
+
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0].startswith('# payload: ')
+        assert [line.split()[0] for line in lines[1:]] == [
+            'gzip:1',
+            'gzip:6',
+            'gzip:9',
+            'br:1',
+            'br:4',
+            'br:6',
+            'br:11',
+            'zstd:1',
+            'zstd:3',
+            'zstd:9',
+            'zstd:19',
+        ]
@@ -1,6 +1,13 @@
 from http import HTTPStatus
 
-from madr.errors import ConflictError, InvalidLoginError, NotFoundError, UnauthorizedError
+from madr.errors import (
+    ConflictError,
+    InvalidCursorError,
+    InvalidLoginError,
+    NotFoundError,
+    TooManyRequestsError,
+    UnauthorizedError,
+)
 from tests.utils import randstr
 
 
@@ -54,3 +61,27 @@ class TestConflictError:
         sut = ConflictError(resource=resource)
 
         assert sut.message == f'{resource} já consta no MADR'
+
+
+class TestInvalidCursorError:
+    def test_http_status_code(self) -> None:
+        sut = InvalidCursorError()
+
+        assert sut.http_status_code == HTTPStatus.BAD_REQUEST
+
+    def test_message(self) -> None:
+        sut = InvalidCursorError()
+
+        assert sut.message == 'Cursor de paginação inválido'
+
+
+class TestTooManyRequestsError:
+    def test_http_status_code(self) -> None:
+        sut = TooManyRequestsError()
+
+        assert sut.http_status_code == HTTPStatus.TOO_MANY_REQUESTS
+
+    def test_message(self) -> None:
+        sut = TooManyRequestsError()
+
+        assert sut.message == 'Muitas tentativas, tente novamente mais tarde'
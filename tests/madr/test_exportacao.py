@@ -0,0 +1,46 @@
+from functools import partial
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from madr import exportacao
+from madr.database import create_sessionmaker
+from madr.exportacao import export_rows
+from madr.models import Romancista
+
+
+@pytest.mark.anyio
+class TestExportRows:
+    @pytest.fixture(autouse=True)
+    def _romancistas(self, dbsession: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+        dbsession.add_all([Romancista(name=f'romancista {i}') for i in range(5)])
+        dbsession.commit()
+        monkeypatch.setattr(exportacao, 'PARTITION_SIZE', 2)
+
+    query = sa.select(Romancista.name).order_by(Romancista.id)
+
+    async def test_partitions(self, dbengine: Engine) -> None:
+        async_dbengine = create_async_engine(dbengine.url, poolclass=NullPool)
+
+        chunks = [chunk async for chunk in export_rows(partial(AsyncSession, async_dbengine), self.query, 'ndjson')]
+
+        assert chunks == [
+            '{"name": "romancista 0"}\n{"name": "romancista 1"}\n',
+            '{"name": "romancista 2"}\n{"name": "romancista 3"}\n',
+            '{"name": "romancista 4"}\n',
+        ]
+        await async_dbengine.dispose()
+
+    async def test_thread_pool_session(self, dbengine: Engine) -> None:
+        chunks = [chunk async for chunk in export_rows(create_sessionmaker(dbengine), self.query, 'csv')]
+
+        assert chunks == [
+            'name\n',
+            'romancista 0\nromancista 1\n',
+            'romancista 2\nromancista 3\n',
+            'romancista 4\n',
+        ]
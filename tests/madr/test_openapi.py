@@ -0,0 +1,114 @@
+import json
+from inspect import getsource
+from pathlib import Path
+from types import ModuleType
+from typing import Annotated
+from unittest.mock import patch
+
+import pytest
+from fastapi import Body, FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from madr.api import app
+from madr.openapi import (
+    FINGERPRINT_KEY,
+    iter_models,
+    load_openapi_schema,
+    main,
+    schema_fingerprint,
+    setup_openapi,
+    write_openapi_schema,
+)
+from madr.settings import Settings
+
+
+class TestOpenapiSchema:
+    @pytest.fixture
+    def sut(self) -> FastAPI:
+        sut = FastAPI(title='Teste', version='1.0.0')
+
+        @sut.get('/item')
+        async def item() -> dict[str, int]:
+            return {'id': 1}
+
+        return sut
+
+    @staticmethod
+    def fingerprint(sut: FastAPI) -> dict[str, str]:
+        return {FINGERPRINT_KEY: schema_fingerprint(sut)}
+
+    def test_write_and_load(self, sut: FastAPI, tmp_path: Path) -> None:
+        path = tmp_path / 'openapi.json'
+        write_openapi_schema(sut, path)
+        schema = json.loads(path.read_bytes())
+        sut.openapi_schema = None
+
+        assert load_openapi_schema(sut, path)
+        assert schema.pop(FINGERPRINT_KEY) == schema_fingerprint(sut)
+        assert sut.openapi_schema == schema
+        assert TestClient(sut).get('/openapi.json').json() == schema
+
+    def test_served_without_generating(self, sut: FastAPI, tmp_path: Path) -> None:
+        path = tmp_path / 'openapi.json'
+        path.write_text(json.dumps({'openapi': '3.1.0', 'info': {'title': 'Estático'}, **self.fingerprint(sut)}))
+
+        load_openapi_schema(sut, path)
+
+        assert TestClient(sut).get('/openapi.json').json() == {'openapi': '3.1.0', 'info': {'title': 'Estático'}}
+
+    def test_other_routes(self, sut: FastAPI, tmp_path: Path) -> None:
+        path = tmp_path / 'openapi.json'
+        write_openapi_schema(sut, path)
+        sut.openapi_schema = None
+
+        @sut.get('/other')
+        async def other() -> dict[str, int]:
+            return {'id': 1}
+
+        assert not load_openapi_schema(sut, path)
+        assert TestClient(sut).get('/openapi.json').json()['paths'].keys() == {'/item', '/other'}
+
+    def test_without_fingerprint(self, sut: FastAPI, tmp_path: Path) -> None:
+        path = tmp_path / 'openapi.json'
+        path.write_text(json.dumps({'openapi': '3.1.0', 'info': {'title': 'Teste', 'version': '1.0.0'}}))
+
+        assert not load_openapi_schema(sut, path)
+
+    def test_setup(self, sut: FastAPI, tmp_path: Path) -> None:
+        path = tmp_path / 'openapi.json'
+        path.write_text(json.dumps({'openapi': '3.1.0', 'info': {'title': 'Estático'}, **self.fingerprint(sut)}))
+
+        setup_openapi(sut, Settings())
+        assert sut.openapi_schema is None
+
+        setup_openapi(sut, Settings(OPENAPI_SCHEMA_FILE=path))
+        assert sut.openapi_schema is not None
+
+
+class TestSchemaFingerprint:
+    def test_models(self) -> None:
+        class Item(BaseModel):
+            id: int
+
+        assert list(iter_models(Annotated[list[Item] | None, Body()])) == [Item]
+
+    def test_changed_models(self) -> None:
+        fingerprint = schema_fingerprint(app)
+
+        def changed_schemas(module: ModuleType) -> str:
+            return getsource(module) + ('\n# alterado' if module.__name__ == 'madr.schemas' else '')
+
+        # Os modelos vêm de madr.schemas, que não define nenhum endpoint.
+        with patch('madr.openapi.inspect.getsource', side_effect=changed_schemas):
+            assert schema_fingerprint(app) != fingerprint
+        assert schema_fingerprint(app) == fingerprint
+
+
+class TestMain:
+    def test_main(self, tmp_path: Path) -> None:
+        path = tmp_path / 'openapi.json'
+
+        main([str(path)])
+
+        assert json.loads(path.read_bytes()) == {**app.openapi(), FINGERPRINT_KEY: schema_fingerprint(app)}
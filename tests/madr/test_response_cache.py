@@ -0,0 +1,135 @@
+import pytest
+from pydantic import ValidationError
+
+from madr.response_cache import CacheBackend, MemoryCacheBackend, ResponseCache
+from madr.schemas import Message
+from madr.settings import Settings
+
+
+class SharedCacheBackend(CacheBackend):
+    """Simula um backend externo: um único armazenamento visto por vários processos."""
+
+    def __init__(self, data: dict[str, bytes]) -> None:
+        self.data = data
+
+    async def get(self, key: str, /) -> bytes | None:
+        return self.data.get(key)
+
+    async def set(self, key: str, value: bytes, /, *, ttl: float | None = None) -> None:
+        self.data[key] = value
+
+    async def clear(self) -> None:
+        self.data.clear()
+
+
+@pytest.mark.anyio
+class TestResponseCache:
+    @pytest.fixture
+    def sut(self) -> ResponseCache:
+        return ResponseCache(MemoryCacheBackend(maxsize=100), ttl=60)
+
+    async def test_get_and_set(self, sut: ResponseCache) -> None:
+        key = await sut.key('livros', limit=20)
+
+        assert await sut.get(key) is None
+        response = await sut.set(key, Message(message='ok'))
+        cached = await sut.get(key)
+
+        assert cached is not None
+        assert cached.body == response.body == b'{"message":"ok"}'
+        assert cached.media_type == 'application/json'
+
+    async def test_key_normalization(self, sut: ResponseCache) -> None:
+        key = await sut.key('livros', year=2000, title='a', cursor=None)
+
+        assert key == await sut.key('livros', title='a', year=2000)
+        assert key != await sut.key('livros', title='b', year=2000)
+        assert key != await sut.key('romancistas', title='a', year=2000)
+
+    async def test_long_key(self, sut: ResponseCache) -> None:
+        key = await sut.key('livros', title='a' * 10_000)
+
+        assert len(key.key) < 300  # noqa: PLR2004
+        assert key == await sut.key('livros', title='a' * 10_000)
+        assert key != await sut.key('livros', title='a' * 10_001)
+
+    async def test_invalidate(self, sut: ResponseCache) -> None:
+        livros, romancistas = await sut.key('livros'), await sut.key('romancistas')
+        await sut.set(livros, Message(message='livros'))
+        await sut.set(romancistas, Message(message='romancistas'))
+
+        await sut.invalidate('livros')
+
+        assert await sut.get(await sut.key('livros')) is None
+        assert await sut.get(await sut.key('romancistas')) is not None
+
+    async def test_refill_from_primary(self) -> None:
+        sut = ResponseCache(MemoryCacheBackend(maxsize=100), ttl=60, primary_window=60)
+
+        await sut.invalidate('livros')
+
+        assert sut.refill_from_primary('livros')
+        assert not sut.refill_from_primary('romancistas')
+
+    async def test_primary_window_expired(self, sut: ResponseCache) -> None:
+        await sut.invalidate('livros')
+
+        assert not sut.refill_from_primary('livros')
+
+    async def test_set_during_invalidation(self, sut: ResponseCache) -> None:
+        key = await sut.key('livros')
+        await sut.invalidate('livros')
+
+        await sut.set(key, Message(message='stale'))
+
+        assert await sut.get(await sut.key('livros')) is None
+
+    async def test_generation_evicted(self) -> None:
+        backend = MemoryCacheBackend(maxsize=100)
+        sut = ResponseCache(backend, ttl=60)
+        await sut.set(await sut.key('livros'), Message(message='livros'))
+
+        backend.cache.delete('livros:generation')
+
+        assert await sut.get(await sut.key('livros')) is None
+
+    async def test_shared_backend(self) -> None:
+        data: dict[str, bytes] = {}
+        sut, other = ResponseCache(SharedCacheBackend(data), ttl=60), ResponseCache(SharedCacheBackend(data), ttl=60)
+        await sut.set(await sut.key('livros'), Message(message='livros'))
+
+        assert await other.get(await other.key('livros')) is not None
+        await other.invalidate('livros')
+        assert await sut.get(await sut.key('livros')) is None
+
+    async def test_stats(self, sut: ResponseCache) -> None:
+        key = await sut.key('livros')
+        await sut.get(key)
+        await sut.set(key, Message(message='ok'))
+        await sut.get(key)
+        await sut.get(key)
+        await sut.get(await sut.key('romancistas'))
+
+        stats = sut.stats()
+
+        assert list(stats) == ['livros', 'romancistas']
+        assert (stats['livros'].hits, stats['livros'].misses) == (2, 1)
+        assert stats['livros'].hit_ratio == pytest.approx(2 / 3)
+        assert stats['romancistas'].hit_ratio == 0
+
+    async def test_clear(self, sut: ResponseCache) -> None:
+        key = await sut.key('livros')
+        await sut.set(key, Message(message='ok'))
+        await sut.get(key)
+
+        await sut.clear()
+
+        assert sut.stats() == {}
+        assert await sut.get(await sut.key('livros')) is None
+
+
+class TestResponseCacheTtl:
+    def test_capped(self) -> None:
+        # Nos outros workers, uma listagem pode ficar desatualizada por até o TTL.
+        with pytest.raises(ValidationError):
+            Settings(RESPONSE_CACHE_TTL=3600)
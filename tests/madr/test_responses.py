@@ -0,0 +1,143 @@
+from datetime import UTC, datetime
+from http import HTTPStatus
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from madr.api import app
+from madr.responses import FastJSONResponse, FastJSONRoute, main, sample_livro_list
+
+
+class Item(BaseModel):
+    id: int
+    created_at: datetime
+
+
+class ItemWithInternal(Item):
+    internal: str
+
+
+class TestFastJSONResponse:
+    def test_render(self) -> None:
+        response = FastJSONResponse({'name': 'olá', 'created_at': datetime(2024, 1, 2, 3, 4, 5, tzinfo=UTC)})
+
+        assert response.body == '{"name":"olá","created_at":"2024-01-02T03:04:05Z"}'.encode()
+        assert response.headers['content-type'] == 'application/json'
+
+    def test_render_serialized(self) -> None:
+        assert FastJSONResponse(b'{"id":1}').body == b'{"id":1}'
+
+
+class TestFastJSONRoute:
+    @pytest.fixture
+    def client(self) -> TestClient:
+        router = APIRouter(route_class=FastJSONRoute)
+
+        @router.get('/item')
+        async def item() -> Item:
+            return ItemWithInternal(id=1, created_at=datetime(2024, 1, 2, tzinfo=UTC), internal='x')
+
+        @router.get('/exclude', response_model_exclude={'created_at'})
+        async def exclude() -> Item:
+            return Item(id=1, created_at=datetime(2024, 1, 2, tzinfo=UTC))
+
+        @router.get('/json', response_class=JSONResponse)
+        async def json() -> Item:
+            return Item(id=1, created_at=datetime(2024, 1, 2, tzinfo=UTC))
+
+        @router.post('/created', status_code=HTTPStatus.CREATED)
+        async def created(response: Response) -> Item:
+            response.headers['location'] = '/item'
+            return Item(id=1, created_at=datetime(2024, 1, 2, tzinfo=UTC))
+
+        @router.get('/accepted')
+        async def accepted(response: Response) -> Item:
+            response.status_code = HTTPStatus.ACCEPTED
+            return Item(id=1, created_at=datetime(2024, 1, 2, tzinfo=UTC))
+
+        @router.get('/response', response_model=Item)
+        async def response() -> Response:
+            return Response(status_code=HTTPStatus.NOT_MODIFIED)
+
+        @router.get('/dict')
+        async def dict_() -> Item:
+            return {'id': '1', 'created_at': '2024-01-02T00:00:00Z'}  # type: ignore[return-value]
+
+        @router.get('/sync')
+        def sync() -> Item:
+            return Item(id=1, created_at=datetime(2024, 1, 2, tzinfo=UTC))
+
+        @router.get('/streaming')
+        async def streaming() -> StreamingResponse:
+            return StreamingResponse(iter([b'{}']), media_type='application/json')
+
+        test_app = FastAPI(default_response_class=FastJSONResponse)
+        test_app.include_router(router)
+        return TestClient(test_app)
+
+    def test_filters_response_model(self, client: TestClient) -> None:
+        response = client.get('/item')
+
+        assert response.content == b'{"id":1,"created_at":"2024-01-02T00:00:00Z"}'
+
+    def test_response_model_options(self, client: TestClient) -> None:
+        assert client.get('/exclude').json() == {'id': 1}
+
+    def test_status_and_headers(self, client: TestClient) -> None:
+        response = client.post('/created')
+
+        assert response.status_code == HTTPStatus.CREATED
+        assert response.headers['location'] == '/item'
+        assert response.headers['content-type'] == 'application/json'
+        assert response.json() == {'id': 1, 'created_at': '2024-01-02T00:00:00Z'}
+        assert client.get('/accepted').status_code == HTTPStatus.ACCEPTED
+
+    def test_returned_response(self, client: TestClient) -> None:
+        assert client.get('/response').status_code == HTTPStatus.NOT_MODIFIED
+
+    def test_validates_content(self, client: TestClient) -> None:
+        assert client.get('/dict').content == b'{"id":1,"created_at":"2024-01-02T00:00:00Z"}'
+
+    @pytest.mark.parametrize('path', ['/json', '/sync'])
+    def test_not_serialized_by_route(self, client: TestClient, path: str) -> None:
+        route = next(route for route in client.app.routes if getattr(route, 'path', None) == path)  # type: ignore[attr-defined]
+
+        assert isinstance(route, APIRoute)
+        assert route.dependant.call is route.endpoint
+        assert client.get(path).json() == {'id': 1, 'created_at': '2024-01-02T00:00:00Z'}
+
+    def test_streaming(self, client: TestClient) -> None:
+        assert client.get('/streaming').content == b'{}'
+
+    def test_app_routes(self) -> None:
+        routes = [route for route in app.routes if isinstance(route, APIRoute)]
+
+        assert all(isinstance(route, FastJSONRoute) for route in routes)
+        assert all(route.dependant.call is not route.endpoint for route in routes if route.response_model is not None)
+
+    def test_openapi(self, client: TestClient) -> None:
+        operation = client.get('/openapi.json').json()['paths']['/created']['post']
+
+        assert operation['responses']['201']['content']['application/json']['schema'] == {
+            '$ref': '#/components/schemas/Item'
+        }
+        assert 'parameters' not in operation
+
+
+class TestBenchmark:
+    def test_sample_livro_list(self) -> None:
+        livros = sample_livro_list(10).livros
+
+        assert [livro.id for livro in livros] == list(range(1, 11))
+
+    def test_main(self, capsys: pytest.CaptureFixture[str]) -> None:
+        main(['--rows', '10', '--samples', '2'])
+
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0].startswith('# 10 livros, ')
+        assert lines[1].startswith('JSONResponse: ')
+        assert lines[2].startswith('FastJSONResponse: ')
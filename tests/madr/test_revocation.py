@@ -0,0 +1,129 @@
+from collections.abc import AsyncGenerator
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from madr.models import RevokedToken
+from madr.revocation import RevocationList
+from tests.utils import capture_queries
+
+
+@pytest.mark.anyio
+class TestRevocationList:
+    @pytest.fixture
+    async def session(self, dbsession: Session) -> AsyncGenerator[AsyncSession]:
+        async with AsyncSession(create_async_engine(dbsession.get_bind().engine.url, poolclass=NullPool)) as session:
+            yield session
+
+    @pytest.fixture
+    def expires_at(self) -> datetime:
+        return datetime.now(ZoneInfo('UTC')) + timedelta(days=1)
+
+    async def test_load(self, session: AsyncSession, dbsession: Session, expires_at: datetime) -> None:
+        dbsession.add(RevokedToken(id='valid', expires_at=expires_at))
+        dbsession.add(RevokedToken(id='expired', expires_at=expires_at - timedelta(days=2)))
+        dbsession.commit()
+        sut = RevocationList(capacity=100, error_rate=0.01)
+
+        await sut.load(session)
+
+        assert sut.loaded
+        assert 'valid' in sut.bloom
+        assert dbsession.scalars(sa.select(RevokedToken.id)).all() == ['valid']
+
+    async def test_is_revoked(self, session: AsyncSession, expires_at: datetime) -> None:
+        sut = RevocationList(capacity=100, error_rate=0.01)
+        await sut.revoke(session, 'revoked', expires_at=expires_at)
+
+        assert await sut.is_revoked(session, 'other', 'revoked')
+        with capture_queries() as queries:
+            assert not await sut.is_revoked(session, 'other')
+        assert queries == []
+
+    async def test_is_revoked_false_positive(self, session: AsyncSession) -> None:
+        sut = RevocationList(capacity=100, error_rate=0.01)
+        await sut.load(session)
+        sut.bloom.add('not-in-database')
+
+        assert not await sut.is_revoked(session, 'not-in-database')
+
+    async def test_consume(self, session: AsyncSession, expires_at: datetime) -> None:
+        sut = RevocationList(capacity=100, error_rate=0.01)
+
+        assert await sut.consume(session, 'token', family='family', expires_at=expires_at)
+        assert not await sut.consume(session, 'token', family='family', expires_at=expires_at)
+
+    async def test_consume_concurrent_use(self, session: AsyncSession, expires_at: datetime) -> None:
+        sut = RevocationList(capacity=100, error_rate=0.01)
+        other = RevocationList(capacity=100, error_rate=0.01)
+        await other.load(session)
+        await sut.consume(session, 'token', family='family', expires_at=expires_at)
+
+        assert not await other.consume(session, 'token', family='family', expires_at=expires_at)
+
+    async def test_consume_revoked_family(self, session: AsyncSession, expires_at: datetime) -> None:
+        sut = RevocationList(capacity=100, error_rate=0.01)
+        other = RevocationList(capacity=100, error_rate=0.01)
+        await other.load(session)
+        await sut.revoke(session, 'family', expires_at=expires_at)
+
+        assert not await other.consume(session, 'token', family='family', expires_at=expires_at)
+
+    async def test_sync(self, session: AsyncSession, expires_at: datetime) -> None:
+        sut = RevocationList(capacity=100, error_rate=0.01, sync_interval=0)
+        other = RevocationList(capacity=100, error_rate=0.01)
+        await other.revoke(session, 'first', expires_at=expires_at)
+        await sut.load(session)
+        await other.revoke(session, 'second', expires_at=expires_at)
+
+        assert await sut.is_revoked(session, 'second')
+        assert len(sut.bloom) == 2  # noqa: PLR2004
+
+    async def test_sync_only_after_interval(self, session: AsyncSession, expires_at: datetime) -> None:
+        sut = RevocationList(capacity=100, error_rate=0.01, sync_interval=60)
+        other = RevocationList(capacity=100, error_rate=0.01)
+        await sut.load(session)
+        await other.revoke(session, 'revoked', expires_at=expires_at)
+
+        with capture_queries() as queries:
+            assert not await sut.is_revoked(session, 'revoked')
+        assert queries == []
+
+    async def test_sync_after_loading_empty_table(self, session: AsyncSession, expires_at: datetime) -> None:
+        sut = RevocationList(capacity=100, error_rate=0.01, sync_interval=0)
+        other = RevocationList(capacity=100, error_rate=0.01)
+        await sut.load(session)
+        await other.revoke(session, 'revoked', expires_at=expires_at)
+
+        await sut.sync(session)
+
+        assert 'revoked' in sut.bloom
+        assert sut.synced_at is not None
+
+    async def test_sync_reloads_when_full(
+        self, session: AsyncSession, dbsession: Session, expires_at: datetime
+    ) -> None:
+        sut = RevocationList(capacity=1, error_rate=0.01)
+        await sut.revoke(session, 'expiring', expires_at=expires_at)
+        dbsession.execute(sa.update(RevokedToken).values(expires_at=expires_at - timedelta(days=2)))
+        dbsession.commit()
+
+        await sut.sync(session)
+
+        assert len(sut.bloom) == 0
+        assert sut.loaded
+
+    async def test_clear(self, session: AsyncSession, expires_at: datetime) -> None:
+        sut = RevocationList(capacity=100, error_rate=0.01)
+        await sut.revoke(session, 'revoked', expires_at=expires_at)
+
+        sut.clear()
+
+        assert not sut.loaded
+        assert sut.synced_at is None
+        assert 'revoked' not in sut.bloom
@@ -1,13 +1,38 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
+from http import HTTPStatus
 from random import randint
+from unittest.mock import Mock, patch
 from zoneinfo import ZoneInfo
 
 import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from fastapi.testclient import TestClient
 from freezegun import freeze_time
+from pwdlib.hashers.argon2 import Argon2Hasher
 
-from madr.security import create_access_token, get_password_hash, verify_password
+from madr import security
+from madr.errors import UnauthorizedError
+from madr.security import (
+    PasswordExecutor,
+    access_token_cache,
+    check_and_update_password,
+    check_password,
+    create_access_token,
+    create_refresh_token,
+    decode_access_token,
+    decode_refresh_token,
+    get_password_hash,
+    hash_password,
+    verify_and_update_password,
+    verify_password,
+)
 from madr.settings import Settings
-from tests.utils import randstr
+from tests.utils import UserWithAttrs, capture_queries, randstr
 
 
 class TestPasswordHash:
@@ -26,21 +51,257 @@ class TestPasswordHash:
         assert not verify_password(password + '0', hash_)
 
 
+class TestVerifyAndUpdatePassword:
+    def test_current_parameters(self) -> None:
+        password = randstr()
+
+        assert verify_and_update_password(password, get_password_hash(password)) == (True, None)
+
+    def test_outdated_parameters(self) -> None:
+        password = randstr()
+        outdated_hash = Argon2Hasher(time_cost=1, memory_cost=1024, parallelism=1).hash(password)
+
+        valid, updated_hash = verify_and_update_password(password, outdated_hash)
+
+        assert valid
+        assert updated_hash
+        assert verify_and_update_password(password, updated_hash) == (True, None)
+
+    def test_invalid_password(self) -> None:
+        outdated_hash = Argon2Hasher(time_cost=1, memory_cost=1024, parallelism=1).hash(randstr())
+
+        assert verify_and_update_password(randstr(), outdated_hash) == (False, None)
+
+
+@pytest.mark.anyio
+class TestPasswordHashAsync:
+    async def test_password(self) -> None:
+        password = randstr()
+
+        hash_ = await hash_password(password)
+
+        assert verify_password(password, hash_)
+        assert await check_password(password, hash_)
+        assert not await check_password(password + '0', hash_)
+        assert await check_and_update_password(password, hash_) == (True, None)
+
+
+@pytest.mark.anyio
+class TestPasswordExecutor:
+    async def test_recreated_after_broken(self) -> None:
+        password_executor = PasswordExecutor(max_workers=1)
+        hash_ = get_password_hash(password := randstr())
+
+        # A tarefa encerra o processo do pool, e também o do pool recriado na nova tentativa.
+        with pytest.raises(BrokenProcessPool):
+            await password_executor.run(os._exit, 1)
+        assert await password_executor.run(verify_password, password, hash_)
+
+        password_executor.executor.shutdown()
+
+    async def test_recreated_by_other_task(self) -> None:
+        password_executor = PasswordExecutor(max_workers=1)
+        recreated = password_executor.executor
+
+        def submit(*_args: object) -> None:
+            # Outra tarefa recriou o pool enquanto esta usava o antigo.
+            password_executor.executor = recreated
+            raise BrokenProcessPool
+
+        password_executor.executor = Mock(spec=ProcessPoolExecutor, submit=Mock(side_effect=submit))
+
+        assert await password_executor.run(verify_password, 'password', get_password_hash('password'))
+        assert password_executor.executor is recreated
+
+        recreated.shutdown()
+
+
 class TestAccessToken:
     settings = Settings()
 
     def test_token(self) -> None:
         timenow = int(datetime.now(ZoneInfo('UTC')).timestamp())
         timenow = randint(timenow, timenow + int(timedelta(days=365).total_seconds()))
-        email = f'{randstr()}@test.com'
+        user_id = randint(1, 1_000_000)
 
         with freeze_time(datetime.fromtimestamp(timenow, ZoneInfo('UTC'))):
-            returned = create_access_token(email=email)
+            returned = create_access_token(user_id=user_id, token_version=3)
         token_decoded = jwt.decode(
             returned, algorithms=[self.settings.ACCESS_TOKEN_ALGORITHM], key=self.settings.SECRET_KEY
         )
 
         assert token_decoded == {
-            'sub': email,
+            'sub': str(user_id),
+            'ver': 3,
+            'jti': token_decoded['jti'],
             'exp': timenow + self.settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
         }
+        assert (
+            token_decoded['jti']
+            != jwt.decode(
+                create_access_token(user_id=user_id, token_version=3),
+                algorithms=[self.settings.ACCESS_TOKEN_ALGORITHM],
+                key=self.settings.SECRET_KEY,
+            )['jti']
+        )
+
+
+class TestRefreshToken:
+    def test_token(self) -> None:
+        returned = create_refresh_token(user_id=1, token_version=2, family='family')
+
+        payload = decode_refresh_token(returned)
+
+        assert payload['sub'] == '1'
+        assert payload['ver'] == 2  # noqa: PLR2004
+        assert payload['typ'] == 'refresh'
+        assert payload['fam'] == 'family'
+        assert payload['jti']
+
+    def test_new_family(self) -> None:
+        first = decode_refresh_token(create_refresh_token(user_id=1, token_version=0))
+        second = decode_refresh_token(create_refresh_token(user_id=1, token_version=0))
+
+        assert first['fam'] != second['fam']
+
+    def test_invalid_subject(self) -> None:
+        token = jwt.encode(
+            {'sub': 'user@test.com', 'ver': 0, 'typ': 'refresh', 'jti': 'a', 'fam': 'b', 'exp': 4102444800},
+            algorithm=security.settings.ACCESS_TOKEN_ALGORITHM,
+            key=security.settings.SECRET_KEY,
+        )
+
+        with pytest.raises(UnauthorizedError):
+            decode_refresh_token(token)
+
+
+class TestDecodeAccessToken:
+    @pytest.fixture(autouse=True)
+    def _clear_cache(self) -> None:
+        access_token_cache.clear()
+
+    def test_cache_until_expiration(self) -> None:
+        token = create_access_token(user_id=1, token_version=0)
+
+        with patch('madr.security.jwt.decode', wraps=jwt.decode) as decode:
+            first = decode_access_token(token)
+            second = decode_access_token(token)
+
+        assert first == second
+        assert decode.call_count == 1
+        assert (access_token_cache.hits, access_token_cache.misses) == (1, 1)
+
+    def test_expired_cache_entry(self) -> None:
+        token = create_access_token(user_id=1, token_version=0)
+        decode_access_token(token)
+
+        with freeze_time(datetime.now(ZoneInfo('UTC')) + timedelta(days=1)), pytest.raises(UnauthorizedError):
+            decode_access_token(token)
+
+    def test_token_without_exp_not_cached(self) -> None:
+        token = jwt.encode(
+            {'sub': '1'}, algorithm=security.settings.ACCESS_TOKEN_ALGORITHM, key=security.settings.SECRET_KEY
+        )
+
+        decode_access_token(token)
+
+        assert len(access_token_cache) == 0
+
+    def test_invalid_token_not_cached(self) -> None:
+        with pytest.raises(UnauthorizedError):
+            decode_access_token('invalid')
+
+        assert len(access_token_cache) == 0
+
+
+class TestAsymmetricKeys:
+    @pytest.fixture(params=['RS256', 'EdDSA'])
+    def settings(self, request: pytest.FixtureRequest) -> Settings:
+        private_key: rsa.RSAPrivateKey | ed25519.Ed25519PrivateKey
+        if request.param == 'RS256':
+            private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        else:
+            private_key = ed25519.Ed25519PrivateKey.generate()
+        pem = private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+        return Settings(ACCESS_TOKEN_ALGORITHM=request.param, ACCESS_TOKEN_PRIVATE_KEY=pem.decode())
+
+    def test_keys_loaded_once(self, settings: Settings) -> None:
+        assert settings.access_token_signing_key is settings.access_token_signing_key
+        assert settings.access_token_verification_key is settings.access_token_verification_key
+
+    def test_verify_with_public_key_only(self, settings: Settings) -> None:
+        public_key = settings.access_token_verification_key
+        assert not isinstance(public_key, str)
+        public_pem = public_key.public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        replica_settings = Settings(
+            ACCESS_TOKEN_ALGORITHM=settings.ACCESS_TOKEN_ALGORITHM, ACCESS_TOKEN_PUBLIC_KEY=public_pem.decode()
+        )
+        token = jwt.encode(
+            {'sub': '1'}, algorithm=settings.ACCESS_TOKEN_ALGORITHM, key=settings.access_token_signing_key
+        )
+
+        decoded = jwt.decode(
+            token,
+            algorithms=[replica_settings.ACCESS_TOKEN_ALGORITHM],
+            key=replica_settings.access_token_verification_key,
+        )
+
+        assert decoded == {'sub': '1'}
+        with pytest.raises(ValueError, match='ACCESS_TOKEN_PRIVATE_KEY'):
+            _ = replica_settings.access_token_signing_key
+
+    def test_authenticate(
+        self, client: TestClient, user: UserWithAttrs, settings: Settings, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(security, 'settings', settings)
+
+        response = client.post('/token', data={'username': user.model.email, 'password': user.clean_password})
+        token = response.json()['access_token']
+
+        assert jwt.get_unverified_header(token)['alg'] == settings.ACCESS_TOKEN_ALGORITHM
+        response = client.post('/refresh-token', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == HTTPStatus.OK
+
+
+class TestStatelessMode:
+    url = '/romancista'
+
+    @pytest.fixture(autouse=True)
+    def _stateless(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(security.settings, 'ACCESS_TOKEN_STATELESS', True)
+
+    def test_trusts_token_claims(self, client: TestClient, user: UserWithAttrs, token: str) -> None:
+        with capture_queries() as queries:
+            response = client.post(self.url, headers={'Authorization': f'Bearer {token}'}, json={'name': randstr()})
+
+        assert response.status_code == HTTPStatus.CREATED
+        assert not [statement for statement, _ in queries if 'FROM users' in statement]
+
+    def test_legacy_token_checks_database(self, client: TestClient, user: UserWithAttrs) -> None:
+        token = jwt.encode(
+            {'sub': user.model.email},
+            algorithm=security.settings.ACCESS_TOKEN_ALGORITHM,
+            key=security.settings.SECRET_KEY,
+        )
+
+        with capture_queries() as queries:
+            response = client.post(self.url, headers={'Authorization': f'Bearer {token}'}, json={'name': randstr()})
+
+        assert response.status_code == HTTPStatus.CREATED
+        assert [statement for statement, _ in queries if 'FROM users' in statement]
+
+    def test_revoked_token(self, client: TestClient, token: str) -> None:
+        client.post('/logout', headers={'Authorization': f'Bearer {token}'})
+
+        response = client.post(self.url, headers={'Authorization': f'Bearer {token}'}, json={'name': randstr()})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_invalid_token(self, client: TestClient) -> None:
+        response = client.post(self.url, headers={'Authorization': 'Bearer invalid'}, json={'name': randstr()})
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
@@ -0,0 +1,98 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+import uvicorn
+
+from madr.server import RecyclingServer, create_config, default_workers, main, read_cpu_quota
+from madr.settings import Settings, get_settings
+
+
+def write_cgroup(root: Path, files: dict[str, str]) -> Path:
+    for name, content in files.items():
+        (root / name).parent.mkdir(parents=True, exist_ok=True)
+        (root / name).write_text(content)
+    return root
+
+
+class TestReadCpuQuota:
+    @pytest.mark.parametrize(
+        ('files', 'expected'),
+        [
+            ({'cpu.max': '150000 100000\n'}, 1.5),
+            ({'cpu.max': 'max 100000\n'}, None),
+            ({'cpu/cpu.cfs_quota_us': '200000\n', 'cpu/cpu.cfs_period_us': '100000\n'}, 2),
+            ({'cpu/cpu.cfs_quota_us': '-1\n', 'cpu/cpu.cfs_period_us': '100000\n'}, None),
+            ({}, None),
+        ],
+    )
+    def test_read(self, tmp_path: Path, files: dict[str, str], expected: float | None) -> None:
+        assert read_cpu_quota(write_cgroup(tmp_path, files)) == expected
+
+
+class TestDefaultWorkers:
+    @pytest.mark.parametrize(
+        ('cpu_max', 'expected'),
+        [('50000 100000', 1), ('150000 100000', 2), ('800000 100000', 4), ('max 100000', 4)],
+    )
+    def test_from_quota(self, tmp_path: Path, cpu_max: str, expected: int) -> None:
+        with patch('os.sched_getaffinity', return_value=set(range(4))):
+            assert default_workers(write_cgroup(tmp_path, {'cpu.max': cpu_max})) == expected
+
+
+class TestRecyclingServer:
+    @pytest.mark.parametrize(('limit', 'expected'), [(100, range(100, 111)), (None, [None])])
+    def test_jitter(self, limit: int | None, expected: range | list[None]) -> None:
+        sut = RecyclingServer(uvicorn.Config('madr.api:app', limit_max_requests=limit), max_requests_jitter=10)
+
+        with patch.object(uvicorn.Server, 'run') as run:
+            sut.run()
+
+        assert sut.config.limit_max_requests in expected
+        run.assert_called_once_with(None)
+
+
+class TestCreateConfig:
+    def test_config(self) -> None:
+        settings = Settings(
+            SERVER_WORKERS=3,
+            SERVER_KEEP_ALIVE=30,
+            SERVER_BACKLOG=512,
+            SERVER_MAX_REQUESTS=1000,
+            SERVER_GRACEFUL_TIMEOUT=10,
+        )
+
+        config = create_config(settings)
+
+        assert config.app == 'madr.api:app'
+        assert (config.host, config.port) == ('0.0.0.0', 8000)  # noqa: S104
+        assert (config.loop, config.http) == ('uvloop', 'httptools')
+        assert config.workers == 3  # noqa: PLR2004
+        assert config.timeout_keep_alive == 30  # noqa: PLR2004
+        assert config.backlog == 512  # noqa: PLR2004
+        assert config.limit_max_requests == 1000  # noqa: PLR2004
+        assert config.timeout_graceful_shutdown == 10  # noqa: PLR2004
+        assert (config.proxy_headers, config.forwarded_allow_ips) == (True, '127.0.0.1')
+
+    def test_default_workers(self) -> None:
+        with patch('madr.server.default_workers', return_value=2):
+            assert create_config(Settings()).workers == 2  # noqa: PLR2004
+
+
+class TestMain:
+    def test_main(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(get_settings(), 'SERVER_HOST', '127.0.0.1')
+        monkeypatch.setattr(get_settings(), 'SERVER_PORT', 0)
+        monkeypatch.setattr(get_settings(), 'SERVER_WORKERS', 1)
+
+        with patch('madr.server.Multiprocess') as multiprocess:
+            main()
+
+        config = multiprocess.call_args.args[0]
+        [sock] = multiprocess.call_args.kwargs['sockets']
+        target = multiprocess.call_args.kwargs['target']
+        sock.close()
+
+        assert config.workers == 1
+        assert isinstance(target.__self__, RecyclingServer)
+        multiprocess.return_value.run.assert_called_once_with()
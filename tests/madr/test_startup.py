@@ -0,0 +1,55 @@
+import pytest
+
+from madr.startup import ImportTime, group_by_package, main, measure_imports, parse_importtime
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       150 |        150 |     fastapi.types
+import time:      1200 |       1350 |   fastapi.routing
+import time:       300 |       1650 | fastapi
+import time:       500 |        500 |   madr.schemas
+import time:      2000 |       4150 | madr.api
+"""
+
+
+class TestParseImporttime:
+    def test_parse(self) -> None:
+        times = parse_importtime(IMPORTTIME.splitlines())
+
+        assert times[0] == ImportTime(module='fastapi.types', self_time=0.00015, cumulative=0.00015)
+        assert times[-1] == ImportTime(module='madr.api', self_time=0.002, cumulative=0.00415)
+        assert len(times) == 5  # noqa: PLR2004
+
+    def test_ignore_other_lines(self) -> None:
+        assert parse_importtime(['', 'Traceback (most recent call last):']) == []
+
+
+class TestGroupByPackage:
+    def test_group(self) -> None:
+        times = parse_importtime(IMPORTTIME.splitlines())
+
+        assert group_by_package(times) == [('madr', pytest.approx(0.0025)), ('fastapi', pytest.approx(0.00165))]
+
+
+class TestMeasureImports:
+    def test_measure(self) -> None:
+        modules = {time.module for time in measure_imports('madr.settings')}
+
+        assert 'madr.settings' in modules
+        assert 'pydantic_settings' in modules
+
+
+class TestMain:
+    def test_by_package(self, capsys: pytest.CaptureFixture[str]) -> None:
+        main(['--module', 'madr.settings', '--top', '3'])
+
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0].startswith('# madr.settings: ')
+        assert len(lines) == 4  # noqa: PLR2004
+
+    def test_by_module(self, capsys: pytest.CaptureFixture[str]) -> None:
+        main(['--module', 'madr.settings', '--by', 'module', '--top', '200'])
+
+        lines = capsys.readouterr().out.splitlines()
+        assert any(line.startswith('madr.settings ') for line in lines[1:])
+        assert any(line.startswith('pydantic_settings.') for line in lines[1:])
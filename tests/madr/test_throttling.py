@@ -0,0 +1,179 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+import anyio
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from madr.database import create_dbengine, create_sessionmaker, sessionmaker
+from madr.errors import TooManyRequestsError
+from madr.models import RateLimitBucket
+from madr.settings import Settings
+from madr.throttling import (
+    AdmissionGate,
+    DatabaseRateLimiter,
+    LoginThrottle,
+    MemoryRateLimiter,
+    create_rate_limiter,
+)
+
+
+@pytest.mark.anyio
+class TestMemoryRateLimiter:
+    async def test_burst_then_refill(self) -> None:
+        sut = MemoryRateLimiter()
+
+        with patch('madr.throttling.monotonic', return_value=100.0):
+            assert [await sut.hit('a', rate=1, burst=3) for _ in range(4)] == [True, True, True, False]
+            assert await sut.hit('b', rate=1, burst=3)
+
+        with patch('madr.throttling.monotonic', return_value=101.5):
+            assert await sut.hit('a', rate=1, burst=3)
+            assert not await sut.hit('a', rate=1, burst=3)
+
+    async def test_evicts_oldest_bucket(self) -> None:
+        sut = MemoryRateLimiter(maxsize=2)
+        await sut.hit('a', rate=0, burst=1)
+        await sut.hit('b', rate=0, burst=1)
+
+        await sut.hit('c', rate=0, burst=1)
+
+        assert len(sut) == 2  # noqa: PLR2004
+        assert await sut.hit('a', rate=0, burst=1)
+
+    async def test_clear(self) -> None:
+        sut = MemoryRateLimiter()
+        await sut.hit('a', rate=0, burst=1)
+
+        await sut.clear()
+
+        assert len(sut) == 0
+        assert await sut.hit('a', rate=0, burst=1)
+
+
+@pytest.mark.anyio
+class TestDatabaseRateLimiter:
+    @pytest.fixture
+    def sut(self, dbsession: Session) -> DatabaseRateLimiter:
+        settings = Settings(
+            DATABASE_URL=dbsession.get_bind().engine.url.render_as_string(hide_password=False),
+            DATABASE_POOL_CLASS='NullPool',
+        )
+        return DatabaseRateLimiter(create_sessionmaker(create_dbengine(settings)), cleanup_every=3, max_idle=60)
+
+    async def test_burst_then_refill(self, sut: DatabaseRateLimiter, dbsession: Session) -> None:
+        assert [await sut.hit('a', rate=0, burst=2) for _ in range(3)] == [True, True, False]
+        assert await sut.hit('b', rate=0, burst=2)
+
+        dbsession.execute(sa.update(RateLimitBucket).values(updated_at=sa.func.now() - timedelta(seconds=2)))
+        dbsession.commit()
+
+        assert await sut.hit('a', rate=1, burst=2)
+
+    async def test_cleanup_idle_buckets(self, sut: DatabaseRateLimiter, dbsession: Session) -> None:
+        await sut.hit('a', rate=1, burst=2)
+        dbsession.execute(sa.update(RateLimitBucket).values(updated_at=sa.func.now() - timedelta(hours=2)))
+        dbsession.commit()
+
+        await sut.hit('b', rate=1, burst=2)
+        await sut.hit('b', rate=1, burst=2)
+
+        assert dbsession.scalars(sa.select(RateLimitBucket.key)).all() == ['b']
+
+    async def test_clear(self, sut: DatabaseRateLimiter, dbsession: Session) -> None:
+        await sut.hit('a', rate=1, burst=2)
+
+        await sut.clear()
+
+        assert dbsession.scalar(sa.select(sa.func.count()).select_from(RateLimitBucket)) == 0
+
+
+class TestCreateRateLimiter:
+    def test_memory(self) -> None:
+        assert isinstance(create_rate_limiter(Settings(), sessionmaker), MemoryRateLimiter)
+
+    def test_database(self) -> None:
+        returned = create_rate_limiter(Settings(LOGIN_THROTTLE_BACKEND='database'), sessionmaker)
+
+        assert isinstance(returned, DatabaseRateLimiter)
+        assert returned.sessionmaker is sessionmaker
+
+
+@pytest.mark.anyio
+class TestLoginThrottle:
+    @pytest.fixture
+    def sut(self) -> LoginThrottle:
+        return LoginThrottle(MemoryRateLimiter(), ip_rate=0, ip_burst=2, username_rate=0, username_burst=1)
+
+    async def test_throttle_by_username(self, sut: LoginThrottle) -> None:
+        await sut.check(ip='10.0.0.1', username='Alice')
+
+        with pytest.raises(TooManyRequestsError):
+            await sut.check(ip='10.0.0.2', username='alice')
+        assert (sut.throttled_ip, sut.throttled_username) == (0, 1)
+
+    async def test_throttle_by_ip(self, sut: LoginThrottle) -> None:
+        await sut.check(ip='10.0.0.1', username='alice')
+        await sut.check(ip='10.0.0.1', username='bob')
+
+        with pytest.raises(TooManyRequestsError):
+            await sut.check(ip='10.0.0.1', username='carol')
+        assert (sut.throttled_ip, sut.throttled_username) == (1, 0)
+
+    async def test_without_ip(self, sut: LoginThrottle) -> None:
+        await sut.check(ip=None, username='alice')
+        await sut.check(ip=None, username='bob')
+        await sut.check(ip=None, username='carol')
+
+    async def test_reset(self, sut: LoginThrottle) -> None:
+        await sut.check(ip='10.0.0.1', username='alice')
+        with pytest.raises(TooManyRequestsError):
+            await sut.check(ip='10.0.0.1', username='alice')
+
+        await sut.reset()
+
+        assert (sut.throttled_ip, sut.throttled_username) == (0, 0)
+        await sut.check(ip='10.0.0.1', username='alice')
+
+
+@pytest.mark.anyio
+class TestAdmissionGate:
+    async def test_queue_then_admit(self) -> None:
+        sut = AdmissionGate(max_concurrent=1, max_queue=1, timeout=5)
+        release = anyio.Event()
+
+        async def hold() -> None:
+            async with sut.admit():
+                await release.wait()
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(hold)
+            await anyio.wait_all_tasks_blocked()
+            tg.start_soon(hold)
+            await anyio.wait_all_tasks_blocked()
+
+            assert (sut.active, sut.waiting, sut.queued) == (1, 1, 1)
+            release.set()
+
+        assert (sut.active, sut.waiting, sut.queued, sut.rejected) == (0, 0, 1, 0)
+
+    async def test_reject_when_queue_is_full(self) -> None:
+        sut = AdmissionGate(max_concurrent=1, max_queue=0, timeout=5)
+
+        async with sut.admit():
+            with pytest.raises(TooManyRequestsError):
+                async with sut.admit():
+                    pass
+
+        assert (sut.active, sut.queued, sut.rejected) == (0, 0, 1)
+
+    async def test_reject_after_timeout(self) -> None:
+        sut = AdmissionGate(max_concurrent=1, max_queue=1, timeout=0.01)
+
+        async with sut.admit():
+            with pytest.raises(TooManyRequestsError):
+                async with sut.admit():
+                    pass
+
+        assert (sut.active, sut.waiting, sut.queued, sut.rejected) == (0, 0, 1, 1)
@@ -1,6 +1,10 @@
+from base64 import urlsafe_b64encode
+from random import randint
+
 import pytest
 
-from madr.utils import sanitize
+from madr.errors import InvalidCursorError
+from madr.utils import decode_cursor, encode_cursor, sanitize
 
 
 class TestSanitize:
@@ -17,3 +21,27 @@ class TestSanitize:
     )
     def test_sanitize_value(self, value: str, expected: str) -> None:
         assert sanitize(value) == expected
+
+
+class TestCursor:
+    def test_encode_and_decode(self) -> None:
+        last_id = randint(1, 1_000_000)
+
+        cursor = encode_cursor(last_id)
+
+        assert '=' not in cursor
+        assert decode_cursor(cursor) == last_id
+
+    @pytest.mark.parametrize(
+        'cursor',
+        [
+            'invalid',
+            '!!!',
+            urlsafe_b64encode(b'[1]').decode(),
+            urlsafe_b64encode(b'{}').decode(),
+            urlsafe_b64encode(b'{"id": "1"}').decode(),
+        ],
+    )
+    def test_invalid_cursor(self, cursor: str) -> None:
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(cursor)
@@ -1,6 +1,12 @@
+from collections.abc import Callable, Iterator, Mapping
+from contextlib import contextmanager
 from dataclasses import dataclass
 from random import randint
 from string import ascii_letters, digits
+from typing import Any
+
+from sqlalchemy import Connection, Engine, event
+from sqlalchemy.orm import Session
 
 from madr.models import User
 
@@ -16,3 +22,41 @@ def randstr(length: int = 16, /) -> str:
 class UserWithAttrs:
     model: User
     clean_password: str
+
+
+@contextmanager
+def capture_queries() -> Iterator[list[tuple[str, Mapping[str, Any]]]]:
+    queries: list[tuple[str, Mapping[str, Any]]] = []
+
+    def before_cursor_execute(
+        _conn: Connection, _cursor: object, statement: str, parameters: Mapping[str, Any], *_args: object
+    ) -> None:
+        queries.append((statement, parameters))
+
+    event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield queries
+    finally:
+        event.remove(Engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@contextmanager
+def before_statement(prefix: str, callback: Callable[[], object], /) -> Iterator[None]:
+    """Chama `callback` antes do primeiro comando iniciado por `prefix`, como faria uma requisição concorrente."""
+    called = False
+
+    def before_cursor_execute(_conn: Connection, _cursor: object, statement: str, *_args: object) -> None:
+        nonlocal called
+        if not called and statement.startswith(prefix):
+            called = True
+            callback()
+
+    event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield
+    finally:
+        event.remove(Engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def explain(dbsession: Session, statement: str, parameters: Mapping[str, Any]) -> str:
+    return '\n'.join(dbsession.connection().exec_driver_sql(f'EXPLAIN {statement}', parameters).scalars())